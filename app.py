@@ -1,10 +1,9 @@
-from flask import Flask, render_template, request, jsonify, send_file, session, send_from_directory, url_for
+from flask import Flask, render_template, request, jsonify, send_file, session, send_from_directory, url_for, Response, stream_with_context
 import logging
 from flask_session import Session
 import os
 import base64
 import requests
-import json
 import re
 from werkzeug.utils import secure_filename
 import uuid
@@ -384,6 +383,20 @@ def serve_output(session_id, filename):
     rel_file = os.path.basename(filename)
     return send_from_directory(os.path.join(app.config['OUTPUT_FOLDER'], session_id, rel_dir), rel_file)
 
+@app.route('/api/images/<image_id>/<int:size>')
+def serve_image_thumbnail(image_id, size):
+    """Serve a stored product image thumbnail; ids are content hashes, so it never changes"""
+    from utils.image_store import get_image_store
+    
+    if not re.fullmatch(r'[0-9a-f]{40}', image_id):
+        return jsonify({'error': 'Invalid image id'}), 400
+    path = get_image_store().thumbnail(image_id, size)
+    if not path:
+        return jsonify({'error': 'Image not found'}), 404
+    response = send_file(os.path.abspath(path), mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @app.route('/extract/<file_id>', methods=['POST'])
 def extract_table(file_id):
     """Extract table using PP-StructureV3 API"""
@@ -399,6 +412,8 @@ def extract_table(file_id):
         return jsonify({'error': 'File not found'}), 404
     
     try:
+        from utils.image_store import get_image_store
+        
         # Read file and encode to base64
         with open(file_info['filepath'], 'rb') as file:
             file_bytes = file.read()
@@ -481,26 +496,22 @@ def extract_table(file_id):
                 markdown_text = markdown_data.get("text", "")
                 images_dict = markdown_data.get("images", {})
                 
-                # Download images and replace URLs with local paths
-                for img_path, img_url in images_dict.items():
-                    try:
-                        img_response = requests.get(img_url, timeout=30)
-                        if img_response.status_code == 200:
-                            # Save image locally
-                            local_img_path = os.path.join(images_dir, os.path.basename(img_path))
-                            with open(local_img_path, 'wb') as img_file:
-                                img_file.write(img_response.content)
-                            
-                            # Create URL-safe path for serving
-                            relative_img_path = f"imgs/{os.path.basename(img_path)}"
-                            local_url = url_for('serve_output', session_id=session_id, filename=f"{file_id}/{relative_img_path}")
-                            
-                            # Replace remote URL with local URL in markdown
-                            markdown_text = markdown_text.replace(img_path, local_url)
-                            
-                            logger.info(f'Downloaded image: {img_path} -> {local_img_path}')
-                    except Exception as e:
-                        logger.error(f'Failed to download image {img_url}: {str(e)}')
+                # Download images concurrently into the image store (which pre-builds
+                # thumbnails for the generators) and replace URLs with local paths
+                local_paths = {img_path: os.path.join(images_dir, os.path.basename(img_path)) for img_path in images_dict}
+                saved = get_image_store().download_files(
+                    {local_paths[img_path]: img_url for img_path, img_url in images_dict.items()}
+                )
+                for img_path in images_dict:
+                    if saved.get(local_paths[img_path]):
+                        # Create URL-safe path for serving
+                        relative_img_path = f"imgs/{os.path.basename(img_path)}"
+                        local_url = url_for('serve_output', session_id=session_id, filename=f"{file_id}/{relative_img_path}")
+                        
+                        # Replace remote URL with local URL in markdown
+                        markdown_text = markdown_text.replace(img_path, local_url)
+                        
+                        logger.info(f'Downloaded image: {img_path} -> {local_paths[img_path]}')
                 
                 # Also update block_content in prunedResult if it exists
                 pruned_result = res.get("prunedResult", {})
@@ -697,14 +708,56 @@ def costing():
         engine = CostingEngine()
         result = engine.apply_factors(file_id, factors, session, table_data)
         
+        scenario_id = None
+        for f in session.get('uploaded_files', []):
+            if f['id'] == file_id:
+                scenario_id = f.get('costed_data', {}).get('scenario_id')
+                break
+
         return jsonify({
             'success': True,
             'result': result,
+            'scenario_id': scenario_id,
             'message': 'Costing applied successfully'
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/costing/scenarios/<file_id>', methods=['GET'])
+def list_costing_scenarios(file_id):
+    """List all costing scenarios recorded for a file"""
+    try:
+        from utils.scenario_store import ScenarioStore
+        store = ScenarioStore(session['session_id'], file_id)
+
+        return jsonify({
+            'success': True,
+            'scenarios': store.list_scenarios()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/costing/scenarios/<file_id>/diff', methods=['GET'])
+def diff_costing_scenarios(file_id):
+    """Compare two costing scenarios of a file"""
+    base_id = request.args.get('base')
+    compare_id = request.args.get('compare')
+
+    if not base_id or not compare_id:
+        return jsonify({'error': 'Both base and compare scenario ids are required'}), 400
+
+    try:
+        from utils.scenario_store import ScenarioStore
+        store = ScenarioStore(session['session_id'], file_id)
+        diff = store.diff(base_id, compare_id)
+
+        return jsonify({
+            'success': True,
+            'diff': diff
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/generate-offer/<file_id>', methods=['POST'])
 def generate_offer(file_id):
     """Generate offer with costing factors"""
@@ -775,6 +828,30 @@ def value_engineering(file_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/value-engineering/<file_id>/optimize', methods=['POST'])
+def optimize_value_engineering(file_id):
+    """Select alternatives across the whole BOQ to meet a budget"""
+    data = request.json or {}
+    target_total = data.get('target_total')
+    saving_percent = data.get('saving_percent')
+    objective = data.get('objective', 'similarity')
+    
+    if target_total is None and saving_percent is None:
+        return jsonify({'error': 'Either target_total or saving_percent is required'}), 400
+    
+    try:
+        from utils.value_engineering import ValueEngineer
+        engineer = ValueEngineer()
+        result = engineer.optimize_budget(file_id, session, target_total, saving_percent, objective)
+        
+        return jsonify({
+            'success': True,
+            'optimization': result,
+            'message': 'Budget optimization completed' if result['feasible'] else 'Target budget cannot be met; cheapest options selected'
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/brands/tiers', methods=['GET'])
 def get_tiers():
     """Get available budget tiers"""
@@ -867,6 +944,61 @@ def get_subcategories_api():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/brands/facets', methods=['GET'])
+def get_brand_facets():
+    """Get the whole tier/category/brand/subcategory/model tree in one response"""
+    try:
+        from utils.brand_database import get_catalog
+        from utils.brand_facets import get_facet_payload
+        payload = get_facet_payload(get_catalog().snapshot())
+        
+        # The gzip representation gets its own ETag; either one revalidates
+        use_gzip = 'gzip' in request.accept_encodings
+        etag = f'{payload.etag}-gzip' if use_gzip else payload.etag
+        
+        if request.if_none_match.contains(payload.etag) or request.if_none_match.contains(f'{payload.etag}-gzip'):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(payload.gzip_body if use_gzip else payload.body, mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/brands/search', methods=['GET'])
+def search_brands():
+    """Full-text search over brands, models, features, descriptions and countries"""
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    try:
+        from utils.brand_database import get_catalog
+        from utils.catalog_search import get_search_index
+        search_index = get_search_index(get_catalog().snapshot().index)
+        result = search_index.search(
+            query,
+            tier=request.args.get('tier'),
+            category=request.args.get('category'),
+            country=request.args.get('country'),
+            min_price=request.args.get('min_price', type=float),
+            max_price=request.args.get('max_price', type=float),
+            limit=limit,
+            offset=offset
+        )
+        
+        return jsonify({
+            'success': True,
+            **result
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/brands/scrape', methods=['POST'])
 def scrape_brand():
     """Scrape a brand's website to discover products"""
@@ -910,16 +1042,13 @@ def add_brand():
         if not brand_name or not website:
             return jsonify({'error': 'Brand name and website are required'}), 400
         
-        # Load existing brands
-        from utils.brand_database import BRAND_DATABASE
-        import json
+        from utils.brand_database import get_catalog
+        catalog = get_catalog()
+        snapshot = catalog.snapshot()
         
         # Check if brand already exists
-        for t in BRAND_DATABASE:
-            for cat in BRAND_DATABASE[t]:
-                for brand in BRAND_DATABASE[t][cat]:
-                    if brand['name'].lower() == brand_name.lower():
-                        return jsonify({'error': 'Brand already exists'}), 400
+        if snapshot.index.brand_lookup.get(brand_name.lower()):
+            return jsonify({'error': 'Brand already exists'}), 400
         
         # Create new brand entry
         new_brand = {
@@ -929,33 +1058,12 @@ def add_brand():
             'models': categories
         }
         
-        # Add to database (in memory for now)
-        if tier not in BRAND_DATABASE:
+        if tier not in snapshot.brands:
             return jsonify({'error': f'Invalid tier: {tier}'}), 400
         
-        # Add to first available category or create new one
-        if categories:
-            for category in categories:
-                if category not in BRAND_DATABASE[tier]:
-                    BRAND_DATABASE[tier][category] = []
-                
-                # Check if brand already in this category
-                brand_exists = False
-                for brand in BRAND_DATABASE[tier][category]:
-                    if brand['name'].lower() == brand_name.lower():
-                        brand_exists = True
-                        break
-                
-                if not brand_exists:
-                    BRAND_DATABASE[tier][category].append(new_brand)
-        else:
-            # Default to general category
-            if 'general' not in BRAND_DATABASE[tier]:
-                BRAND_DATABASE[tier]['general'] = []
-            BRAND_DATABASE[tier]['general'].append(new_brand)
-        
-        # Save to file
-        save_brand_database(BRAND_DATABASE)
+        # Add under each provided category, or the general category; swaps in a new
+        # catalog version and persists the brand to the brand store
+        catalog.upsert_brand(tier, list(categories) or ['general'], new_brand)
         
         return jsonify({
             'success': True,
@@ -975,126 +1083,135 @@ def scrape_and_add_brand():
         website = data.get('website')
         country = data.get('country', 'Unknown')
         tier = data.get('tier', 'mid_range')
+        background = data.get('background', False)
+        incremental = data.get('incremental', False)
         
         if not brand_name or not website:
             return jsonify({'error': 'Brand name and website are required'}), 400
         
-        # First scrape the website
-        from utils.brand_scraper import BrandScraper
-        scraper = BrandScraper()
-        
-        logger.info(f"Scraping {brand_name} ({website})")
-        scraped_data = scraper.scrape_brand_website(website, brand_name)
-        
-        if 'error' in scraped_data:
-            return jsonify({'error': scraped_data['error']}), 400
-        
-        # Convert scraped data to database format
-        categories_data = {}
-        
-        # Process category-based products
-        for category_name, products in scraped_data.get('categories', {}).items():
-            # Determine subcategory (simplified)
-            subcategory = 'general'
-            if 'chair' in category_name.lower() or 'seating' in category_name.lower():
-                subcategory = 'chairs'
-            elif 'desk' in category_name.lower() or 'table' in category_name.lower():
-                subcategory = 'desks'
-            
-            if subcategory not in categories_data:
-                categories_data[subcategory] = []
-            
-            # Add products
-            for product in products:
-                model_entry = {
-                    'model': product.get('model', 'Unknown Model'),
-                    'price_range': f"{int(product.get('price', 0))}-{int(product.get('price', 0) * 1.5)}" if product.get('price') else "Contact for price",
-                    'features': product.get('features', [])[:5],  # Max 5 features
-                    'image_url': product.get('image_url'),
-                    'description': product.get('description', ''),
-                    'source_url': product.get('source_url')
-                }
-                categories_data[subcategory].append(model_entry)
-        
-        # Process standalone products
-        for product in scraped_data.get('products', []):
-            subcategory = 'general'
-            if subcategory not in categories_data:
-                categories_data[subcategory] = []
-            
-            model_entry = {
-                'model': product.get('model', 'Unknown Model'),
-                'price_range': f"{int(product.get('price', 0))}-{int(product.get('price', 0) * 1.5)}" if product.get('price') else "Contact for price",
-                'features': product.get('features', [])[:5],
-                'image_url': product.get('image_url'),
-                'description': product.get('description', ''),
-                'source_url': product.get('source_url')
-            }
-            categories_data[subcategory].append(model_entry)
-        
-        # Now add to database
-        from utils.brand_database import BRAND_DATABASE
-        
-        # Create brand entry
-        new_brand = {
-            'name': brand_name,
-            'website': website,
-            'country': country,
-            'models': categories_data
-        }
+        from utils.brand_database import get_catalog
+        if tier not in get_catalog().snapshot().brands:
+            return jsonify({'error': f'Invalid tier: {tier}'}), 400
         
-        # Determine main category
-        main_category = 'general'
-        if any('chair' in cat.lower() or 'seating' in cat.lower() for cat in categories_data):
-            main_category = 'seating'
-        elif any('desk' in cat.lower() or 'table' in cat.lower() for cat in categories_data):
-            main_category = 'desking'
+        if background:
+            from utils.scrape_jobs import get_job_manager
+            job = get_job_manager().submit(brand_name, website, tier, country, incremental)
+            return jsonify({
+                'success': True,
+                'job': job,
+                'message': f'Scraping {brand_name} in the background'
+            }), 202
         
-        # Add to database
-        if tier not in BRAND_DATABASE:
-            return jsonify({'error': f'Invalid tier: {tier}'}), 400
+        # Scrape the website with the shared concurrent crawler, then add it to the
+        # database; incremental scrapes only fetch changed pages and skip unchanged brands
+        from utils.brand_crawler import get_crawl_loop, get_crawler
+        from utils.scrape_jobs import scrape_brand
         
-        if main_category not in BRAND_DATABASE[tier]:
-            BRAND_DATABASE[tier][main_category] = []
+        logger.info(f"Scraping {brand_name} ({website})")
+        try:
+            summary = get_crawl_loop().run(
+                scrape_brand(get_crawler(), brand_name, website, tier, country, incremental=incremental)
+            )
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Check if brand already exists
-        brand_exists = False
-        for brand in BRAND_DATABASE[tier][main_category]:
-            if brand['name'].lower() == brand_name.lower():
-                # Update existing brand
-                brand['models'] = categories_data
-                brand['website'] = website
-                brand['country'] = country
-                brand_exists = True
-                break
+        return jsonify({
+            'success': True,
+            'message': f'Successfully scraped and added {brand_name} with {summary["products_count"]} products',
+            'brand': summary['brand'],
+            'products_count': summary['products_count'],
+            'categories': summary['categories'],
+            'updated': summary['updated'],
+            'changes': summary['changes']
+        })
+    except Exception as e:
+        logger.exception('Error in scrape and add')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/brands/scrape-jobs', methods=['POST'])
+def create_scrape_jobs():
+    """Queue background scrapes for one brand or a list of brands"""
+    try:
+        data = request.get_json() or {}
+        brands = data.get('brands') or [data]
+        incremental = data.get('incremental', False)
+        
+        from utils.brand_database import get_catalog
+        from utils.scrape_jobs import get_job_manager
+        tiers = get_catalog().snapshot().brands
+        
+        for brand in brands:
+            if not brand.get('brand_name') or not brand.get('website'):
+                return jsonify({'error': 'Brand name and website are required'}), 400
+            if brand.get('tier', 'mid_range') not in tiers:
+                return jsonify({'error': f'Invalid tier: {brand.get("tier")}'}), 400
+        
+        manager = get_job_manager()
+        jobs = [
+            manager.submit(b['brand_name'], b['website'], b.get('tier', 'mid_range'), b.get('country', 'Unknown'),
+                           b.get('incremental', incremental))
+            for b in brands
+        ]
         
-        if not brand_exists:
-            BRAND_DATABASE[tier][main_category].append(new_brand)
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'message': f'Queued {len(jobs)} scrape job(s)'
+        }), 202
+    except Exception as e:
+        logger.exception('Error queuing scrape jobs')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/brands/recrawl', methods=['POST'])
+def recrawl_brands():
+    """Queue incremental re-crawls of every previously scraped brand"""
+    try:
+        from utils.crawl_state import get_crawl_state
+        from utils.scrape_jobs import get_job_manager
         
-        # Save to file
-        save_brand_database(BRAND_DATABASE)
+        manager = get_job_manager()
+        jobs = [
+            manager.submit(b['brand_name'], b['website'], b['tier'], b['country'] or 'Unknown', incremental=True)
+            for b in get_crawl_state().crawled_brands()
+        ]
         
         return jsonify({
             'success': True,
-            'message': f'Successfully scraped and added {brand_name} with {sum(len(v) for v in categories_data.values())} products',
-            'brand': new_brand,
-            'products_count': sum(len(v) for v in categories_data.values()),
-            'categories': list(categories_data.keys())
+            'jobs': jobs,
+            'message': f'Queued incremental re-crawl of {len(jobs)} brand(s)'
+        }), 202
+    except Exception as e:
+        logger.exception('Error queuing re-crawl')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/brands/scrape-jobs', methods=['GET'])
+def list_scrape_jobs():
+    """List background scrape jobs, newest first"""
+    try:
+        from utils.scrape_jobs import get_job_manager
+        return jsonify({
+            'success': True,
+            'jobs': get_job_manager().list_jobs()
         })
     except Exception as e:
-        logger.exception('Error in scrape and add')
         return jsonify({'error': str(e)}), 500
 
-def save_brand_database(database):
-    """Save brand database to file"""
+@app.route('/api/brands/scrape-jobs/<job_id>', methods=['GET'])
+def get_scrape_job(job_id):
+    """Get status and progress of a background scrape job"""
     try:
-        import json
-        db_file = os.path.join('utils', 'brand_database_custom.json')
-        with open(db_file, 'w') as f:
-            json.dump(database, f, indent=2)
-        logger.info(f"Brand database saved to {db_file}")
+        from utils.scrape_jobs import get_job_manager
+        job = get_job_manager().get(job_id)
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job
+        })
     except Exception as e:
-        logger.error(f"Error saving brand database: {e}")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/download/<file_type>/<file_id>', methods=['GET'])
 def download(file_type, file_id):
@@ -1104,6 +1221,13 @@ def download(file_type, file_id):
     try:
         from utils.download_manager import DownloadManager
         manager = DownloadManager()
+        
+        if file_type == 'all':
+            # Bundle is zipped while it is sent, starting with the files already on disk
+            filename, chunks = manager.stream_all_downloads(file_id, session)
+            return Response(stream_with_context(chunks), mimetype='application/zip',
+                            headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+        
         file_path = manager.prepare_download(file_id, file_type, format_type, session)
         
         return send_file(file_path, as_attachment=True)
@@ -0,0 +1,94 @@
+"""
+Benchmark HTML parsing backends on the stitched-table and product-page fixtures
+
+Stitched table: BeautifulSoup with html.parser and lxml against reading lxml's element
+tree directly, as the table parsers do. Product page: html.parser and lxml, each with a
+full parse and with the strainer BrandScraper uses. Every variant is checked to extract
+the same data as the first one.
+
+Usage: python benchmarks/bench_html_parsing.py [repeats]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4.builder import builder_registry
+
+from utils.brand_scraper import BrandScraper
+from utils.html_parsing import (
+    PARSER_PREFERENCE, PRODUCT_PAGE_STRAINER, cell_text, find_table, make_soup, table_rows
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PRODUCT_URL = 'https://www.example-furniture.com/products/aeron'
+
+scraper = BrandScraper()
+
+
+def soup_table_rows(soup):
+    return [[cell.get_text(strip=True) for cell in row.find_all(['th', 'td'])]
+            for row in soup.find('table').find_all('tr')]
+
+
+def product_fields(soup):
+    return (
+        scraper.extract_product_title(soup),
+        scraper.extract_product_description(soup),
+        scraper.extract_product_image(soup, PRODUCT_URL),
+        scraper.extract_product_price(soup),
+        scraper.extract_product_features(soup)
+    )
+
+
+def best_of(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def report(fixture, variants, repeats):
+    with open(os.path.join(FIXTURES, fixture), encoding='utf-8') as f:
+        markup = f.read()
+    print(f"\n{fixture} ({len(markup) / 1024:.0f} KB, best of {repeats})")
+
+    baseline_time = expected = None
+    for label, func in variants:
+        elapsed, result = best_of(lambda: func(markup), repeats)
+        if expected is None:
+            baseline_time, expected = elapsed, result
+        same = 'same output' if result == expected else 'OUTPUT DIFFERS'
+        print(f"  {label:26} {elapsed * 1000:8.2f} ms  {baseline_time / elapsed:5.1f}x  {same}")
+
+
+def run(repeats):
+    parsers = [name for name in reversed(PARSER_PREFERENCE) if builder_registry.lookup(name)]
+
+    table_variants = [
+        (f'{parser} soup', lambda markup, parser=parser: soup_table_rows(make_soup(markup, parser=parser)))
+        for parser in parsers
+    ]
+    table_variants.append((
+        'lxml tree',
+        lambda markup: [[cell_text(cell) for cell in row] for row in table_rows(find_table(markup))]
+    ))
+    report('stitched_table.html', table_variants, repeats)
+
+    product_variants = []
+    for parser in parsers:
+        for label, parse_only in (('full', None), ('strained', PRODUCT_PAGE_STRAINER)):
+            product_variants.append((
+                f'{parser} soup {label}',
+                lambda markup, parser=parser, parse_only=parse_only: product_fields(
+                    make_soup(markup, parse_only, parser))
+            ))
+    report('product_page.html', product_variants, repeats)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,51 @@
+"""
+Regression test for costing scenario row keys: inserting one BOQ row must show up as
+one added row, not as every later row having changed
+"""
+
+import shutil
+import tempfile
+
+from utils.costing_engine import CostingEngine
+from utils.scenario_store import ScenarioStore
+
+
+def boq_table(descriptions):
+    """Costed table with the usual Item (serial) / Description / Qty / Unit Rate / Total headers"""
+    return {
+        'headers': ['Item', 'Description', 'Qty', 'Unit Rate', 'Total'],
+        'rows': [
+            {'Item': str(i + 1), 'Description': description, 'Qty': '2', 'Unit Rate': '100', 'Total': '200'}
+            for i, description in enumerate(descriptions)
+        ]
+    }
+
+
+def test_insert_one_row():
+    """A row inserted in the middle is added; the rows after it keep their keys"""
+    engine = CostingEngine()
+    base_dir = tempfile.mkdtemp()
+    try:
+        store = ScenarioStore('session', 'file', base_dir)
+        
+        descriptions = ['Task chair mesh back', 'Meeting table 2400', 'Visitor chair', 'Storage cabinet']
+        columns, keys, labels, prices = engine.build_price_matrix([boq_table(descriptions)])
+        assert labels == descriptions
+        before = store.append({}, columns, keys, labels, prices)
+        
+        descriptions.insert(1, 'Executive desk 1800')
+        columns, keys, labels, prices = engine.build_price_matrix([boq_table(descriptions)])
+        after = store.append({}, columns, keys, labels, prices)
+        
+        diff = store.diff(before['id'], after['id'])
+        assert diff['changed_count'] == 0
+        assert diff['removed_rows'] == []
+        assert len(diff['added_rows']) == 1
+        assert diff['rows_compared'] == 4
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_insert_one_row()
+    print('ok')
@@ -0,0 +1,58 @@
+"""
+Process-wide memo of value-engineering rankings
+Entries are keyed by normalized description, bucket, budget tier, target rate and catalog
+version, so a catalog change makes old entries unreachable and they age out of the LRU
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+Ranking = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class AlternativesCache:
+    """Thread-safe LRU of (product_ids, similarities, scores) rankings"""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Ranking]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Ranking]:
+        with self._lock:
+            ranking = self._entries.get(key)
+            if ranking is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return ranking
+
+    def put(self, key: Hashable, ranking: Ranking):
+        for array in ranking:
+            array.setflags(write=False)
+        with self._lock:
+            self._entries[key] = ranking
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+_cache = AlternativesCache()
+
+
+def get_alternatives_cache() -> AlternativesCache:
+    return _cache
@@ -0,0 +1,201 @@
+"""
+Registry of generated documents
+Every offer, presentation, MAS and export written for an uploaded file is recorded with
+the hash of the inputs it was built from, its path, size and creation time. Downloads
+look the latest one up by (session, file, kind, format) instead of listing output
+directories, and a regeneration from unchanged inputs gets the existing file back
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from .brand_store import DEFAULT_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Extracted data the document generators read, in the order they prefer it
+SOURCE_KEYS = ('costed_data', 'stitched_table', 'extraction_result')
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # registered documents kept on disk before the oldest go
+
+_COLUMNS = 'id, session_id, file_id, kind, format, inputs_hash, path, size, created_at'
+
+
+def inputs_hash(*parts) -> str:
+    """Deterministic hash of the values a document is built from (any JSON-serialisable values)"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def source_data(file_info: Dict):
+    """The extracted data a generator builds from: costed data, else stitched table, else extraction"""
+    return next((file_info[key] for key in SOURCE_KEYS if key in file_info), None)
+
+
+class ArtifactRegistry:
+    """SQLite-backed index of generated documents, stored next to the custom brands"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            if not self._schema_ready:
+                with self._schema_lock:
+                    self._init_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    file_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    inputs_hash TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at TEXT NOT NULL,
+                    UNIQUE (session_id, file_id, kind, format, inputs_hash)
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_artifacts_latest
+                ON artifacts (session_id, file_id, kind, format, id)
+            ''')
+
+    @staticmethod
+    def _row(row) -> Dict:
+        return dict(zip(_COLUMNS.split(', '), row))
+
+    def record(self, session_id: str, file_id: str, kind: str, fmt: str, path: str, inputs: str) -> Dict:
+        """Register a freshly written document, replacing any entry built from the same inputs"""
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO artifacts
+                    (session_id, file_id, kind, format, inputs_hash, path, size, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (session_id, file_id, kind, fmt, inputs, path, os.path.getsize(path), datetime.now().isoformat()))
+        return self.find(session_id, file_id, kind, fmt, inputs)
+
+    def _existing(self, rows) -> Optional[Dict]:
+        """First row whose file is still on disk, forgetting those cleaned up since"""
+        for row in rows:
+            artifact = self._row(row)
+            if os.path.exists(artifact['path']):
+                return artifact
+            self.forget(artifact['id'])
+        return None
+
+    def find(self, session_id: str, file_id: str, kind: str, fmt: str, inputs: str) -> Optional[Dict]:
+        """The document already built from these inputs, or None"""
+        rows = self._connect().execute(
+            f'SELECT {_COLUMNS} FROM artifacts '
+            'WHERE session_id = ? AND file_id = ? AND kind = ? AND format = ? AND inputs_hash = ?',
+            (session_id, file_id, kind, fmt, inputs)
+        ).fetchall()
+        return self._existing(rows)
+
+    def latest(self, session_id: str, file_id: str, kind: str, fmt: str) -> Optional[Dict]:
+        """Most recently registered document of a kind and format for a file, or None"""
+        rows = self._connect().execute(
+            f'SELECT {_COLUMNS} FROM artifacts '
+            'WHERE session_id = ? AND file_id = ? AND kind = ? AND format = ? ORDER BY id DESC',
+            (session_id, file_id, kind, fmt)
+        ).fetchall()
+        return self._existing(rows)
+
+    def latest_all(self, session_id: str, file_id: str) -> List[Dict]:
+        """Latest document of every kind and format generated for a file"""
+        pairs = self._connect().execute(
+            'SELECT DISTINCT kind, format FROM artifacts WHERE session_id = ? AND file_id = ? ORDER BY kind, format',
+            (session_id, file_id)
+        ).fetchall()
+        artifacts = (self.latest(session_id, file_id, kind, fmt) for kind, fmt in pairs)
+        return [artifact for artifact in artifacts if artifact]
+
+    def forget(self, artifact_id: int):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM artifacts WHERE id = ?', (artifact_id,))
+
+    def total_bytes(self) -> int:
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM artifacts').fetchone()[0]
+
+    def evict(self, keep_id: Optional[int] = None) -> int:
+        """
+        Delete the least recently built or reused documents, files included, until the
+        registered total fits max_bytes; returns how many went
+        """
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+        rows = self._connect().execute('SELECT id, path, size FROM artifacts ORDER BY id').fetchall()
+        evicted = 0
+        for artifact_id, path, size in rows:
+            if total <= self.max_bytes:
+                break
+            if artifact_id == keep_id:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.forget(artifact_id)
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} generated documents ({total} bytes kept)")
+        return evicted
+
+
+_registry: Optional[ArtifactRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_artifact_registry() -> ArtifactRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ArtifactRegistry()
+        return _registry
+
+
+def build_artifact(session_id: str, file_id: str, kind: str, fmt: str, inputs: str,
+                   build: Callable[[], str]) -> str:
+    """
+    Path of the document built from these inputs: the registered one when it is still on
+    disk, else whatever build() writes, after which the oldest documents beyond the size
+    budget are evicted. Either way it becomes the latest of its kind
+    """
+    registry = get_artifact_registry()
+    existing = registry.find(session_id, file_id, kind, fmt, inputs)
+    if existing:
+        logger.info(f"Reusing {kind} {fmt} for {file_id} built {existing['created_at']}: {existing['path']}")
+        registry.record(session_id, file_id, kind, fmt, existing['path'], inputs)
+        return existing['path']
+
+    path = build()
+    artifact = registry.record(session_id, file_id, kind, fmt, path, inputs)
+    registry.evict(keep_id=artifact['id'] if artifact else None)
+    return path
@@ -0,0 +1,240 @@
+"""
+Indexed view over the brand catalog
+Flattens the nested tier/category/brand/subcategory structure once at load so that
+searches become array slicing instead of nested dict walks and string parsing
+"""
+
+import re
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PRICE_RANGE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(?:-\s*(\d+(?:\.\d+)?))?\s*$')
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def normalize_tier(tier: str) -> str:
+    """Normalize a tier label ('Mid-Range', 'mid range') to its catalog key"""
+    return tier.lower().replace(' ', '_').replace('-', '_')
+
+
+def parse_price_range(price_range) -> Tuple[float, float]:
+    """Parse '150-250' (or a single price) into (min, max); NaN when not numeric"""
+    match = _PRICE_RANGE_RE.match(str(price_range).replace(',', ''))
+    if not match:
+        return np.nan, np.nan
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    return low, high
+
+
+class CatalogIndex:
+    """Flat, read-only index over a nested brand catalog"""
+
+    def __init__(self, brands: Dict):
+        self.products: List[Dict] = []
+        self.brand_lookup: Dict[str, List[Dict]] = {}
+
+        postings: Dict[Tuple[str, str, str], List[int]] = {}
+        min_prices = []
+        max_prices = []
+        brand_keys = []
+
+        for tier, categories in brands.items():
+            for category, brand_list in categories.items():
+                for brand in brand_list:
+                    name_key = brand['name'].lower()
+                    self.brand_lookup.setdefault(name_key, []).append({
+                        'tier': tier,
+                        'category': category,
+                        'brand': brand
+                    })
+
+                    for subcategory, models in brand.get('models', {}).items():
+                        for model in models:
+                            low, high = parse_price_range(model.get('price_range', ''))
+                            postings.setdefault((tier, category, subcategory), []).append(len(self.products))
+                            min_prices.append(low)
+                            max_prices.append(high)
+                            brand_keys.append(name_key)
+                            self.products.append({
+                                'brand': brand['name'],
+                                'country': brand.get('country', 'Unknown'),
+                                'website': brand.get('website', ''),
+                                'model': model.get('model', ''),
+                                'price_range': model.get('price_range', ''),
+                                'features': model.get('features', []),
+                                'description': model.get('description', ''),
+                                'category': category,
+                                'subcategory': subcategory,
+                                'tier': tier
+                            })
+
+        self.min_price = np.array(min_prices, dtype=float)
+        self.max_price = np.array(max_prices, dtype=float)
+        self.avg_price = (self.min_price + self.max_price) / 2
+        self.brand_keys = np.array(brand_keys, dtype=object)
+        self.postings = {key: np.array(ids, dtype=np.int64) for key, ids in postings.items()}
+
+        logger.info(f"Indexed {len(self.products)} models across {len(self.brand_lookup)} brands")
+
+    def __len__(self):
+        return len(self.products)
+
+    def lookup(self, tier: str, category: str, subcategory: str, brand_name: Optional[str] = None) -> np.ndarray:
+        """Return product ids for a (tier, category, subcategory) bucket, in catalog order"""
+        ids = self.postings.get((normalize_tier(tier), category.lower(), subcategory), _EMPTY)
+        if brand_name and len(ids):
+            ids = ids[self.brand_keys[ids] == brand_name.lower()]
+        return ids
+
+    def priced(self, ids: np.ndarray) -> np.ndarray:
+        """Drop products whose price range is not numeric ('Contact for price')"""
+        return ids[~np.isnan(self.avg_price[ids])]
+
+    def search_product(self, tier: str, category: str, subcategory: str, brand_name: Optional[str] = None) -> List[Dict]:
+        """Return product records for a bucket; records are shared and must not be mutated"""
+        return [self.products[i] for i in self.lookup(tier, category, subcategory, brand_name)]
+
+    def get_brand(self, brand_name: str, tier: Optional[str] = None, category: Optional[str] = None) -> Optional[Dict]:
+        """Find a brand entry by case-insensitive name, optionally restricted to a tier/category"""
+        tier_key = normalize_tier(tier) if tier else None
+        category_key = category.lower() if category else None
+
+        for entry in self.brand_lookup.get(brand_name.lower(), []):
+            if tier_key and entry['tier'] != tier_key:
+                continue
+            if category_key and entry['category'] != category_key:
+                continue
+            return entry['brand']
+        return None
+
+
+class CatalogSnapshot:
+    """Immutable catalog state; never mutate brands in place, go through BrandCatalog"""
+
+    __slots__ = ('version', 'brands', 'index')
+
+    def __init__(self, version: int, brands: Dict):
+        self.version = version
+        self.brands = brands
+        self.index = CatalogIndex(brands)
+
+
+class BrandCatalog:
+    """
+    Process-wide, copy-on-write brand catalog
+    Readers take the current snapshot without locking; writers build a new snapshot
+    with structural sharing and swap it in atomically with a bumped version.
+    When backed by a store, writes go through to it and the snapshot version is the
+    store's change counter, so workers notice each other's writes and reload.
+    """
+
+    REFRESH_INTERVAL = 2.0  # seconds between store version checks
+
+    def __init__(self, loader: Callable[[], Dict], store=None):
+        self._loader = loader
+        self._store = store
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._write_lock = threading.RLock()
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Return the current snapshot, loading or refreshing the catalog when needed"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._write_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+        elif self._store is not None and time.monotonic() - self._checked_at > self.REFRESH_INTERVAL:
+            snapshot = self._refresh()
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot().version
+
+    def upsert_brand(self, tier: str, categories: Iterable[str], brand: Dict) -> CatalogSnapshot:
+        """
+        Add a brand under each category of a tier, replacing any entry with the same name
+        Returns the new snapshot
+        """
+        tier_key = normalize_tier(tier)
+        name_key = brand['name'].lower()
+
+        with self._write_lock:
+            current = self.snapshot()
+            if self._store is not None and self._store.version() != current.version:
+                # Another worker wrote since this snapshot; build on its brands, not ours
+                logger.info("Brand catalog changed in another worker, reloading before update")
+                current = self._snapshot = self._load()
+            if tier_key not in current.brands:
+                raise ValueError(f'Invalid tier: {tier}')
+
+            # Copy only the containers on the path being changed
+            brands = dict(current.brands)
+            tier_data = dict(brands[tier_key])
+            version = current.version + 1
+            writes = 0
+            for category in categories:
+                brand_list = list(tier_data.get(category, []))
+                for i, existing in enumerate(brand_list):
+                    if existing['name'].lower() == name_key:
+                        brand_list[i] = {**existing, **brand}
+                        break
+                else:
+                    brand_list.append(brand)
+                    i = len(brand_list) - 1
+                tier_data[category] = brand_list
+
+                if self._store is not None:
+                    version = self._store.upsert_brand(tier_key, category, brand_list[i])
+                    writes += 1
+            brands[tier_key] = tier_data
+
+            if self._store is not None and version != current.version + writes:
+                # Another worker wrote between our writes; the store holds both
+                logger.info("Brand catalog written concurrently by another worker, reloading")
+                self._snapshot = self._load()
+                return self._snapshot
+            return self._swap(brands, version)
+
+    def replace(self, brands: Dict) -> CatalogSnapshot:
+        """Swap in a completely new catalog (in memory only)"""
+        with self._write_lock:
+            current = self.snapshot()
+            return self._swap(brands, current.version + 1)
+
+    def _load(self) -> CatalogSnapshot:
+        if self._store is None:
+            return CatalogSnapshot(1, self._loader())
+
+        # Retry if another worker wrote while we were loading
+        while True:
+            version = self._store.version()
+            brands = self._loader()
+            if self._store.version() == version:
+                break
+        self._checked_at = time.monotonic()
+        return CatalogSnapshot(version, brands)
+
+    def _refresh(self) -> CatalogSnapshot:
+        with self._write_lock:
+            self._checked_at = time.monotonic()
+            if self._store.version() != self._snapshot.version:
+                logger.info("Brand catalog changed in another worker, reloading")
+                self._snapshot = self._load()
+            return self._snapshot
+
+    def _swap(self, brands: Dict, version: int) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot(version, brands)
+        self._snapshot = snapshot
+        logger.info(f"Brand catalog updated to version {snapshot.version}")
+        return snapshot
@@ -0,0 +1,284 @@
+"""
+Concurrent, rate-limited crawler for brand websites
+Pages are fetched on a thread pool through one pooled requests session while an asyncio
+loop schedules them: a global semaphore caps concurrency across all brands being crawled
+and a token bucket per host keeps each site at a polite request rate
+"""
+
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from .brand_scraper import MAX_SITEMAP_PRODUCT_PAGES, BrandScraper
+from .sitemap import SitemapCollector
+from .http_cache import CachingHTTPAdapter, get_http_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_HOST_RATE = 1.0  # requests per second per host
+DEFAULT_HOST_BURST = 3
+MAX_PRODUCT_PAGES = 20
+
+ProgressCallback = Callable[[Dict], None]
+
+
+class TokenBucket:
+    """Async token bucket; each acquire takes one token, refilled at rate per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BrandCrawler:
+    """
+    Crawl brand websites concurrently with BrandScraper's parsers
+    Results have the same shape as BrandScraper.scrape_brand_website
+    """
+
+    def __init__(self, scraper: Optional[BrandScraper] = None, max_concurrency: int = DEFAULT_CONCURRENCY,
+                 host_rate: float = DEFAULT_HOST_RATE, host_burst: float = DEFAULT_HOST_BURST):
+        self.scraper = scraper or BrandScraper()
+        self.max_concurrency = max_concurrency
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+
+        # Keep-alive connections shared by every worker thread, in front of the HTTP cache
+        adapter = CachingHTTPAdapter(get_http_cache(), pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.scraper.session.mount('http://', adapter)
+        self.scraper.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='brand-crawler')
+        # Loop-bound primitives are created on first use inside the loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+        return bucket
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking call (request or HTML parsing) on the crawler's thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def fetch(self, url: str) -> bytes:
+        """Fetch a page politely: wait for the host's token, then for a global slot"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        await self._bucket(url).acquire()
+        async with self._semaphore:
+            response = await self.run_blocking(self.scraper.fetch, url)
+            return response.content
+
+    async def discover_sitemap(self, website: str) -> SitemapCollector:
+        """
+        Read the site's sitemaps (robots.txt Sitemap lines, else /sitemap.xml), following
+        sitemap indexes; every sitemap file is fetched politely, with its own host token
+        """
+        sitemap = SitemapCollector(website)
+        await self._bucket(website).acquire()
+        try:
+            robots = await self.run_blocking(self.scraper.get_robots_parser, website)
+            robots_sitemaps = robots.site_maps()
+        except Exception:
+            robots_sitemaps = None
+
+        pending = sitemap.start_urls(website, robots_sitemaps)
+        while pending:
+            url = pending.pop(0)
+            try:
+                body = await self.fetch(url)
+            except Exception as e:
+                logger.debug(f"No sitemap at {url}: {e}")
+                continue
+            pending.extend(await self.run_blocking(sitemap.add, body, url))
+
+        logger.info(f"Sitemap of {website}: {len(sitemap.products)} product and "
+                    f"{len(sitemap.categories)} category URLs")
+        return sitemap
+
+    async def crawl_brand(self, website: str, brand_name: str, progress: Optional[ProgressCallback] = None,
+                          previous: Optional[Dict[str, Dict]] = None) -> Dict:
+        """
+        Crawl one brand: the product pages listed in its sitemap, or when it lists none the
+        homepage first, then category and product pages concurrently
+        With previous page records (incremental mode), pages whose sitemap lastmod has not
+        moved are not fetched and pages whose body is unchanged are not parsed again; the
+        result then also carries the new page records, removed URLs and a change summary
+        """
+        state = {'pages_done': 0, 'pages_total': 1, 'products_found': 0}
+        incremental = previous is not None
+        pages: Dict[str, Dict] = {}
+        outcomes = {'added': 0, 'changed': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0}
+        crawled_at = datetime.now().isoformat()
+
+        def report():
+            if progress:
+                progress(dict(state))
+
+        try:
+            logger.info(f"Starting {'incremental' if incremental else 'concurrent'} crawl of {brand_name} ({website})")
+
+            if not await self.run_blocking(self.scraper.check_robots_allowed, website):
+                logger.warning(f"Scraping not allowed by robots.txt for {website}")
+                return {'error': 'Scraping not allowed by robots.txt'}
+
+            sitemap = await self.discover_sitemap(website)
+            lastmods = sitemap.lastmods
+            if sitemap.products:
+                # No navigation hops: the sitemap already names every product page
+                product_links = list(sitemap.products)[:MAX_SITEMAP_PRODUCT_PAGES]
+                categories = {}
+            else:
+                homepage = await self.fetch(website)
+                product_links, categories = await self.run_blocking(self.scraper.parse_homepage, homepage, website)
+                product_links = product_links[:MAX_PRODUCT_PAGES]
+                categories = categories or sitemap.category_names
+                state['pages_done'] = 1
+            state['pages_total'] = state['pages_done'] + len(categories) + len(product_links)
+            report()
+
+            async def crawl_page(kind, url):
+                record = previous.get(url) if incremental else None
+                lastmod = lastmods.get(url)
+                try:
+                    if record and lastmod and record.get('lastmod') and lastmod <= record['lastmod']:
+                        outcomes['skipped'] += 1
+                        pages[url] = dict(record, kind=kind)
+                        return record['data']
+
+                    body = await self.fetch(url)
+                    content_hash = hashlib.sha1(body).hexdigest()
+                    if record and record.get('content_hash') == content_hash:
+                        data = record['data']
+                        outcomes['unchanged'] += 1
+                    else:
+                        parse = self.scraper.parse_category_page if kind == 'category' else self.scraper.parse_product_page
+                        data = await self.run_blocking(parse, body, url, brand_name)
+                        if record is None:
+                            outcomes['added'] += 1
+                        else:
+                            outcomes['changed' if data != record['data'] else 'unchanged'] += 1
+
+                    pages[url] = {
+                        'kind': kind,
+                        'content_hash': content_hash,
+                        'lastmod': lastmod,
+                        'last_crawled': crawled_at,
+                        'data': data
+                    }
+                    return data
+                except Exception as e:
+                    logger.error(f"Error scraping {kind} {url}: {e}")
+                    outcomes['failed'] += 1
+                    # Keep what we knew about the page rather than dropping it on a transient error
+                    if record:
+                        pages[url] = record
+                        return record['data']
+                    return [] if kind == 'category' else None
+                finally:
+                    state['pages_done'] += 1
+                    report()
+
+            results = await asyncio.gather(
+                *(crawl_page('category', url) for url in categories.values()),
+                *(crawl_page('product', url) for url in product_links)
+            )
+            category_results, product_results = results[:len(categories)], results[len(categories):]
+
+            products_data = {
+                'brand': brand_name,
+                'website': website,
+                'categories': {name: products for name, products in zip(categories, category_results) if products},
+                'products': [product for product in product_results if product]
+            }
+            state['products_found'] = (sum(len(p) for p in products_data['categories'].values())
+                                       + len(products_data['products']))
+            report()
+
+            if incremental:
+                removed = [url for url in previous if url not in pages]
+                outcomes['removed'] = len(removed)
+                products_data['pages'] = pages
+                products_data['removed'] = removed
+                products_data['changes'] = outcomes
+                logger.info(f"Incremental crawl of {brand_name}: {outcomes}")
+            return products_data
+
+        except Exception as e:
+            logger.error(f"Error scraping {brand_name}: {e}")
+            return {'error': str(e)}
+
+    async def crawl_many(self, brands: List[Dict]) -> List[Dict]:
+        """Crawl several brands ({'website', 'brand_name'}) sharing the global concurrency limit"""
+        return await asyncio.gather(*(self.crawl_brand(b['website'], b['brand_name']) for b in brands))
+
+    def crawl(self, website: str, brand_name: str) -> Dict:
+        """Blocking convenience wrapper around crawl_brand"""
+        return get_crawl_loop().run(self.crawl_brand(website, brand_name))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class CrawlLoop:
+    """Background thread running the event loop shared by all crawls in this process"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='crawl-loop', daemon=True)
+        self._thread.start()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout: Optional[float] = None):
+        """Run a coroutine on the loop and wait for its result"""
+        return self.submit(coroutine).result(timeout)
+
+
+_crawl_loop: Optional[CrawlLoop] = None
+_crawler: Optional[BrandCrawler] = None
+_lock = threading.Lock()
+
+
+def get_crawl_loop() -> CrawlLoop:
+    global _crawl_loop
+    with _lock:
+        if _crawl_loop is None:
+            _crawl_loop = CrawlLoop()
+        return _crawl_loop
+
+
+def get_crawler() -> BrandCrawler:
+    """Process-wide crawler, so concurrency and per-host limits apply across requests and jobs"""
+    global _crawler
+    with _lock:
+        if _crawler is None:
+            _crawler = BrandCrawler()
+        return _crawler
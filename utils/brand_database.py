@@ -8,6 +8,8 @@ from bs4 import BeautifulSoup
 import json
 from typing import Dict, List, Optional
 import logging
+from .brand_catalog import BrandCatalog, CatalogSnapshot, normalize_tier
+from .brand_store import BrandStore, merge_brands
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +17,15 @@ logger = logging.getLogger(__name__)
 class BrandDatabase:
     """Database of furniture brands with web scraping capabilities"""
     
-    def __init__(self):
-        self.brands = self._initialize_brands()
+    def __init__(self, snapshot: Optional[CatalogSnapshot] = None):
+        # Pin one snapshot so every lookup made through this instance is consistent
+        self.snapshot = snapshot or get_catalog().snapshot()
+        self.brands = self.snapshot.brands
+        self.index = self.snapshot.index
+        self.version = self.snapshot.version
     
-    def _initialize_brands(self) -> Dict:
+    @staticmethod
+    def _initialize_brands() -> Dict:
         """Initialize the furniture brand database"""
         return {
             'budgetary': {
@@ -483,7 +490,7 @@ class BrandDatabase:
     
     def get_brands_by_tier_and_category(self, tier: str, category: str) -> List[Dict]:
         """Get all brands for a specific tier and category"""
-        tier_key = tier.lower().replace(' ', '_').replace('-', '_')
+        tier_key = normalize_tier(tier)
         category_key = category.lower()
         
         if tier_key in self.brands and category_key in self.brands[tier_key]:
@@ -492,38 +499,12 @@ class BrandDatabase:
     
     def get_brand_models(self, tier: str, category: str, brand_name: str) -> Dict:
         """Get all models for a specific brand"""
-        brands = self.get_brands_by_tier_and_category(tier, category)
-        
-        for brand in brands:
-            if brand['name'].lower() == brand_name.lower():
-                return brand.get('models', {})
-        return {}
+        brand = self.index.get_brand(brand_name, tier, category)
+        return brand.get('models', {}) if brand else {}
     
     def search_product(self, tier: str, category: str, subcategory: str, brand_name: Optional[str] = None) -> List[Dict]:
         """Search for products matching criteria"""
-        results = []
-        brands = self.get_brands_by_tier_and_category(tier, category)
-        
-        for brand in brands:
-            if brand_name and brand['name'].lower() != brand_name.lower():
-                continue
-            
-            models = brand.get('models', {})
-            if subcategory in models:
-                for model in models[subcategory]:
-                    results.append({
-                        'brand': brand['name'],
-                        'country': brand['country'],
-                        'website': brand['website'],
-                        'model': model['model'],
-                        'price_range': model['price_range'],
-                        'features': model['features'],
-                        'category': category,
-                        'subcategory': subcategory,
-                        'tier': tier
-                    })
-        
-        return results
+        return self.index.search_product(tier, category, subcategory, brand_name)
     
     def get_all_tiers(self) -> List[str]:
         """Get all available budget tiers"""
@@ -542,6 +523,18 @@ class BrandDatabase:
         return []
 
 
-# Create a global instance for easy access
-_db_instance = BrandDatabase()
-BRAND_DATABASE = _db_instance.brands
+def _load_catalog() -> Dict:
+    """Built-in brands merged with the custom brands persisted in the store"""
+    builtin = BrandDatabase._initialize_brands()
+    _store.import_legacy_json(builtin)
+    return merge_brands(builtin, _store.load_custom())
+
+
+# Shared catalog, loaded once per process on first access
+_store = BrandStore()
+_catalog = BrandCatalog(_load_catalog, store=_store)
+
+
+def get_catalog() -> BrandCatalog:
+    """Return the process-wide brand catalog"""
+    return _catalog
@@ -0,0 +1,82 @@
+"""
+Precomputed facet tree for the brand browser
+The whole tier/category/brand/subcategory/model tree is serialized once per catalog
+version, together with its gzip encoding and ETag, so clients can fetch it in one
+request and revalidate it cheaply
+"""
+
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from .brand_catalog import CatalogSnapshot
+from .brand_database import BrandDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class FacetPayload:
+    """Serialized facet tree for one catalog version"""
+
+    __slots__ = ('version', 'body', 'gzip_body', 'etag')
+
+    def __init__(self, version: int, tree: Dict):
+        self.version = version
+        self.body = json.dumps(tree, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6)
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+
+def build_facet_tree(brand_db: BrandDatabase) -> Dict:
+    """
+    tiers -> category -> brand name -> {country, website, models: {subcategory: [models]}}
+    Brands keep catalog order; subcategories without models are left out
+    """
+    categories = [c.lower() for c in brand_db.get_all_categories()]
+    subcategories = {category: brand_db.get_subcategories(category) for category in categories}
+
+    tiers = {}
+    for tier, tier_data in brand_db.brands.items():
+        tiers[tier] = {}
+        for category in categories:
+            brands = {}
+            for brand in tier_data.get(category, []):
+                # Same-named entries resolve to the first one, as in /api/brands/models
+                if brand['name'] in brands:
+                    continue
+                models = brand.get('models', {})
+                brands[brand['name']] = {
+                    'country': brand.get('country', 'Unknown'),
+                    'website': brand.get('website', ''),
+                    'models': {sub: models[sub] for sub in subcategories[category] if models.get(sub)}
+                }
+            tiers[tier][category] = brands
+
+    return {
+        'success': True,
+        'version': brand_db.version,
+        'subcategories': subcategories,
+        'tiers': tiers
+    }
+
+
+_payload: Optional[FacetPayload] = None
+_payload_lock = threading.Lock()
+
+
+def get_facet_payload(snapshot: CatalogSnapshot) -> FacetPayload:
+    """Facet payload for a catalog snapshot, rebuilt only when the catalog version changes"""
+    global _payload
+    payload = _payload
+    if payload is not None and payload.version == snapshot.version:
+        return payload
+
+    with _payload_lock:
+        if _payload is None or _payload.version != snapshot.version:
+            _payload = FacetPayload(snapshot.version, build_facet_tree(BrandDatabase(snapshot)))
+            logger.info(f"Built brand facets for catalog version {snapshot.version} "
+                        f"({len(_payload.body)} bytes, {len(_payload.gzip_body)} gzipped)")
+        return _payload
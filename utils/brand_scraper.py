@@ -9,12 +9,28 @@ import logging
 import time
 import re
 import json
+import threading
 from typing import Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse, urlencode
 import urllib.robotparser
 
+from .http_cache import CachingHTTPAdapter, get_http_cache
+from .sitemap import SitemapCollector
+from .structured_data import extract_structured_product
+from .html_parsing import (
+    CATEGORY_PAGE_STRAINER, HOMEPAGE_STRAINER, LINK_STRAINER, PRODUCT_PAGE_STRAINER, make_soup
+)
+
 logger = logging.getLogger(__name__)
 
+ROBOTS_TTL = 3600  # seconds a parsed robots.txt is reused per host
+MAX_SITEMAP_PRODUCT_PAGES = 100  # product pages the concurrent crawler reads when the sitemap lists them
+# The serial scraper runs inside a web request and sleeps between pages, so it stays small
+MAX_SERIAL_PRODUCT_PAGES = 20
+
+_robots_cache: Dict[str, Tuple[float, urllib.robotparser.RobotFileParser]] = {}
+_robots_lock = threading.Lock()
+
 
 class BrandScraper:
     """Web scraper for furniture brand websites with intelligent product detection"""
@@ -30,6 +46,10 @@ class BrandScraper:
         }
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        # Pages are cached on disk and revalidated with conditional requests
+        adapter = CachingHTTPAdapter(get_http_cache())
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.rate_limit_delay = 2  # seconds between requests
         
     def scrape_brand_website(self, website: str, brand_name: str) -> Dict:
@@ -45,14 +65,17 @@ class BrandScraper:
                 logger.warning(f"Scraping not allowed by robots.txt for {website}")
                 return {'error': 'Scraping not allowed by robots.txt'}
             
-            # Get homepage
-            response = self.session.get(website, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Detect website structure
-            product_links = self.find_product_pages(soup, website)
-            categories = self.detect_categories(soup, website)
+            # Go straight to the products listed in the sitemap; otherwise detect the
+            # website structure from the homepage
+            sitemap = self.discover_sitemap(website)
+            if sitemap.products:
+                product_links = list(sitemap.products)[:MAX_SERIAL_PRODUCT_PAGES]
+                categories = {}
+            else:
+                response = self.fetch(website)
+                product_links, categories = self.parse_homepage(response.content, website)
+                product_links = product_links[:MAX_SERIAL_PRODUCT_PAGES]
+                categories = categories or sitemap.category_names
             
             products_data = {
                 'brand': brand_name,
@@ -71,7 +94,7 @@ class BrandScraper:
                     products_data['categories'][category_name] = category_products
             
             # Also scrape direct product links
-            for product_url in product_links[:20]:  # Limit to 20 products
+            for product_url in product_links:
                 logger.info(f"Scraping product: {product_url}")
                 time.sleep(self.rate_limit_delay)
                 
@@ -85,6 +108,42 @@ class BrandScraper:
             logger.error(f"Error scraping {brand_name}: {e}")
             return {'error': str(e)}
     
+    def fetch(self, url: str, timeout: int = 15) -> requests.Response:
+        """GET a page through the shared session, raising on HTTP errors"""
+        response = self.session.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response
+    
+    def discover_sitemap(self, website: str) -> SitemapCollector:
+        """
+        Read the site's sitemaps (robots.txt Sitemap lines, else /sitemap.xml), following
+        sitemap indexes; missing or unreadable sitemaps just leave the collector empty
+        """
+        sitemap = SitemapCollector(website)
+        try:
+            robots_sitemaps = self.get_robots_parser(website).site_maps()
+        except Exception:
+            robots_sitemaps = None
+        
+        pending = sitemap.start_urls(website, robots_sitemaps)
+        while pending:
+            url = pending.pop(0)
+            try:
+                body = self.fetch(url).content
+            except Exception as e:
+                logger.debug(f"No sitemap at {url}: {e}")
+                continue
+            pending.extend(sitemap.add(body, url))
+        
+        logger.info(f"Sitemap of {website}: {len(sitemap.products)} product and "
+                    f"{len(sitemap.categories)} category URLs")
+        return sitemap
+    
+    def parse_homepage(self, html, base_url: str) -> Tuple[List[str], Dict[str, str]]:
+        """Parse a homepage into (product page URLs, {category name: category URL})"""
+        soup = make_soup(html, HOMEPAGE_STRAINER)
+        return self.find_product_pages(soup, base_url), self.detect_categories(soup, base_url)
+    
     def find_product_pages(self, soup: BeautifulSoup, base_url: str) -> List[str]:
         """Find product page URLs using various heuristics"""
         product_urls = set()
@@ -140,58 +199,71 @@ class BrandScraper:
     
     def scrape_category_page(self, url: str, brand_name: str) -> List[Dict]:
         """Scrape products from a category page"""
-        products = []
-        
         try:
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find product cards/items
-            product_containers = soup.find_all(['div', 'article'], class_=re.compile(r'(product|item|card)', re.I))
-            
-            for container in product_containers[:10]:  # Limit to 10 per category
-                product = self.extract_product_from_container(container, url, brand_name)
-                if product:
-                    products.append(product)
-            
-            return products
+            response = self.fetch(url)
+            return self.parse_category_page(response.content, url, brand_name)
             
         except Exception as e:
             logger.error(f"Error scraping category {url}: {e}")
             return []
     
+    def parse_category_page(self, html, url: str, brand_name: str) -> List[Dict]:
+        """Parse product cards from a category page"""
+        products = []
+        soup = make_soup(html, CATEGORY_PAGE_STRAINER)
+        
+        # Find product cards/items
+        product_containers = soup.find_all(['div', 'article'], class_=re.compile(r'(product|item|card)', re.I))
+        
+        for container in product_containers[:10]:  # Limit to 10 per category
+            product = self.extract_product_from_container(container, url, brand_name)
+            if product:
+                products.append(product)
+        
+        return products
+    
     def scrape_product_page(self, url: str, brand_name: str) -> Optional[Dict]:
         """Scrape detailed product information from product page"""
         try:
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract product information
-            title = self.extract_product_title(soup)
-            description = self.extract_product_description(soup)
-            image_url = self.extract_product_image(soup, url)
-            price = self.extract_product_price(soup)
-            features = self.extract_product_features(soup)
-            
-            if title:
-                return {
-                    'brand': brand_name,
-                    'model': title,
-                    'description': description,
-                    'image_url': image_url,
-                    'price': price,
-                    'features': features,
-                    'source_url': url
-                }
-            
-            return None
+            response = self.fetch(url)
+            return self.parse_product_page(response.content, url, brand_name)
             
         except Exception as e:
             logger.error(f"Error scraping product {url}: {e}")
             return None
     
+    def parse_product_page(self, html, url: str, brand_name: str) -> Optional[Dict]:
+        """
+        Parse detailed product information from a product page
+        Uses the page's schema.org Product data (JSON-LD or microdata) when present and
+        falls back to the heuristic DOM searches otherwise
+        """
+        structured = extract_structured_product(html, url)
+        if structured:
+            return {'brand': brand_name, **structured, 'source_url': url}
+        
+        soup = make_soup(html, PRODUCT_PAGE_STRAINER)
+        
+        # Extract product information
+        title = self.extract_product_title(soup)
+        description = self.extract_product_description(soup)
+        image_url = self.extract_product_image(soup, url)
+        price = self.extract_product_price(soup)
+        features = self.extract_product_features(soup)
+        
+        if title:
+            return {
+                'brand': brand_name,
+                'model': title,
+                'description': description,
+                'image_url': image_url,
+                'price': price,
+                'features': features,
+                'source_url': url
+            }
+        
+        return None
+    
     def extract_product_from_container(self, container: BeautifulSoup, base_url: str, brand_name: str) -> Optional[Dict]:
         """Extract product info from a container element"""
         try:
@@ -336,10 +408,7 @@ class BrandScraper:
     def check_robots_allowed(self, website: str) -> bool:
         """Check if scraping is allowed by robots.txt"""
         try:
-            rp = urllib.robotparser.RobotFileParser()
-            robots_url = urljoin(website, '/robots.txt')
-            rp.set_url(robots_url)
-            rp.read()
+            rp = self.get_robots_parser(website)
             
             # Check if our user agent can fetch the site
             return rp.can_fetch(self.headers['User-Agent'], website)
@@ -347,6 +416,32 @@ class BrandScraper:
             logger.warning(f"Could not read robots.txt: {e}")
             return True  # Allow by default if robots.txt is not accessible
     
+    def get_robots_parser(self, website: str) -> urllib.robotparser.RobotFileParser:
+        """Parsed robots.txt for a website's host, fetched through the cached session"""
+        parsed = urlparse(website)
+        host = f"{parsed.scheme}://{parsed.netloc}".lower()
+        
+        with _robots_lock:
+            cached = _robots_cache.get(host)
+        if cached and time.monotonic() - cached[0] < ROBOTS_TTL:
+            return cached[1]
+        
+        robots_url = urljoin(host, '/robots.txt')
+        rp = urllib.robotparser.RobotFileParser(robots_url)
+        response = self.session.get(robots_url, timeout=10)
+        
+        # Same status handling as RobotFileParser.read()
+        if response.status_code in (401, 403):
+            rp.disallow_all = True
+        elif response.status_code >= 400:
+            rp.allow_all = True
+        else:
+            rp.parse(response.text.splitlines())
+        
+        with _robots_lock:
+            _robots_cache[host] = (time.monotonic(), rp)
+        return rp
+    
     def get_product_image(self, brand_name: str, model_name: str, website: str) -> Optional[str]:
         """
         Search for product image on brand website
@@ -359,7 +454,7 @@ class BrandScraper:
             
             # Try to find product page
             response = self.session.get(website, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content, LINK_STRAINER)
             
             # Search for product link containing model name
             for link in soup.find_all('a', href=True):
@@ -384,7 +479,7 @@ class BrandScraper:
             
             # Try to find and scrape product page
             response = self.session.get(website, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content, LINK_STRAINER)
             
             # Search for product link
             for link in soup.find_all('a', href=True):
@@ -400,3 +495,46 @@ class BrandScraper:
         except Exception as e:
             logger.error(f"Error fetching description: {e}")
             return f"{brand_name} {model_name}"
+
+
+def scraped_to_models(scraped_data: Dict) -> Tuple[Dict[str, List[Dict]], str]:
+    """
+    Convert scraped brand data to the catalog's models format
+    Returns ({subcategory: [model entries]}, main category)
+    """
+    categories_data = {}
+    
+    def model_entry(product: Dict) -> Dict:
+        return {
+            'model': product.get('model', 'Unknown Model'),
+            'price_range': f"{int(product.get('price', 0))}-{int(product.get('price', 0) * 1.5)}" if product.get('price') else "Contact for price",
+            'features': product.get('features', [])[:5],  # Max 5 features
+            'image_url': product.get('image_url'),
+            'image_id': product.get('image_id'),
+            'description': product.get('description', ''),
+            'source_url': product.get('source_url')
+        }
+    
+    # Process category-based products
+    for category_name, products in scraped_data.get('categories', {}).items():
+        # Determine subcategory (simplified)
+        subcategory = 'general'
+        if 'chair' in category_name.lower() or 'seating' in category_name.lower():
+            subcategory = 'chairs'
+        elif 'desk' in category_name.lower() or 'table' in category_name.lower():
+            subcategory = 'desks'
+        
+        categories_data.setdefault(subcategory, []).extend(model_entry(p) for p in products)
+    
+    # Process standalone products
+    for product in scraped_data.get('products', []):
+        categories_data.setdefault('general', []).append(model_entry(product))
+    
+    # Determine main category
+    main_category = 'general'
+    if any('chair' in cat.lower() or 'seating' in cat.lower() for cat in categories_data):
+        main_category = 'seating'
+    elif any('desk' in cat.lower() or 'table' in cat.lower() for cat in categories_data):
+        main_category = 'desking'
+    
+    return categories_data, main_category
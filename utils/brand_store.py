@@ -0,0 +1,164 @@
+"""
+Persistent store for custom brands
+Brands added through the API or the scraper are kept in SQLite, one row per
+(tier, category, brand), so a single brand can be written without rewriting the catalog
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from .brand_catalog import normalize_tier
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join('utils', 'brand_catalog.db')
+LEGACY_JSON_PATH = os.path.join('utils', 'brand_database_custom.json')
+
+
+class BrandStore:
+    """SQLite-backed store of custom brands with a change counter shared by all workers"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets workers read while another writes"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            if not self._schema_ready:
+                with self._schema_lock:
+                    self._init_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS brands (
+                    tier TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    name_key TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    website TEXT,
+                    country TEXT,
+                    models TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (tier, category, name_key)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_brands_name ON brands (name_key)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_brands_seq ON brands (seq)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '1')")
+
+    def version(self) -> int:
+        """Change counter, bumped on every write by any process"""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def upsert_brand(self, tier: str, category: str, brand: Dict) -> int:
+        """Insert or replace one brand entry and return the new store version"""
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                INSERT INTO brands (tier, category, name_key, name, website, country, models, seq, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM brands), ?)
+                ON CONFLICT (tier, category, name_key) DO UPDATE SET
+                    name = excluded.name,
+                    website = excluded.website,
+                    country = excluded.country,
+                    models = excluded.models,
+                    updated_at = excluded.updated_at
+            ''', (
+                normalize_tier(tier),
+                category,
+                brand['name'].lower(),
+                brand['name'],
+                brand.get('website', ''),
+                brand.get('country', 'Unknown'),
+                json.dumps(brand.get('models', {}), separators=(',', ':')),
+                datetime.now().isoformat()
+            ))
+            conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+        return self.version()
+
+    def load_custom(self) -> List[Dict]:
+        """Return all custom brand rows in insertion order"""
+        rows = self._connect().execute(
+            'SELECT tier, category, name, website, country, models FROM brands ORDER BY seq'
+        ).fetchall()
+        return [{
+            'tier': tier,
+            'category': category,
+            'brand': {
+                'name': name,
+                'website': website,
+                'country': country,
+                'models': json.loads(models)
+            }
+        } for tier, category, name, website, country, models in rows]
+
+    def import_legacy_json(self, builtin: Dict, json_path: str = LEGACY_JSON_PATH):
+        """
+        One-time import of brand_database_custom.json, which held a full catalog dump
+        Only brands that differ from the built-in entries are imported
+        """
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        if os.path.exists(json_path):
+            try:
+                with open(json_path) as f:
+                    legacy = json.load(f)
+
+                imported = 0
+                for tier, categories in legacy.items():
+                    for category, brand_list in categories.items():
+                        builtin_brands = {b['name'].lower(): b for b in builtin.get(tier, {}).get(category, [])}
+                        for brand in brand_list:
+                            if builtin_brands.get(brand['name'].lower()) != brand:
+                                self.upsert_brand(tier, category, brand)
+                                imported += 1
+                logger.info(f"Imported {imported} custom brands from {json_path}")
+            except Exception as e:
+                logger.error(f"Error importing legacy brand file {json_path}: {e}")
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+
+
+def merge_brands(builtin: Dict, custom: List[Dict]) -> Dict:
+    """
+    Merge custom brand rows into the built-in catalog
+    Built-in order is kept; a custom brand replaces a same-named entry in place,
+    otherwise it is appended, in store insertion order
+    """
+    merged = {tier: {category: list(brands) for category, brands in categories.items()}
+              for tier, categories in builtin.items()}
+
+    for row in custom:
+        brand_list = merged.setdefault(row['tier'], {}).setdefault(row['category'], [])
+        name_key = row['brand']['name'].lower()
+        for i, existing in enumerate(brand_list):
+            if existing['name'].lower() == name_key:
+                brand_list[i] = row['brand']
+                break
+        else:
+            brand_list.append(row['brand'])
+
+    return merged
@@ -0,0 +1,202 @@
+"""
+Budget-constrained selection of value-engineering alternatives
+Chooses exactly one option per BOQ line (keep the original or take an alternative) so the
+project total stays within a budget, solved as a multiple-choice knapsack over
+discretized costs with the DP table vectorized in NumPy
+"""
+
+import logging
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ('similarity', 'deviation')
+
+
+class BudgetOptimizer:
+    """Multiple-choice knapsack solver for per-line option selection"""
+
+    MAX_REPAIRS = 3
+
+    def __init__(self, resolution: int = 5000):
+        # Number of cost buckets between the cheapest possible total and the budget
+        self.resolution = resolution
+
+    def solve(self, costs: Sequence[Sequence[float]], values: Sequence[Sequence[float]], budget: float) -> Dict:
+        """
+        Pick one option per line maximizing the summed value with total cost <= budget
+        costs/values hold one list per line; option 0 should be the original item
+        Returns {'feasible', 'choices', 'total_cost', 'total_value'}; when the budget cannot
+        be met the cheapest option of every line is returned with feasible False
+        """
+        n_lines = len(costs)
+        if n_lines == 0:
+            return {'feasible': True, 'choices': [], 'total_cost': 0.0, 'total_value': 0.0}
+
+        width = max(len(c) for c in costs)
+        cost_matrix = np.full((n_lines, width), np.inf)
+        value_matrix = np.full((n_lines, width), -np.inf)
+        for i, (line_costs, line_values) in enumerate(zip(costs, values)):
+            cost_matrix[i, :len(line_costs)] = line_costs
+            value_matrix[i, :len(line_values)] = line_values
+
+        # Work on cost above each line's cheapest option so buckets cover only the slack
+        min_costs = cost_matrix.min(axis=1)
+        if budget - min_costs.sum() < 0:
+            return self._result(False, cost_matrix.argmin(axis=1), cost_matrix, value_matrix)
+
+        # Costs are rounded to the nearest bucket, so rounding errors mostly cancel out;
+        # if the real total still overshoots, tighten the budget by the overshoot and retry
+        effective_budget = budget
+        for _ in range(self.MAX_REPAIRS):
+            choices = self._solve_buckets(cost_matrix - min_costs[:, None], value_matrix,
+                                          effective_budget - min_costs.sum(), np.rint)
+            if choices is None:
+                break
+            overshoot = cost_matrix[np.arange(n_lines), choices].sum() - budget
+            if overshoot <= 1e-9:
+                return self._result(True, choices, cost_matrix, value_matrix)
+            effective_budget -= overshoot + (effective_budget - min_costs.sum()) / self.resolution
+
+        # Rounding every cost up always fits the budget, at the price of some slack
+        choices = self._solve_buckets(cost_matrix - min_costs[:, None], value_matrix,
+                                      budget - min_costs.sum(), np.ceil)
+        if choices is None:
+            return self._result(False, cost_matrix.argmin(axis=1), cost_matrix, value_matrix)
+        return self._result(True, choices, cost_matrix, value_matrix)
+
+    def _solve_buckets(self, extra: np.ndarray, value_matrix: np.ndarray, slack: float, rounding):
+        """DP over discretized extra cost; returns the chosen option per line or None"""
+        if slack < 0:
+            return None
+        n_lines, width = extra.shape
+        unit = slack / self.resolution if slack > 0 else 1.0
+        n_buckets = self.resolution + 1 if slack > 0 else 1
+        with np.errstate(invalid='ignore'):
+            buckets = np.where(np.isfinite(extra), rounding(extra / unit - 1e-9), n_buckets)
+        buckets = buckets.astype(np.int64)
+
+        dp = np.full(n_buckets, -np.inf)
+        dp[0] = 0.0
+        choice = np.zeros((n_lines, n_buckets), dtype=np.int16)
+
+        for i in range(n_lines):
+            best = np.full(n_buckets, -np.inf)
+            best_option = np.zeros(n_buckets, dtype=np.int16)
+            for k in range(width):
+                shift = buckets[i, k]
+                if shift >= n_buckets or not np.isfinite(value_matrix[i, k]):
+                    continue
+                candidate = np.full(n_buckets, -np.inf)
+                candidate[shift:] = dp[:n_buckets - shift] + value_matrix[i, k]
+                # Strict comparison keeps the earlier option (the original) on ties
+                better = candidate > best
+                best[better] = candidate[better]
+                best_option[better] = k
+            dp = best
+            choice[i] = best_option
+
+        end = int(np.argmax(dp))
+        if not np.isfinite(dp[end]):
+            return None
+
+        choices = np.zeros(n_lines, dtype=np.int64)
+        for i in range(n_lines - 1, -1, -1):
+            k = choice[i, end]
+            choices[i] = k
+            end -= buckets[i, k]
+        return choices
+
+    def _result(self, feasible: bool, choices: np.ndarray, cost_matrix: np.ndarray, value_matrix: np.ndarray) -> Dict:
+        rows = np.arange(len(choices))
+        return {
+            'feasible': feasible,
+            'choices': [int(k) for k in choices],
+            'total_cost': float(cost_matrix[rows, choices].sum()),
+            'total_value': float(value_matrix[rows, choices].sum())
+        }
+
+
+def line_options(entry: Dict, objective: str) -> List[Dict]:
+    """
+    Options for one value-engineering line: the original item followed by its alternatives
+    Values are similarity to the specified item, or negative price deviation from it
+    """
+    item = entry['original_item']
+    original_total = item.get('total') or item.get('unit_rate', 0) * item.get('qty', 0)
+
+    options = [{'alternative': None, 'total': float(original_total), 'similarity': 1.0}]
+    for index, alt in enumerate(entry.get('alternatives', [])):
+        options.append({
+            'alternative': index,
+            'total': float(alt.get('total', 0)),
+            'similarity': float(alt.get('similarity', 0.0))
+        })
+
+    for option in options:
+        if objective == 'deviation':
+            option['value'] = -abs(option['total'] - original_total) / max(original_total, 1.0)
+        else:
+            option['value'] = option['similarity']
+    return options
+
+
+def optimize_alternatives(alternatives: List[Dict], target_total: float, objective: str = 'similarity',
+                          optimizer: BudgetOptimizer = None) -> Dict:
+    """Select one option per line under target_total and report the savings breakdown"""
+    if objective not in OBJECTIVES:
+        raise Exception(f'Unknown objective: {objective}. Use one of {", ".join(OBJECTIVES)}')
+
+    options = [line_options(entry, objective) for entry in alternatives]
+    solution = (optimizer or BudgetOptimizer()).solve(
+        [[o['total'] for o in line] for line in options],
+        [[o['value'] for o in line] for line in options],
+        target_total
+    )
+
+    lines = []
+    savings_by_category = {}
+    original_total = 0.0
+    for line_number, (entry, line, k) in enumerate(zip(alternatives, options, solution['choices']), 1):
+        item = entry['original_item']
+        chosen = line[k]
+        original = line[0]['total']
+        original_total += original
+        savings = original - chosen['total']
+
+        selected = {
+            'line': line_number,
+            'description': item.get('description', ''),
+            'category': item.get('category', 'general'),
+            'alternative_index': chosen['alternative'],
+            'original_total': round(original, 2),
+            'selected_total': round(chosen['total'], 2),
+            'savings': round(savings, 2),
+            'similarity': round(chosen['similarity'], 3)
+        }
+        if chosen['alternative'] is not None:
+            alt = entry['alternatives'][chosen['alternative']]
+            selected['brand'] = alt.get('brand', '')
+            selected['model'] = alt.get('model', '')
+        lines.append(selected)
+
+        category = selected['category']
+        savings_by_category[category] = round(savings_by_category.get(category, 0.0) + savings, 2)
+
+    optimized_total = solution['total_cost']
+    logger.info(f"Optimized {len(lines)} lines: {original_total:.2f} -> {optimized_total:.2f} (target {target_total:.2f})")
+
+    return {
+        'feasible': solution['feasible'],
+        'objective': objective,
+        'target_total': round(target_total, 2),
+        'original_total': round(original_total, 2),
+        'optimized_total': round(optimized_total, 2),
+        'savings': round(original_total - optimized_total, 2),
+        'savings_percent': round((original_total - optimized_total) / original_total * 100, 2) if original_total else 0.0,
+        'changed_lines': sum(1 for line in lines if line['alternative_index'] is not None),
+        'savings_by_category': savings_by_category,
+        'lines': lines
+    }
@@ -0,0 +1,197 @@
+"""
+Full-text search over the brand catalog
+An in-memory inverted index over brand, model, subcategory, features, description and
+country with BM25 weights precomputed per posting; queries accumulate scores into dense
+NumPy arrays, so cost grows with the number of matching postings rather than with catalog size
+"""
+
+import re
+import math
+import time
+import logging
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .brand_catalog import CatalogIndex, normalize_tier
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Field boosts: a hit in the model name says more than a hit in the feature list
+FIELD_WEIGHTS = {
+    'model': 3.0,
+    'brand': 2.0,
+    'subcategory': 1.5,
+    'features': 1.0,
+    'description': 0.5,  # scraped prose: many words, each one weak evidence
+    'country': 1.0
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 256
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(str(text or '').lower())
+
+
+class CatalogSearchIndex:
+    """Inverted index with prefix expansion and tier/category/price/country filters"""
+
+    def __init__(self, index: CatalogIndex):
+        self.index = index
+        n = len(index.products)
+
+        term_docs: Dict[str, Dict[int, float]] = {}
+        lengths = np.zeros(n, dtype=np.float32)
+        for doc_id, product in enumerate(index.products):
+            fields = {
+                'model': product['model'],
+                'brand': product['brand'],
+                'subcategory': product['subcategory'].replace('_', ' '),
+                'features': ' '.join(product.get('features', [])),
+                'description': product.get('description', ''),
+                'country': product['country']
+            }
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(text):
+                    postings = term_docs.setdefault(token, {})
+                    postings[doc_id] = postings.get(doc_id, 0.0) + weight
+                    lengths[doc_id] += 1
+
+        average_length = float(lengths.mean()) if n else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average_length, 1.0))
+
+        self.terms: List[str] = sorted(term_docs)
+        self.postings: Dict[str, np.ndarray] = {}
+        self.weights: Dict[str, np.ndarray] = {}
+        for term in self.terms:
+            docs = term_docs[term]
+            ids = np.fromiter(docs.keys(), dtype=np.int64, count=len(docs))
+            tf = np.fromiter(docs.values(), dtype=np.float32, count=len(docs))
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = ids
+            self.weights[term] = (idf * tf * (BM25_K1 + 1) / (tf + norm[ids])).astype(np.float32)
+
+        # Filter columns as integer codes so each filter is one vectorized comparison
+        self._tiers, self.tier_codes = self._encode([p['tier'] for p in index.products])
+        self._categories, self.category_codes = self._encode([p['category'] for p in index.products])
+        self._countries, self.country_codes = self._encode([(p['country'] or '').lower() for p in index.products])
+
+        logger.info(f"Built catalog search index: {n} models, {len(self.terms)} terms")
+
+    @staticmethod
+    def _encode(values: List[str]):
+        codes = {}
+        encoded = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int32, count=len(values))
+        return codes, encoded
+
+    def expand(self, token: str, prefix: bool) -> List[str]:
+        """Terms matching a query token; with prefix, every indexed term starting with it"""
+        if not prefix:
+            return [token] if token in self.postings else []
+        matches = []
+        position = bisect_left(self.terms, token)
+        while position < len(self.terms) and self.terms[position].startswith(token):
+            matches.append(self.terms[position])
+            if len(matches) >= MAX_PREFIX_EXPANSIONS:
+                break
+            position += 1
+        return matches
+
+    def _filter_mask(self, tier, category, country, min_price, max_price) -> Optional[np.ndarray]:
+        mask = None
+
+        def combine(current, condition):
+            return condition if current is None else current & condition
+
+        if tier:
+            code = self._tiers.get(normalize_tier(tier), -1)
+            mask = combine(mask, self.tier_codes == code)
+        if category:
+            code = self._categories.get(category.lower(), -1)
+            mask = combine(mask, self.category_codes == code)
+        if country:
+            code = self._countries.get(country.lower(), -1)
+            mask = combine(mask, self.country_codes == code)
+        # Price filters keep models whose price range overlaps the requested range
+        if min_price is not None:
+            mask = combine(mask, self.index.max_price >= min_price)
+        if max_price is not None:
+            mask = combine(mask, self.index.min_price <= max_price)
+        return mask
+
+    def search(self, query: str = '', tier: Optional[str] = None, category: Optional[str] = None,
+               country: Optional[str] = None, min_price: Optional[float] = None,
+               max_price: Optional[float] = None, limit: int = 20, offset: int = 0) -> Dict:
+        """
+        Search models; every query word must match, the last one also as a prefix
+        ('narbutas nav' finds Narbutas Navigo). Without a query, filtered models are listed
+        in catalog order
+        """
+        started = time.perf_counter()
+        n = len(self.index.products)
+        tokens = tokenize(query)
+        mask = self._filter_mask(tier, category, country, min_price, max_price)
+
+        if tokens:
+            scores = np.zeros(n, dtype=np.float32)
+            matched = np.zeros(n, dtype=np.int32)
+            for position, token in enumerate(tokens):
+                # Single characters would expand to a large slice of the vocabulary
+                prefix = position == len(tokens) - 1 and len(token) > 1
+                hit = np.zeros(n, dtype=bool)
+                for term in self.expand(token, prefix):
+                    ids = self.postings[term]
+                    scores[ids] += self.weights[term]
+                    hit[ids] = True
+                matched += hit
+            candidates = matched == len(tokens)
+            if mask is not None:
+                candidates &= mask
+            ids = np.flatnonzero(candidates)
+            total = len(ids)
+            # Only the requested page needs a full sort; ties keep catalog order
+            wanted = offset + limit
+            if total > wanted:
+                ids = np.sort(ids[np.argpartition(-scores[ids], wanted - 1)[:wanted]])
+            ids = ids[np.argsort(-scores[ids], kind='stable')]
+        else:
+            scores = None
+            ids = np.flatnonzero(mask) if mask is not None else np.arange(n)
+            total = len(ids)
+
+        page = ids[offset:offset + limit]
+        results = []
+        for doc_id in page.tolist():
+            result = dict(self.index.products[doc_id])
+            result['score'] = round(float(scores[doc_id]), 4) if scores is not None else 0.0
+            results.append(result)
+
+        return {
+            'query': query,
+            'total': int(total),
+            'results': results,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(index: CatalogIndex) -> CatalogSearchIndex:
+    """Search index for a catalog index, built once per catalog snapshot"""
+    with _indexes_lock:
+        search_index = _indexes.get(index)
+        if search_index is None:
+            search_index = CatalogSearchIndex(index)
+            _indexes[index] = search_index
+        return search_index
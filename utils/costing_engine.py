@@ -1,10 +1,18 @@
 import pandas as pd
+import numpy as np
 import json
 import re
+import hashlib
+import logging
+from .scenario_store import ScenarioStore
+
+logger = logging.getLogger(__name__)
 
 class CostingEngine:
     """Apply costing factors to extracted tables"""
     
+    ITEM_CODE_HEADERS = ['item code', 'code', 'item no', 'item no.', 'ref', 'ref.', 'reference']
+    
     def __init__(self):
         self.default_factors = {
             'net_margin': 0,
@@ -59,10 +67,84 @@ class CostingEngine:
             'original_table': table_data if table_data else tables_data[0],
             'session_id': session.get('session_id', '')
         }
+        
+        # Keep an append-only history so revisions can be compared later
+        try:
+            columns, keys, labels, prices = self.build_price_matrix(updated_tables)
+            store = ScenarioStore(session.get('session_id', ''), file_id)
+            scenario = store.append(factors, columns, keys, labels, prices)
+            file_info['costed_data']['scenario_id'] = scenario['id']
+        except Exception as e:
+            logger.error(f"Error recording costing scenario: {e}")
+        
         session.modified = True
         
         return updated_tables
     
+    def build_price_matrix(self, tables):
+        """
+        Flatten costed tables into a price matrix for the scenario store
+        Returns: (price columns, row keys, row labels, float matrix with NaN for missing values)
+        """
+        columns = []
+        for table in tables:
+            for col in self.identify_price_columns(table.get('headers', [])):
+                if col not in columns:
+                    columns.append(col)
+        
+        keys = []
+        labels = []
+        prices = []
+        seen = {}
+        for table in tables:
+            headers = table.get('headers', [])
+            code_col = next((h for h in headers if h.lower() in self.ITEM_CODE_HEADERS), None)
+            # "Item" is often just the serial number, so a description column wins
+            label_col = next((h for h in headers if 'description' in h.lower()), None) or \
+                next((h for h in headers if 'item' in h.lower() and h.lower() not in self.ITEM_CODE_HEADERS), None)
+            price_cols = set(self.identify_price_columns(headers))
+            content_cols = [h for h in headers if h not in price_cols and 'image' not in h.lower()]
+            
+            for row in table.get('rows', []):
+                key = self.row_key(row, code_col, label_col, content_cols)
+                # Repeated rows keep their order among themselves
+                seen[key] = seen.get(key, 0) + 1
+                keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+                label = re.sub(r'<[^>]+>', '', str(row.get(label_col, ''))) if label_col else ''
+                labels.append(label.strip()[:80])
+                
+                values = []
+                for col in columns:
+                    value = self.extract_number(row[col]) if col in row else None
+                    values.append(np.nan if value is None else value)
+                prices.append(values)
+        
+        matrix = np.array(prices, dtype=float).reshape(len(keys), len(columns))
+        return columns, keys, labels, matrix
+    
+    def row_key(self, row, code_col, label_col, content_cols):
+        """
+        Scenario row key that survives rows being inserted or removed around it:
+        the item code when the table has one, else a hash of the description
+        (or of every non-price cell when there is no description column).
+        Plain numbers are serial numbers, which shift on insert, and are not used
+        """
+        def text(value):
+            return ' '.join(re.sub(r'<[^>]+>', ' ', str(value)).split()).lower()
+        
+        def usable(value):
+            return value and not value.replace('.', '').isdigit()
+        
+        code = text(row.get(code_col, '')) if code_col else ''
+        if usable(code):
+            return f"code:{code}"
+        label = text(row.get(label_col, '')) if label_col else ''
+        if usable(label):
+            content = label
+        else:
+            content = '|'.join(text(row.get(col, '')) for col in content_cols if col not in (code_col, label_col))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+    
     def parse_markdown_tables(self, extraction_result):
         """
         Parse markdown tables from extraction result
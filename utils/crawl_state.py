@@ -0,0 +1,138 @@
+"""
+Crawl state for incremental brand re-crawls
+Remembers, per brand, every page crawled with its content hash, sitemap lastmod,
+last crawl time and parsed result, so later crawls can skip unchanged pages
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from .brand_store import DEFAULT_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlStateStore:
+    """SQLite-backed per-brand page state, stored next to the custom brands"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            if not self._schema_ready:
+                with self._schema_lock:
+                    self._init_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_brands (
+                    brand_key TEXT PRIMARY KEY,
+                    brand_name TEXT NOT NULL,
+                    website TEXT NOT NULL,
+                    tier TEXT NOT NULL,
+                    country TEXT,
+                    last_crawled TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_pages (
+                    brand_key TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    content_hash TEXT,
+                    lastmod TEXT,
+                    last_crawled TEXT NOT NULL,
+                    data TEXT,
+                    PRIMARY KEY (brand_key, url)
+                )
+            ''')
+
+    @staticmethod
+    def brand_key(brand_name: str) -> str:
+        return brand_name.strip().lower()
+
+    def load_pages(self, brand_name: str) -> Dict[str, Dict]:
+        """Previous page records of a brand, keyed by URL"""
+        rows = self._connect().execute(
+            'SELECT url, kind, content_hash, lastmod, last_crawled, data FROM crawl_pages WHERE brand_key = ?',
+            (self.brand_key(brand_name),)
+        ).fetchall()
+        return {url: {
+            'kind': kind,
+            'content_hash': content_hash,
+            'lastmod': lastmod,
+            'last_crawled': last_crawled,
+            'data': json.loads(data) if data else None
+        } for url, kind, content_hash, lastmod, last_crawled, data in rows}
+
+    def save_crawl(self, brand_name: str, website: str, tier: str, country: str,
+                   pages: Dict[str, Dict], removed: Iterable[str]):
+        """Record a finished crawl: upsert the pages seen and forget the ones that disappeared"""
+        key = self.brand_key(brand_name)
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                INSERT INTO crawl_brands (brand_key, brand_name, website, tier, country, last_crawled)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (brand_key) DO UPDATE SET
+                    brand_name = excluded.brand_name,
+                    website = excluded.website,
+                    tier = excluded.tier,
+                    country = excluded.country,
+                    last_crawled = excluded.last_crawled
+            ''', (key, brand_name, website, tier, country, now))
+            conn.executemany('''
+                INSERT OR REPLACE INTO crawl_pages (brand_key, url, kind, content_hash, lastmod, last_crawled, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                key, url, page['kind'], page.get('content_hash'), page.get('lastmod'),
+                page.get('last_crawled') or now, json.dumps(page.get('data'), separators=(',', ':'))
+            ) for url, page in pages.items()])
+            conn.executemany('DELETE FROM crawl_pages WHERE brand_key = ? AND url = ?',
+                             [(key, url) for url in removed])
+
+    def crawled_brands(self) -> List[Dict]:
+        """Brands with crawl state, least recently crawled first"""
+        rows = self._connect().execute(
+            'SELECT brand_name, website, tier, country, last_crawled FROM crawl_brands ORDER BY last_crawled'
+        ).fetchall()
+        return [{
+            'brand_name': brand_name,
+            'website': website,
+            'tier': tier,
+            'country': country,
+            'last_crawled': last_crawled
+        } for brand_name, website, tier, country, last_crawled in rows]
+
+
+_state_store: Optional[CrawlStateStore] = None
+_state_lock = threading.Lock()
+
+
+def get_crawl_state() -> CrawlStateStore:
+    global _state_store
+    with _state_lock:
+        if _state_store is None:
+            _state_store = CrawlStateStore()
+        return _state_store
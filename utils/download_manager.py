@@ -2,13 +2,19 @@ import os
 import json
 from datetime import datetime
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.drawing.image import Image as XLImage
 import shutil
-import zipfile
 import re
+from .excel_stream_writer import StreamingExcelWriter
+from .zip_stream import stream_zip
+from .artifact_registry import build_artifact, get_artifact_registry, inputs_hash
+from .page_cache import file_signature
+
+# Folder of each generated document kind in the download-all ZIP
+BUNDLE_FOLDERS = {'offer': 'offers', 'presentation': 'presentations', 'mas': 'mas'}
+# Formats of the documents those folders held before the artifact registry
+LEGACY_FORMATS = ('pdf', 'pptx')
+# Bump when the exported workbooks' layout changes, so earlier exports are not reused
+EXCEL_TEMPLATE_VERSION = 1
 
 class DownloadManager:
     """Manage downloads of all generated artifacts"""
@@ -48,18 +54,7 @@ class DownloadManager:
         if format_type not in self.supported_formats:
             raise Exception(f'Unsupported format: {format_type}')
         
-        # Get file info
-        uploaded_files = session.get('uploaded_files', [])
-        file_info = None
-        
-        for f in uploaded_files:
-            if f['id'] == file_id:
-                file_info = f
-                break
-        
-        if not file_info:
-            raise Exception('File not found')
-        
+        file_info = self.get_file_info(file_id, session)
         session_id = session['session_id']
         
         # Handle different file types
@@ -78,17 +73,21 @@ class DownloadManager:
         else:
             raise Exception(f'Unknown file type: {file_type}')
     
+    def get_file_info(self, file_id, session):
+        """Uploaded file entry for file_id in the session"""
+        for f in session.get('uploaded_files', []):
+            if f['id'] == file_id:
+                return f
+        raise Exception('File not found')
+    
     def prepare_extraction_download(self, file_info, format_type, session_id):
         """Prepare extracted table data for download"""
         if 'extraction_result' not in file_info:
             raise Exception('No extraction data available')
         
-        extraction_result = file_info['extraction_result']
-        output_dir = os.path.join('outputs', session_id, 'downloads')
-        os.makedirs(output_dir, exist_ok=True)
-        
         if format_type in ['xlsx', 'xls']:
-            return self.create_extraction_excel(extraction_result, output_dir, file_info['id'])
+            return self.excel_artifact('extraction', file_info['extraction_result'], file_info, session_id,
+                                       self.create_extraction_excel)
         elif format_type == 'pdf':
             # Return existing extraction output if available
             if 'output_dir' in file_info:
@@ -105,67 +104,32 @@ class DownloadManager:
         if 'costed_data' not in file_info:
             raise Exception('No costed data available. Apply costing first.')
         
-        costed_data = file_info['costed_data']
-        output_dir = os.path.join('outputs', session_id, 'downloads')
-        os.makedirs(output_dir, exist_ok=True)
-        
         if format_type in ['xlsx', 'xls']:
-            return self.create_offer_excel(costed_data, output_dir, file_info['id'])
+            return self.excel_artifact('offer', file_info['costed_data'], file_info, session_id,
+                                       self.create_offer_excel)
         elif format_type == 'pdf':
-            # Check if offer PDF was generated
-            offer_dir = os.path.join('outputs', session_id, 'offers')
-            if os.path.exists(offer_dir):
-                pdf_files = [f for f in os.listdir(offer_dir) if f.endswith('.pdf') and file_info['id'] in f]
-                if pdf_files:
-                    return os.path.join(offer_dir, pdf_files[0])
-            raise Exception('Offer PDF not generated yet')
+            return self.latest_document(file_info, session_id, 'offer', 'pdf', 'Offer PDF not generated yet')
         
         raise Exception(f'Format {format_type} not supported for offers')
     
     def prepare_presentation_download(self, file_info, format_type, session_id):
         """Prepare presentation for download"""
-        presentation_dir = os.path.join('outputs', session_id, 'presentations')
-        
-        if not os.path.exists(presentation_dir):
-            raise Exception('Presentation not generated yet')
-        
-        # Look for files with the correct extension
-        if format_type == 'pptx':
-            files = [f for f in os.listdir(presentation_dir) if f.endswith('.pptx') and file_info['id'] in f]
-        else:  # pdf
-            files = [f for f in os.listdir(presentation_dir) if f.endswith('.pdf') and file_info['id'] in f]
-        
-        if files:
-            # Return the most recent file
-            files.sort(reverse=True)
-            return os.path.join(presentation_dir, files[0])
-        
-        raise Exception(f'Presentation file ({format_type}) not found')
+        fmt = 'pptx' if format_type == 'pptx' else 'pdf'
+        return self.latest_document(file_info, session_id, 'presentation', fmt,
+                                    f'Presentation file ({format_type}) not found')
     
     def prepare_mas_download(self, file_info, format_type, session_id):
         """Prepare MAS for download"""
-        mas_dir = os.path.join('outputs', session_id, 'mas')
-        
-        if not os.path.exists(mas_dir):
-            raise Exception('MAS not generated yet')
-        
-        pdf_files = [f for f in os.listdir(mas_dir) if f.endswith('.pdf') and file_info['id'] in f]
-        if pdf_files:
-            return os.path.join(mas_dir, pdf_files[0])
-        
-        raise Exception('MAS file not found')
+        return self.latest_document(file_info, session_id, 'mas', 'pdf', 'MAS not generated yet')
     
     def prepare_ve_download(self, file_info, format_type, session_id):
         """Prepare value engineering alternatives for download"""
         if 'value_engineering' not in file_info:
             raise Exception('Value engineering not performed yet')
         
-        ve_data = file_info['value_engineering']
-        output_dir = os.path.join('outputs', session_id, 'downloads')
-        os.makedirs(output_dir, exist_ok=True)
-        
         if format_type in ['xlsx', 'xls']:
-            return self.create_ve_excel(ve_data, output_dir, file_info['id'])
+            return self.excel_artifact('ve', file_info['value_engineering'], file_info, session_id,
+                                       self.create_ve_excel)
         
         raise Exception(f'Format {format_type} not supported for value engineering')
     
@@ -174,289 +138,280 @@ class DownloadManager:
         output_dir = os.path.join('outputs', session_id, 'downloads')
         os.makedirs(output_dir, exist_ok=True)
         
-        zip_filename = os.path.join(output_dir, f'all_documents_{file_info["id"]}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip')
+        zip_filename = os.path.join(output_dir, self.all_downloads_name(file_info))
         
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add extraction data
-            if 'extraction_result' in file_info:
-                try:
-                    excel_file = self.create_extraction_excel(
-                        file_info['extraction_result'], 
-                        output_dir, 
-                        file_info['id']
-                    )
-                    zipf.write(excel_file, os.path.basename(excel_file))
-                except:
-                    pass
-            
-            # Add offer
-            if 'costed_data' in file_info:
-                try:
-                    offer_file = self.create_offer_excel(
-                        file_info['costed_data'], 
-                        output_dir, 
-                        file_info['id']
-                    )
-                    zipf.write(offer_file, os.path.basename(offer_file))
-                except:
-                    pass
-            
-            # Add PDFs from various directories
-            for subdir in ['offers', 'presentations', 'mas']:
-                dir_path = os.path.join('outputs', session_id, subdir)
-                if os.path.exists(dir_path):
-                    for filename in os.listdir(dir_path):
-                        if file_info['id'] in filename:
-                            file_path = os.path.join(dir_path, filename)
-                            zipf.write(file_path, f'{subdir}/{filename}')
+        with open(zip_filename, 'wb') as f:
+            for chunk in stream_zip(self.iter_all_documents(file_info, session_id)):
+                f.write(chunk)
         
         return zip_filename
     
-    def create_extraction_excel(self, extraction_result, output_dir, file_id):
-        """Create Excel file from extraction result"""
-        filename = os.path.join(output_dir, f'extraction_{file_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
-        
-        wb = Workbook()
-        
-        # Add logo to first sheet if available
-        logo_path = self.get_logo_path()
-        if logo_path and os.path.exists(logo_path):
+    def stream_all_downloads(self, file_id, session):
+        """
+        ZIP of all generated documents as (filename, byte chunk iterator); nothing is
+        written to disk for the archive itself and the Excel files are made as it gets to them
+        """
+        file_info = self.get_file_info(file_id, session)
+        return self.all_downloads_name(file_info), stream_zip(self.iter_all_documents(file_info, session['session_id']))
+    
+    def all_downloads_name(self, file_info):
+        return f'all_documents_{file_info["id"]}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+    
+    def iter_all_documents(self, file_info, session_id):
+        """(archive name, path) of every document for a file; files already on disk come first"""
+        self.register_legacy_documents(file_info, session_id)
+        
+        # Latest generated PDFs and decks
+        for artifact in get_artifact_registry().latest_all(session_id, file_info['id']):
+            if artifact['kind'] in BUNDLE_FOLDERS and artifact['format'] != 'xlsx':
+                yield f"{BUNDLE_FOLDERS[artifact['kind']]}/{os.path.basename(artifact['path'])}", artifact['path']
+        
+        # Extraction data and offer, generated only once the archive reaches them
+        for key, kind, create_excel in (('extraction_result', 'extraction', self.create_extraction_excel),
+                                        ('costed_data', 'offer', self.create_offer_excel)):
+            if key not in file_info:
+                continue
             try:
-                ws_logo = wb.active
-                ws_logo.title = 'Cover'
-                img = XLImage(logo_path)
-                img.width = 200
-                img.height = 200 * (img.height / img.width)
-                ws_logo.add_image(img, 'B2')
-                ws_logo['B8'] = 'ALSHAYA ENTERPRISES'
-                ws_logo['B8'].font = Font(bold=True, size=16)
-                ws_logo['B9'] = 'Extracted Table Data'
-                ws_logo['B9'].font = Font(size=12)
+                excel_file = self.excel_artifact(kind, file_info[key], file_info, session_id, create_excel)
             except Exception:
-                wb.remove(wb.active)
+                continue
+            yield os.path.basename(excel_file), excel_file
+    
+    def latest_document(self, file_info, session_id, kind, fmt, missing_message):
+        """Path of the latest generated document of a kind and format"""
+        registry = get_artifact_registry()
+        artifact = registry.latest(session_id, file_info['id'], kind, fmt)
+        if not artifact and self.register_legacy_documents(file_info, session_id):
+            artifact = registry.latest(session_id, file_info['id'], kind, fmt)
+        if not artifact:
+            raise Exception(missing_message)
+        return artifact['path']
+    
+    def register_legacy_documents(self, file_info, session_id):
+        """
+        Register documents generated before the artifact registry (the newest of each kind
+        and format in its output folder) when none is registered, so they can still be
+        downloaded; they are keyed apart from any real inputs and never reused for a build.
+        Returns how many were registered
+        """
+        registry = get_artifact_registry()
+        registered = 0
+        for kind, folder in BUNDLE_FOLDERS.items():
+            directory = os.path.join('outputs', session_id, folder)
+            if not os.path.isdir(directory):
+                continue
+            for fmt in LEGACY_FORMATS:
+                if registry.latest(session_id, file_info['id'], kind, fmt):
+                    continue
+                paths = [os.path.join(directory, name) for name in os.listdir(directory)
+                         if name.endswith(f'.{fmt}') and file_info['id'] in name]
+                if paths:
+                    path = max(paths, key=os.path.getmtime)
+                    registry.record(session_id, file_info['id'], kind, fmt, path, inputs_hash('legacy', path))
+                    registered += 1
+        return registered
+    
+    def excel_artifact(self, kind, data, file_info, session_id, create_excel):
+        """Workbook exported from data, reusing the one already written from the same inputs"""
+        output_dir = os.path.join('outputs', session_id, 'downloads')
+        os.makedirs(output_dir, exist_ok=True)
+        return build_artifact(session_id, file_info['id'], kind, 'xlsx', self.excel_inputs(kind, data, file_info['id']),
+                              lambda: create_excel(data, output_dir, file_info['id']))
+    
+    def excel_inputs(self, kind, data, file_id):
+        """
+        Inputs hash of an exported workbook: the fields it shows, the pictures and logo
+        it embeds and the template version; ids and timestamps of the run are left out
+        """
+        images = []
+        if kind == 'offer':
+            content = (data['tables'], data['factors'])
+            session_id = data.get('session_id', '')
+            images = [
+                self.extract_image_path(value, session_id, file_id)
+                for table in data['tables'] for row in table['rows']
+                for value in row.values() if self.contains_image(value)
+            ]
+        elif kind == 've':
+            content = (data['budget_option'], data['alternatives'])
         else:
-            wb.remove(wb.active)  # Remove default sheet
+            content = [result.get('markdown', {}).get('text', '') for result in data.get('layoutParsingResults', [])]
+        return inputs_hash(
+            kind, 'xlsx', EXCEL_TEMPLATE_VERSION, content,
+            [file_signature(path) for path in images],
+            file_signature(self.get_logo_path())
+        )
+    
+    def create_extraction_excel(self, extraction_result, output_dir, file_id):
+        """Create Excel file from extraction result"""
+        filename = os.path.join(output_dir, f'extraction_{file_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
         
-        # Process each page
-        for idx, layout_result in enumerate(extraction_result.get('layoutParsingResults', [])):
-            markdown_text = layout_result.get('markdown', {}).get('text', '')
-            
-            # Extract tables
-            tables = self.parse_markdown_tables(markdown_text)
+        with StreamingExcelWriter(filename) as writer:
+            # Add logo to a cover sheet if available
+            logo_path = self.get_logo_path()
+            if logo_path and os.path.exists(logo_path):
+                cover = writer.add_sheet('Cover')
+                if cover.insert_image(1, 1, logo_path, 200, thumbnail_size=None):
+                    cover.row = 7
+                    cover.append(['', 'ALSHAYA ENTERPRISES'], style='heading')
+                    cover.append(['', 'Extracted Table Data'], style='subheading')
             
-            for table_idx, table in enumerate(tables):
-                sheet_name = f'Page{idx+1}_Table{table_idx+1}'[:31]  # Excel sheet name limit
-                ws = wb.create_sheet(title=sheet_name)
+            # Process each page
+            for idx, layout_result in enumerate(extraction_result.get('layoutParsingResults', [])):
+                markdown_text = layout_result.get('markdown', {}).get('text', '')
                 
-                # Add headers
-                if table['headers']:
-                    ws.append(table['headers'])
-                    self.style_header_row(ws, 1)
+                # Extract tables
+                tables = self.parse_markdown_tables(markdown_text)
                 
-                # Add data rows
-                for row in table['rows']:
-                    row_data = [row.get(h, '') for h in table['headers']]
-                    ws.append(row_data)
-                
-                # Auto-adjust column widths
-                self.auto_adjust_columns(ws)
+                for table_idx, table in enumerate(tables):
+                    ws = writer.add_sheet(f'Page{idx+1}_Table{table_idx+1}')  # Cut to Excel's sheet name limit
+                    
+                    # Add headers
+                    if table['headers']:
+                        ws.append(table['headers'], style='header')
+                    
+                    # Add data rows
+                    for row in table['rows']:
+                        ws.append([row.get(h, '') for h in table['headers']])
         
-        wb.save(filename)
         return filename
     
     def create_offer_excel(self, costed_data, output_dir, file_id):
         """Create Excel file for offer with costing applied"""
         filename = os.path.join(output_dir, f'offer_{file_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
         
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Offer'
-        
-        # Add logo at top-right
-        logo_path = self.get_logo_path()
-        if logo_path and os.path.exists(logo_path):
-            try:
-                img = XLImage(logo_path)
-                img.width = 150
-                img.height = 150 * (img.height / img.width)  # Maintain aspect ratio
-                ws.add_image(img, 'E1')
-                ws.row_dimensions[1].height = 80
-                ws.row_dimensions[2].height = 20
-            except Exception:
-                pass
-        
-        # Title
-        ws.append(['COMMERCIAL OFFER'])
-        ws.merge_cells('A3:F3')
-        self.style_title_row(ws, 3)
-        
-        ws.append([])  # Empty row
-        ws.append([])  # Extra row for spacing after title
-        
-        # Factors applied
-        factors = costed_data['factors']
-        ws.append(['Costing Factors Applied:'])
-        ws.append([f'Net Margin: {factors.get("net_margin", 0)}%'])
-        ws.append([f'Freight: {factors.get("freight", 0)}%'])
-        ws.append([f'Customs: {factors.get("customs", 0)}%'])
-        ws.append([f'Installation: {factors.get("installation", 0)}%'])
-        ws.append([f'Exchange Rate: {factors.get("exchange_rate", 1.0)}'])
-        ws.append([f'Additional: {factors.get("additional", 0)}%'])
-        ws.append([])  # Empty row
-        
-        # Get session info for image paths
-        session_id = costed_data.get('session_id', '')
-        
-        # Tables
-        for table_idx, table in enumerate(costed_data['tables']):
-            ws.append([f'Item List {table_idx + 1}'])
-            ws.merge_cells(f'A{ws.max_row}:F{ws.max_row}')
+        with StreamingExcelWriter(filename) as writer:
+            ws = writer.add_sheet('Offer')
             
-            # Filter out Action column from headers
-            headers = [h for h in table['headers'] if h.lower() not in ['action', 'actions']]
+            # Logo at top-right over the first two rows
+            logo_path = self.get_logo_path()
+            if logo_path and os.path.exists(logo_path) and ws.insert_image(0, 4, logo_path, 150, thumbnail_size=None):
+                ws.append(height=80)
+                ws.append(height=20)
+            else:
+                ws.row = 2
             
-            # Headers
-            header_row_num = ws.max_row + 1
-            ws.append(headers)
-            self.style_header_row(ws, header_row_num)
+            # Title
+            ws.merge(0, 5, 'COMMERCIAL OFFER', style='title')
             
-            # Find image column index
-            image_col_indices = []
-            for idx, h in enumerate(headers):
-                if 'image' in h.lower() or 'img' in h.lower() or 'ref' in h.lower():
-                    image_col_indices.append(idx)
+            ws.append()  # Empty row
+            ws.append()  # Extra row for spacing after title
             
-            # Data rows - exclude Action column and embed images
-            for row in table['rows']:
-                current_row_num = ws.max_row + 1
-                row_data = []
-                
-                for col_idx, h in enumerate(headers):
-                    cell_value = row.get(h, '')
-                    
-                    # Check if this cell contains an image
-                    if self.contains_image(cell_value):
-                        row_data.append('')  # Empty cell, image will be placed on top
-                    else:
-                        # Strip HTML tags if any
-                        clean_value = re.sub(r'<[^>]+>', '', str(cell_value))
-                        row_data.append(clean_value)
+            # Factors applied
+            factors = costed_data['factors']
+            ws.append(['Costing Factors Applied:'])
+            ws.append([f'Net Margin: {factors.get("net_margin", 0)}%'])
+            ws.append([f'Freight: {factors.get("freight", 0)}%'])
+            ws.append([f'Customs: {factors.get("customs", 0)}%'])
+            ws.append([f'Installation: {factors.get("installation", 0)}%'])
+            ws.append([f'Exchange Rate: {factors.get("exchange_rate", 1.0)}'])
+            ws.append([f'Additional: {factors.get("additional", 0)}%'])
+            ws.append()  # Empty row
+            
+            # Get session info for image paths
+            session_id = costed_data.get('session_id', '')
+            
+            # Tables
+            for table_idx, table in enumerate(costed_data['tables']):
+                ws.merge(0, 5, f'Item List {table_idx + 1}')
                 
-                ws.append(row_data)
+                # Filter out Action column from headers
+                headers = [h for h in table['headers'] if h.lower() not in ['action', 'actions']]
+                ws.append(headers, style='header')
                 
-                # Set row height for images
-                if any(self.contains_image(row.get(h, '')) for h in headers):
-                    ws.row_dimensions[current_row_num].height = 75  # Height for images
+                # Image columns keep a fixed width
+                for idx, h in enumerate(headers):
+                    if 'image' in h.lower() or 'img' in h.lower() or 'ref' in h.lower():
+                        ws.set_width(idx, 15)
                 
-                # Now embed images
-                for col_idx, h in enumerate(headers):
-                    cell_value = row.get(h, '')
+                # Data rows - exclude Action column and embed images
+                for row in table['rows']:
+                    row_data = []
+                    image_cells = []
                     
-                    if self.contains_image(cell_value):
+                    for col_idx, h in enumerate(headers):
+                        cell_value = row.get(h, '')
+                        
+                        # Check if this cell contains an image
+                        if self.contains_image(cell_value):
+                            row_data.append('')  # Empty cell, image will be placed on top
+                            image_cells.append((col_idx, cell_value))
+                        else:
+                            # Strip HTML tags if any
+                            row_data.append(re.sub(r'<[^>]+>', '', str(cell_value)))
+                    
+                    # Set row height for images
+                    current_row = ws.append(row_data, height=75 if image_cells else None)
+                    
+                    # Now embed images (100x100 pixels) from their thumbnails
+                    for col_idx, cell_value in image_cells:
                         image_path = self.extract_image_path(cell_value, session_id, file_id)
                         if image_path and os.path.exists(image_path):
-                            try:
-                                # Add image to cell
-                                img = XLImage(image_path)
-                                # Resize image to fit cell (100x100 pixels)
-                                img.width = 100
-                                img.height = 100
-                                
-                                # Get cell coordinate (e.g., 'A5')
-                                cell_coord = ws.cell(row=current_row_num, column=col_idx + 1).coordinate
-                                
-                                # Add image to worksheet
-                                ws.add_image(img, cell_coord)
-                            except Exception as e:
+                            if not ws.insert_image(current_row, col_idx, image_path, 100, 100):
                                 # If image fails, write placeholder text
-                                ws.cell(row=current_row_num, column=col_idx + 1).value = "[Image]"
+                                ws.worksheet.write(current_row, col_idx, '[Image]')
+                
+                ws.append()  # Empty row
             
-            # Set column widths
-            for col_idx, h in enumerate(headers):
-                col_letter = chr(65 + col_idx)  # A, B, C, etc.
-                if col_idx in image_col_indices:
-                    ws.column_dimensions[col_letter].width = 15  # Wider for images
+            # Summary
+            subtotal = self.calculate_subtotal(costed_data['tables'])
+            vat = subtotal * 0.15
+            grand_total = subtotal + vat
             
-            ws.append([])  # Empty row
-        
-        # Summary
-        subtotal = self.calculate_subtotal(costed_data['tables'])
-        vat = subtotal * 0.15
-        grand_total = subtotal + vat
-        
-        ws.append(['', '', '', '', 'Subtotal:', subtotal])
-        ws.append(['', '', '', '', 'VAT (15%):', vat])
-        ws.append(['', '', '', '', 'Grand Total:', grand_total])
-        
-        self.style_summary_rows(ws, ws.max_row - 2, ws.max_row)
+            ws.append(['', '', '', '', 'Subtotal:', subtotal], style='summary')
+            ws.append(['', '', '', '', 'VAT (15%):', vat], style='summary')
+            ws.append(['', '', '', '', 'Grand Total:', grand_total], style='summary')
         
-        # Auto-adjust columns (except image columns)
-        self.auto_adjust_columns(ws)
-        
-        wb.save(filename)
         return filename
     
     def create_ve_excel(self, ve_data, output_dir, file_id):
         """Create Excel file for value engineering alternatives"""
         filename = os.path.join(output_dir, f've_alternatives_{file_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
         
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Alternatives'
-        
-        # Add logo at top-right
-        logo_path = self.get_logo_path()
-        if logo_path and os.path.exists(logo_path):
-            try:
-                img = XLImage(logo_path)
-                img.width = 150
-                img.height = 150 * (img.height / img.width)
-                ws.add_image(img, 'G1')
-                ws.row_dimensions[1].height = 80
-                ws.row_dimensions[2].height = 20
-            except Exception:
-                pass
-        
-        # Title
-        ws.append([f'VALUE ENGINEERED ALTERNATIVES - {ve_data["budget_option"].upper()}'])
-        ws.merge_cells('A3:H3')
-        self.style_title_row(ws, 3)
-        ws.append([])
-        
-        # Process alternatives
-        for alt_group in ve_data['alternatives']:
-            original = alt_group['original_item']
-            
-            # Original item
-            ws.append(['ORIGINAL ITEM'])
-            ws.append(['Description:', original.get('description', '')])
-            ws.append(['Quantity:', f"{original.get('qty', '')} {original.get('unit', '')}"])
-            ws.append(['Unit Rate:', original.get('unit_rate', '')])
-            ws.append(['Total:', original.get('total', '')])
-            ws.append([])
+        with StreamingExcelWriter(filename) as writer:
+            ws = writer.add_sheet('Alternatives')
             
-            # Alternatives
-            ws.append(['ALTERNATIVES'])
-            headers = ['Brand', 'Model', 'Description', 'Unit Rate', 'Total', 'Lead Time']
-            ws.append(headers)
-            self.style_header_row(ws, ws.max_row)
+            # Logo at top-right over the first two rows
+            logo_path = self.get_logo_path()
+            if logo_path and os.path.exists(logo_path) and ws.insert_image(0, 6, logo_path, 150, thumbnail_size=None):
+                ws.append(height=80)
+                ws.append(height=20)
+            else:
+                ws.row = 2
             
-            for alt in alt_group['alternatives']:
-                ws.append([
-                    alt['brand'],
-                    alt['model'],
-                    alt['description'],
-                    alt['unit_rate'],
-                    alt['total'],
-                    alt['lead_time']
-                ])
+            # Title
+            ws.merge(0, 7, f'VALUE ENGINEERED ALTERNATIVES - {ve_data["budget_option"].upper()}', style='title')
+            ws.append()
             
-            ws.append([])
-            ws.append([])  # Double space between items
-        
-        self.auto_adjust_columns(ws)
+            # Process alternatives
+            for alt_group in ve_data['alternatives']:
+                original = alt_group['original_item']
+                
+                # Original item
+                ws.append(['ORIGINAL ITEM'])
+                ws.append(['Description:', original.get('description', '')])
+                ws.append(['Quantity:', f"{original.get('qty', '')} {original.get('unit', '')}"])
+                ws.append(['Unit Rate:', original.get('unit_rate', '')])
+                ws.append(['Total:', original.get('total', '')])
+                ws.append()
+                
+                # Alternatives
+                ws.append(['ALTERNATIVES'])
+                ws.append(['Brand', 'Model', 'Description', 'Unit Rate', 'Total', 'Lead Time'], style='header')
+                
+                for alt in alt_group['alternatives']:
+                    ws.append([
+                        alt['brand'],
+                        alt['model'],
+                        alt['description'],
+                        alt['unit_rate'],
+                        alt['total'],
+                        alt['lead_time']
+                    ])
+                
+                ws.append()
+                ws.append()  # Double space between items
         
-        wb.save(filename)
         return filename
     
     def contains_image(self, cell_value):
@@ -542,59 +497,3 @@ class DownloadManager:
                             pass
         
         return subtotal
-    
-    def style_header_row(self, ws, row_num):
-        """Apply styling to header row"""
-        header_fill = PatternFill(start_color='667EEA', end_color='667EEA', fill_type='solid')
-        header_font = Font(bold=True, color='FFFFFF')
-        
-        for cell in ws[row_num]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    def style_title_row(self, ws, row_num):
-        """Apply styling to title row"""
-        title_fill = PatternFill(start_color='764BA2', end_color='764BA2', fill_type='solid')
-        title_font = Font(bold=True, size=16, color='FFFFFF')
-        
-        for cell in ws[row_num]:
-            cell.fill = title_fill
-            cell.font = title_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    def style_summary_rows(self, ws, start_row, end_row):
-        """Apply styling to summary rows"""
-        bold_font = Font(bold=True)
-        
-        for row_num in range(start_row, end_row + 1):
-            for cell in ws[row_num]:
-                if cell.value:
-                    cell.font = bold_font
-                    cell.alignment = Alignment(horizontal='right')
-    
-    def auto_adjust_columns(self, ws):
-        """Auto-adjust column widths based on content"""
-        from openpyxl.cell.cell import MergedCell
-        
-        for column in ws.columns:
-            max_length = 0
-            column_letter = None
-            
-            for cell in column:
-                try:
-                    # Skip merged cells
-                    if isinstance(cell, MergedCell):
-                        continue
-                    
-                    if column_letter is None:
-                        column_letter = cell.column_letter
-                    
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except:
-                    pass
-            
-            if column_letter:
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
@@ -0,0 +1,138 @@
+"""
+Streaming Excel writer for downloads
+Rows are written to disk as they are produced (xlsxwriter constant_memory mode), column
+widths follow running maxima of the text written to each column instead of a rescan of
+every cell at the end, and pictures are embedded from the image store's thumbnails
+rather than the full-size files, so an export's memory stays flat however many rows
+it has
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+
+import xlsxwriter
+from PIL import Image
+
+from .image_store import document_image
+
+logger = logging.getLogger(__name__)
+
+MAX_COLUMN_WIDTH = 50
+CELL_IMAGE_SIZE = 256  # pixels of the thumbnail cell pictures are embedded from
+EXCEL_DPI = 96  # xlsxwriter sizes pictures without DPI information at this resolution
+
+STYLES = {
+    'header': {'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#667EEA', 'align': 'center', 'valign': 'vcenter'},
+    'title': {'bold': True, 'font_size': 16, 'font_color': '#FFFFFF', 'bg_color': '#764BA2',
+              'align': 'center', 'valign': 'vcenter'},
+    'summary': {'bold': True, 'align': 'right'},
+    'heading': {'bold': True, 'font_size': 16},
+    'subheading': {'font_size': 12},
+}
+
+
+class StreamingSheet:
+    """Worksheet written top to bottom, one row at a time"""
+
+    def __init__(self, worksheet, formats: Dict):
+        self.worksheet = worksheet
+        self.row = 0  # next row to write (0-based)
+        self._formats = formats
+        self._widths: Dict[int, int] = {}
+        self._fixed_widths: Dict[int, float] = {}
+
+    def append(self, values: Iterable = (), style: Optional[str] = None, height: Optional[float] = None) -> int:
+        """Write a row after the last one and return its index"""
+        row = self.row
+        cell_format = self._formats.get(style)
+        if height is not None:
+            self.worksheet.set_row(row, height)
+        written = False
+        for col, value in enumerate(values):
+            if value is None or value == '':
+                if cell_format is not None:
+                    self.worksheet.write_blank(row, col, None, cell_format)
+                continue
+            self.worksheet.write(row, col, value, cell_format)
+            length = len(str(value))
+            if length > self._widths.get(col, 0):
+                self._widths[col] = length
+            written = True
+        if height is not None and not written and cell_format is None:
+            # constant_memory only writes rows holding a cell, and the height with them
+            self.worksheet.write_blank(row, 0, None, self._formats['plain'])
+        self.row += 1
+        return row
+
+    def merge(self, first_col: int, last_col: int, value, style: Optional[str] = None) -> int:
+        """Write a row whose value spans first_col..last_col; spanned text does not widen columns"""
+        row = self.row
+        self.worksheet.merge_range(row, first_col, row, last_col, value, self._formats.get(style) or self._formats['plain'])
+        self.row += 1
+        return row
+
+    def set_width(self, col: int, width: float):
+        """Fix a column's width instead of sizing it to its text"""
+        self._fixed_widths[col] = width
+
+    def insert_image(self, row: int, col: int, path: str, width: float, height: Optional[float] = None,
+                     thumbnail_size: Optional[int] = CELL_IMAGE_SIZE) -> bool:
+        """
+        Place a picture width x height pixels (height keeps the aspect ratio when omitted)
+        at a cell, from a thumbnail when thumbnail_size is set; False if it cannot be read
+        """
+        source = document_image(path, thumbnail_size) if thumbnail_size else path
+        try:
+            with Image.open(source) as image:
+                pixel_width, pixel_height = image.size
+                dpi_x, dpi_y = image.info.get('dpi') or (EXCEL_DPI, EXCEL_DPI)
+        except Exception as e:
+            logger.warning(f"Could not embed {path} in Excel export: {e}")
+            return False
+        if height is None:
+            height = width * pixel_height / pixel_width
+        # xlsxwriter scales relative to the picture's natural size at its DPI
+        natural_width = pixel_width * EXCEL_DPI / (dpi_x or EXCEL_DPI)
+        natural_height = pixel_height * EXCEL_DPI / (dpi_y or EXCEL_DPI)
+        self.worksheet.insert_image(row, col, source, {
+            'x_scale': width / natural_width,
+            'y_scale': height / natural_height,
+            'object_position': 1
+        })
+        return True
+
+    def apply_widths(self):
+        columns = set(self._widths) | set(self._fixed_widths)
+        for col in columns:
+            width = self._fixed_widths.get(col)
+            if width is None:
+                width = min(self._widths[col] + 2, MAX_COLUMN_WIDTH)
+            self.worksheet.set_column(col, col, width)
+
+
+class StreamingExcelWriter:
+    """xlsx workbook whose sheets stream their rows to disk"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        # URLs stay plain strings, as they were in the openpyxl exports
+        self.workbook = xlsxwriter.Workbook(filename, {'constant_memory': True, 'strings_to_urls': False})
+        self._formats = {name: self.workbook.add_format(spec) for name, spec in STYLES.items()}
+        self._formats['plain'] = self.workbook.add_format()
+        self._sheets = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_sheet(self, name: str) -> StreamingSheet:
+        sheet = StreamingSheet(self.workbook.add_worksheet(name[:31]), self._formats)
+        self._sheets.append(sheet)
+        return sheet
+
+    def close(self):
+        for sheet in self._sheets:
+            sheet.apply_widths()
+        self.workbook.close()
@@ -0,0 +1,89 @@
+"""
+HTML parsing backend shared by the scraper and the stitched-table parsers
+Scraped pages become BeautifulSoup trees built by the fastest installed parser (lxml,
+falling back to the pure-Python html.parser; HTML_PARSER forces one) and, with a
+strainer, only for the parts of the page a parser looks at. Stitched tables skip
+BeautifulSoup altogether and are read straight from lxml's element tree
+"""
+
+import os
+import re
+import logging
+from typing import List, Optional
+
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+
+logger = logging.getLogger(__name__)
+
+PARSER_PREFERENCE = ('lxml', 'html.parser')
+
+# Strainers keep every element matching at the top level together with its whole subtree,
+# so each one lists all the tags its parser searches for and finds the same elements
+# as a full parse
+LINK_STRAINER = SoupStrainer('a')
+HOMEPAGE_STRAINER = SoupStrainer(['a', 'nav', 'menu', 'ul'])
+CATEGORY_PAGE_STRAINER = SoupStrainer(['div', 'article'], class_=re.compile(r'(product|item|card)', re.I))
+PRODUCT_PAGE_STRAINER = SoupStrainer(['title', 'meta', 'h1', 'img', 'div', 'span', 'p', 'ul', 'ol'])
+
+_default_parser: Optional[str] = None
+
+
+def get_parser() -> str:
+    """Name of the parser make_soup uses: HTML_PARSER if installed, else the first available"""
+    global _default_parser
+    if _default_parser is None:
+        requested = os.environ.get('HTML_PARSER')
+        candidates = ((requested,) if requested else ()) + PARSER_PREFERENCE
+        _default_parser = next(name for name in candidates if builder_registry.lookup(name))
+        if requested and _default_parser != requested:
+            logger.warning(f"HTML parser {requested} is not installed, using {_default_parser}")
+    return _default_parser
+
+
+def make_soup(markup, parse_only: Optional[SoupStrainer] = None, parser: Optional[str] = None) -> BeautifulSoup:
+    """Parse markup (str or bytes), optionally building only the elements a strainer keeps"""
+    return BeautifulSoup(markup, parser or get_parser(), parse_only=parse_only)
+
+
+def find_table(html: str) -> Optional[etree._Element]:
+    """First <table> element in an HTML document or fragment, or None"""
+    if not html or not html.strip():
+        return None
+    try:
+        root = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    return next(root.iter('table'), None)
+
+
+def table_rows(table: etree._Element, cell_tags=('th', 'td')) -> List[List[etree._Element]]:
+    """Cells of every row of a table, nested rows included, in document order"""
+    return [list(row.iter(*cell_tags)) for row in table.iter('tr')]
+
+
+# Elements whose content BeautifulSoup's get_text leaves out (the text after them still counts)
+NON_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+
+
+def _texts(element: etree._Element):
+    """Text pieces under an element in document order, skipping comments and NON_TEXT_TAGS"""
+    if element.text:
+        yield element.text
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in NON_TEXT_TAGS:
+            yield from _texts(child)
+        if child.tail:
+            yield child.tail
+
+
+def cell_text(cell: etree._Element) -> str:
+    """Text of a cell with each text piece stripped, like BeautifulSoup's get_text(strip=True)"""
+    return ''.join(text.strip() for text in _texts(cell))
+
+
+def cell_html(cell: etree._Element) -> str:
+    """Markup of a cell including its own tag"""
+    return lxml.html.tostring(cell, encoding='unicode', with_tail=False)
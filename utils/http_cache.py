@@ -0,0 +1,265 @@
+"""
+On-disk HTTP cache for the brand scraper
+A requests transport adapter that stores GET responses with their validators, serves
+fresh entries without touching the network, revalidates stale ones with conditional
+requests (If-None-Match / If-Modified-Since) and evicts least-recently-used entries
+once the cache grows past its size budget
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'http')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 300  # seconds a response without freshness information is reused
+MAX_HEURISTIC_TTL = 24 * 3600
+
+# Headers describing the transfer, not the (already decoded) stored body
+_HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers) -> float:
+    """Seconds a response stays fresh: max-age, Expires, 10% of its Last-Modified age, or DEFAULT_TTL"""
+    directives = _parse_cache_control(headers.get('Cache-Control', ''))
+    if 'no-cache' in directives:
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        value = directives.get(name)
+        if value and value.isdigit():
+            return int(value)
+
+    date = _http_date(headers.get('Date')) or time.time()
+    expires = _http_date(headers.get('Expires'))
+    if expires is not None:
+        return max(0.0, expires - date)
+
+    last_modified = _http_date(headers.get('Last-Modified'))
+    if last_modified is not None:
+        return min(MAX_HEURISTIC_TTL, max(0.0, (date - last_modified) * 0.1))
+    return DEFAULT_TTL
+
+
+class HTTPCache:
+    """Size-bounded LRU store of response bodies and metadata under a directory"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self._loaded = False
+
+    def _load(self):
+        """Rebuild the LRU order from body file mtimes (touched on every hit) on first use"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.body'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total += size
+        self._loaded = True
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body'
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return {'meta': ..., 'body': bytes} for a URL, or None"""
+        key = self.key(url)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            os.utime(body_path)  # persist recency for the next process
+        except (OSError, ValueError):
+            self.delete(url)
+            return None
+        return {'meta': meta, 'body': body}
+
+    def put(self, url: str, meta: Dict, body: Optional[bytes] = None):
+        """Store metadata and, unless only the metadata is being refreshed, the body"""
+        key = self.key(url)
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+        if body is not None:
+            self._write(body_path, body)
+        self._write(meta_path, json.dumps(meta).encode('utf-8'))
+
+        with self._lock:
+            if body is not None:
+                self._total += len(body) - self._sizes.get(key, 0)
+                self._sizes[key] = len(body)
+            self._sizes.move_to_end(key)
+            evicted = self._evict()
+        for old_key in evicted:
+            for path in self._paths(old_key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def delete(self, url: str):
+        key = self.key(url)
+        with self._lock:
+            self._total -= self._sizes.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write(self, path: str, data: bytes):
+        # Write then rename so readers never see a partial file
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _evict(self):
+        evicted = []
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            self._total -= size
+            evicted.append(key)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} entries from HTTP cache ({self._total} bytes kept)")
+        return evicted
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+
+class CachingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that answers GETs from an HTTPCache and revalidates stale entries"""
+
+    def __init__(self, cache: HTTPCache, *args, **kwargs):
+        self.cache = cache
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET' or 'no-store' in request.headers.get('Cache-Control', ''):
+            return super().send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry is not None:
+            meta = entry['meta']
+            if time.time() < meta['stored_at'] + meta['lifetime']:
+                return self._cached_response(request, entry)
+            stored_headers = CaseInsensitiveDict(meta['headers'])
+            if stored_headers.get('ETag'):
+                request.headers['If-None-Match'] = stored_headers['ETag']
+            if stored_headers.get('Last-Modified'):
+                request.headers['If-Modified-Since'] = stored_headers['Last-Modified']
+
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            # Still valid: refresh the stored headers and freshness, keep the body
+            headers = CaseInsensitiveDict(entry['meta']['headers'])
+            headers.update({k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS})
+            meta = self._meta(request.url, entry['meta']['status'], headers)
+            self.cache.put(request.url, meta)
+            response.close()
+            return self._cached_response(request, {'meta': meta, 'body': entry['body']}, revalidated=True)
+
+        if response.status_code == 200 and self._storable(response):
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS}
+            self.cache.put(request.url, self._meta(request.url, 200, headers), response.content)
+
+        return response
+
+    @staticmethod
+    def _storable(response) -> bool:
+        directives = _parse_cache_control(response.headers.get('Cache-Control', ''))
+        if 'no-store' in directives or 'private' in directives:
+            return False
+        vary = response.headers.get('Vary', '').lower()
+        return vary in ('', 'accept-encoding')
+
+    @staticmethod
+    def _meta(url: str, status: int, headers) -> Dict:
+        return {
+            'url': url,
+            'status': status,
+            'headers': dict(headers),
+            'stored_at': time.time(),
+            'lifetime': freshness_lifetime(headers)
+        }
+
+    def _cached_response(self, request, entry: Dict, revalidated: bool = False) -> Response:
+        response = Response()
+        response.status_code = entry['meta']['status']
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry['meta']['headers'])
+        response.headers['X-Cache'] = 'REVALIDATED' if revalidated else 'HIT'
+        response._content = entry['body']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+_cache: Optional[HTTPCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> HTTPCache:
+    """Process-wide HTTP cache shared by every scraper session"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HTTPCache()
+        return _cache
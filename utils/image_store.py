@@ -0,0 +1,382 @@
+"""
+Shared product image store
+Downloads images concurrently, deduplicates them by content hash and keeps fixed-size
+JPEG thumbnails, so documents embed a right-sized image instead of decoding the
+full-resolution original every time. Scraped catalog images can opt in to perceptual
+deduplication as well (dHash plus mean colour, so colour variants of one model stay
+apart); BOQ and document images always keep their own pixels
+"""
+
+import io
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from math import ceil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DIR = os.path.join('cache', 'images')
+THUMBNAIL_SIZES = (256, 1024)
+THUMBNAIL_QUALITY = 85
+DOCUMENT_DPI = 150  # resolution images are prepared at for the size they are printed at
+DHASH_MAX_DISTANCE = 2  # differing bits (of 64) for two images to count as the same picture
+COLOR_MAX_DISTANCE = 12  # mean RGB distance, keeps recoloured variants apart
+DEFAULT_WORKERS = 8
+DOWNLOAD_TIMEOUT = 30
+
+# Bits set per byte value, for Hamming distances over packed hashes
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 greyscale reduction"""
+    pixels = np.asarray(image.convert('L').resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def mean_color(image: Image.Image) -> Tuple[int, int, int]:
+    return image.convert('RGB').resize((1, 1), Image.BOX).getpixel((0, 0))
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB copy with any transparency composited over white, as JPEG needs"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[3])
+        return background
+    return image.convert('RGB')
+
+
+class ImageStore:
+    """Content-addressed images and thumbnails under a directory, indexed in SQLite"""
+
+    def __init__(self, directory: str = DEFAULT_IMAGE_DIR, sizes: Iterable[int] = THUMBNAIL_SIZES,
+                 max_workers: int = DEFAULT_WORKERS):
+        self.directory = directory
+        self.sizes = tuple(sorted(sizes))
+        self.max_workers = max_workers
+        self.db_path = os.path.join(directory, 'index.db')
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        # Perceptual hashes of canonical images, loaded on first ingest
+        self._index_lock = threading.Lock()
+        self._hash_ids = None
+        self._hashes = None
+        self._colors = None
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            if not self._schema_ready:
+                with self._schema_lock:
+                    self._init_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection):
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS images (
+                    sha1 TEXT PRIMARY KEY,
+                    canonical TEXT NOT NULL,
+                    dhash TEXT NOT NULL,
+                    color TEXT NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    catalog INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sources (
+                    source TEXT PRIMARY KEY,
+                    sha1 TEXT NOT NULL,
+                    signature TEXT NOT NULL
+                )
+            ''')
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(images)')}
+            if 'catalog' not in columns:
+                # Stores from before perceptual matching was limited to catalog images:
+                # undo its merges, so every image is served from its own pixels again
+                conn.execute('ALTER TABLE images ADD COLUMN catalog INTEGER NOT NULL DEFAULT 0')
+                conn.execute('UPDATE images SET canonical = sha1')
+                conn.execute("UPDATE images SET catalog = 1 WHERE sha1 IN "
+                             "(SELECT sha1 FROM sources WHERE source NOT LIKE 'file:%')")
+                conn.execute("DELETE FROM sources WHERE source LIKE 'file:%'")
+
+    def thumbnail_path(self, image_id: str, size: int) -> str:
+        return os.path.join(self.directory, 'thumbs', image_id[:2], f'{image_id}_{size}.jpg')
+
+    def _record(self, image_id: str) -> Dict:
+        return {
+            'id': image_id,
+            'thumbnails': {size: self.thumbnail_path(image_id, size) for size in self.sizes}
+        }
+
+    def _load_hashes(self, conn: sqlite3.Connection):
+        rows = conn.execute('SELECT sha1, dhash, color FROM images WHERE canonical = sha1 AND catalog = 1').fetchall()
+        self._hash_ids = [sha1 for sha1, _, _ in rows]
+        self._hashes = np.array([int(h, 16) for _, h, _ in rows], dtype=np.uint64)
+        self._colors = np.array([[int(c) for c in color.split(',')] for _, _, color in rows],
+                                dtype=np.int16).reshape(-1, 3)
+
+    def _find_similar(self, image_hash: int, color: Tuple[int, int, int]) -> Optional[str]:
+        """Canonical catalog image that looks the same as the given hash and colour, if any"""
+        if not len(self._hashes):
+            return None
+        distances = _POPCOUNT[(self._hashes ^ np.uint64(image_hash)).view(np.uint8)].reshape(-1, 8).sum(axis=1)
+        color_distances = np.abs(self._colors - np.array(color, dtype=np.int16)).max(axis=1)
+        matches = np.flatnonzero((distances <= DHASH_MAX_DISTANCE) & (color_distances <= COLOR_MAX_DISTANCE))
+        if not len(matches):
+            return None
+        return self._hash_ids[matches[np.argmin(distances[matches])]]
+
+    def _stored_id(self, conn: sqlite3.Connection, sha1: str, perceptual: bool) -> Optional[str]:
+        """Id an already stored image resolves to, if its thumbnails are on disk"""
+        row = conn.execute('SELECT canonical FROM images WHERE sha1 = ?', (sha1,)).fetchone()
+        if not row:
+            return None
+        image_id = row[0] if perceptual else sha1
+        return image_id if os.path.exists(self.thumbnail_path(image_id, self.sizes[-1])) else None
+
+    def ingest_bytes(self, data: bytes, source: Optional[str] = None, signature: str = '',
+                     perceptual: bool = False) -> Optional[Dict]:
+        """
+        Add an image and return its record ({'id', 'thumbnails': {size: path}})
+        The id is the image's own content hash. With perceptual (scraped catalog images
+        only) a picture that looks the same as an earlier catalog image gets that image's
+        id instead; None when the data is not a readable image
+        """
+        sha1 = hashlib.sha1(data).hexdigest()
+        conn = self._connect()
+        image_id = self._stored_id(conn, sha1, perceptual)
+        if image_id:
+            self._remember_source(conn, source, sha1, signature)
+            return self._record(image_id)
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            width, height = image.size
+            # Let JPEG decode at reduced scale when the original is far larger than needed
+            image.draft('RGB', (self.sizes[-1], self.sizes[-1]))
+            image = _flatten(image)
+        except Exception as e:
+            logger.warning(f"Unreadable image {source or sha1}: {e}")
+            return None
+
+        image_hash, color = dhash(image), mean_color(image)
+        with self._index_lock:
+            if self._hashes is None:
+                self._load_hashes(conn)
+            row = conn.execute('SELECT canonical FROM images WHERE sha1 = ?', (sha1,)).fetchone()
+            if row:
+                # Stored before (by another thread, or without thumbnails of its own)
+                canonical = row[0]
+            else:
+                canonical = (self._find_similar(image_hash, color) if perceptual else None) or sha1
+                with conn:
+                    conn.execute('''
+                        INSERT OR IGNORE INTO images (sha1, canonical, dhash, color, width, height, catalog, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (sha1, canonical, f'{image_hash:016x}', ','.join(map(str, color)), width, height,
+                          int(perceptual), datetime.now().isoformat()))
+                if perceptual and canonical == sha1:
+                    self._hash_ids.append(sha1)
+                    self._hashes = np.append(self._hashes, np.uint64(image_hash))
+                    self._colors = np.vstack([self._colors, np.array(color, dtype=np.int16)])
+
+        image_id = canonical if perceptual else sha1
+        if image_id == sha1:
+            if not os.path.exists(self.thumbnail_path(sha1, self.sizes[-1])):
+                self._write_thumbnails(sha1, image)
+        else:
+            logger.info(f"Image {source or sha1} is a duplicate of {canonical}")
+        self._remember_source(conn, source, sha1, signature)
+        return self._record(image_id)
+
+    def _write_thumbnails(self, image_id: str, image: Image.Image):
+        # Largest first, each size reduced from the previous one
+        for size in reversed(self.sizes):
+            image = image.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            path = self.thumbnail_path(image_id, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            image.save(temp_path, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+            os.replace(temp_path, path)
+
+    def _remember_source(self, conn: sqlite3.Connection, source: Optional[str], sha1: str, signature: str):
+        if source:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO sources (source, sha1, signature) VALUES (?, ?, ?)',
+                             (source, sha1, signature))
+
+    def _known_source(self, source: str, signature: str = '', perceptual: bool = False) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute('SELECT sha1, signature FROM sources WHERE source = ?', (source,)).fetchone()
+        if row and row[1] == signature:
+            image_id = self._stored_id(conn, row[0], perceptual)
+            if image_id:
+                return self._record(image_id)
+        return None
+
+    def ingest_file(self, path: str) -> Optional[Dict]:
+        """Add a local image; unchanged files (same size and mtime) are not read again"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        source = 'file:' + os.path.abspath(path)
+        signature = f'{stat.st_size}:{stat.st_mtime_ns}'
+        record = self._known_source(source, signature)
+        if record:
+            return record
+        with open(path, 'rb') as f:
+            return self.ingest_bytes(f.read(), source, signature)
+
+    def _download(self, url: str) -> Optional[bytes]:
+        try:
+            response = self._session.get(url, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            return response.content
+        except Exception as e:
+            logger.error(f"Failed to download image {url}: {e}")
+            return None
+
+    def ingest_url(self, url: str, perceptual: bool = False) -> Optional[Dict]:
+        record = self._known_source(url, perceptual=perceptual)
+        if record:
+            return record
+        data = self._download(url)
+        return self.ingest_bytes(data, url, perceptual=perceptual) if data else None
+
+    def ingest_urls(self, urls: Iterable[str], perceptual: bool = False) -> Dict[str, Dict]:
+        """
+        Download and add images concurrently; returns {url: record} for the ones that
+        worked. perceptual is for scraped catalog images only, see ingest_bytes
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-store') as executor:
+            records = executor.map(lambda url: self.ingest_url(url, perceptual), urls)
+        return {url: record for url, record in zip(urls, records) if record}
+
+    def download_files(self, targets: Dict[str, str]) -> Dict[str, bool]:
+        """
+        Download {local path: url} concurrently, saving each file at its path and adding
+        it to the store; returns {local path: saved}. A failing image is logged and
+        reported as not saved without stopping the rest
+        """
+        def download(item):
+            path, url = item
+            try:
+                data = self._download(url)
+                if data is None:
+                    return False
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                stat = os.stat(path)
+                self.ingest_bytes(data, 'file:' + os.path.abspath(path), f'{stat.st_size}:{stat.st_mtime_ns}')
+                return True
+            except Exception as e:
+                logger.error(f"Failed to save image {url} to {path}: {e}")
+                return False
+
+        items = list(targets.items())
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-store') as executor:
+            results = executor.map(download, items)
+        return {path: saved for (path, _), saved in zip(items, results)}
+
+    def rendition(self, image_id: str, size: int) -> Optional[str]:
+        """
+        JPEG of an image fitted within size x size pixels, made once from the nearest
+        larger thumbnail and cached by image id and size; never upscaled
+        """
+        if size >= self.sizes[-1]:
+            return self.thumbnail(image_id, size)
+        path = self.thumbnail_path(image_id, size)
+        if os.path.exists(path):
+            return path
+        source = self.thumbnail(image_id, size)
+        if source is None:
+            return None
+        with Image.open(source) as image:
+            image.draft('RGB', (size, size))
+            image = image.convert('RGB')
+        image.thumbnail((size, size), Image.LANCZOS)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        image.save(temp_path, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+        os.replace(temp_path, path)
+        return path
+
+    def thumbnail(self, image_id: str, size: int) -> Optional[str]:
+        """Path of the smallest stored thumbnail covering size, or None"""
+        size = next((s for s in self.sizes if s >= size), self.sizes[-1])
+        path = self.thumbnail_path(image_id, size)
+        return path if os.path.exists(path) else None
+
+
+_store: Optional[ImageStore] = None
+_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore()
+        return _store
+
+
+def document_image(path: Optional[str], size: int = 1024) -> Optional[str]:
+    """
+    Image to embed in a document in place of a local image, at most size pixels on its
+    longer side and always made from that image's own pixels, adding it to the store on
+    first use; falls back to the original path when it cannot be processed
+    """
+    if not path or not os.path.exists(path):
+        return path
+    try:
+        store = get_image_store()
+        record = store.ingest_file(path)
+        prepared = store.rendition(record['id'], size) if record else None
+        return prepared or path
+    except Exception as e:
+        logger.warning(f"Could not prepare {path} for a document: {e}")
+        return path
+
+
+def prepare_images(paths: Iterable[Optional[str]], width: float, height: float,
+                   dpi: int = DOCUMENT_DPI) -> Dict[str, str]:
+    """
+    {path: image to embed} for images printed within width x height points
+    Each distinct image is resized once to the pixels the box needs at dpi, in parallel;
+    duplicates resolve to the same file, which ReportLab embeds as a single XObject
+    """
+    size = ceil(max(width, height) / 72 * dpi)
+    unique: List[str] = list(dict.fromkeys(path for path in paths if path))
+    with ThreadPoolExecutor(max_workers=get_image_store().max_workers, thread_name_prefix='image-prep') as executor:
+        prepared = executor.map(lambda path: document_image(path, size), unique)
+    return dict(zip(unique, prepared))
@@ -0,0 +1,125 @@
+"""
+Keyword categorizer for BOQ line descriptions
+All keywords are compiled once into a single regex; when several keywords occur in a
+description the one listed first (highest priority) wins, independent of position
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Priority follows declaration order: seating before desking, specific before fallback
+CATEGORY_RULES: List[Tuple[str, str, List[str]]] = [
+    ('seating', 'executive_chairs', ['executive chair', 'director chair', 'manager chair', 'executive seating']),
+    ('seating', 'task_chairs', ['task chair', 'office chair', 'work chair', 'operator chair', 'ergonomic chair']),
+    ('seating', 'visitor_chairs', ['visitor chair', 'guest chair', 'side chair', 'reception chair']),
+    ('seating', 'conference_chairs', ['conference chair', 'meeting chair', 'boardroom chair']),
+    ('seating', 'sofas', ['sofa', 'couch', 'settee', '2-seater', '3-seater']),
+    ('seating', 'lounge_seating', ['lounge', 'armchair', 'easy chair', 'lounge chair', 'breakout seating']),
+    ('desking', 'executive_desks', ['executive desk', 'director desk', 'manager desk', 'executive table']),
+    ('desking', 'workstations', ['workstation', 'work desk', 'office desk', 'workspace', 'desk system']),
+    ('desking', 'meeting_tables', ['meeting table', 'conference table', 'boardroom table', 'discussion table']),
+    ('desking', 'pedestals', ['pedestal', 'drawer unit', 'mobile pedestal', 'under desk drawer']),
+    ('desking', 'cabinets', ['cabinet', 'cupboard', 'storage cabinet', 'filing cabinet']),
+    ('desking', 'lockers', ['locker', 'personal storage', 'staff locker']),
+    ('desking', 'partitions', ['partition', 'screen', 'divider', 'panel', 'privacy screen']),
+    # Generic fallbacks
+    ('seating', 'task_chairs', ['chair', 'seat', 'stool', 'bench']),
+    ('desking', 'workstations', ['table', 'desk']),
+]
+
+GENERAL = {'category': 'general', 'subcategory': 'general'}
+
+
+def normalize_description(description) -> str:
+    """Lowercase and collapse whitespace so equivalent descriptions share a cache entry"""
+    return ' '.join(str(description or '').lower().split())
+
+
+class KeywordMatcher:
+    """Find the highest-priority keyword contained in a text with one regex pass"""
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords: List[str] = []
+        self._rank: Dict[str, int] = {}
+        for keyword in keywords:
+            key = keyword.lower()
+            if key not in self._rank:
+                self._rank[key] = len(self.keywords)
+                self.keywords.append(keyword)
+
+        # Alternatives are listed by priority so the best keyword at a position wins
+        alternation = '|'.join(re.escape(k) for k in self._rank)
+        self._pattern = re.compile(alternation) if alternation else None
+        self._keys = list(self._rank)
+
+    def best_rank(self, text_lower: str) -> Optional[int]:
+        """Rank of the best keyword found in an already lowercased text"""
+        if self._pattern is None:
+            return None
+        best = None
+        for match in self._pattern.finditer(text_lower):
+            rank = self._rank[match.group(0)]
+            if best is None or rank < best:
+                best = rank
+                if best == 0:
+                    return best
+        if best is None:
+            return None
+        # Non-overlapping scan can hide a better keyword inside a consumed match;
+        # only keywords ranked above the provisional best need a direct check
+        for rank in range(best):
+            if self._keys[rank] in text_lower:
+                return rank
+        return best
+
+    def first(self, text: str) -> Optional[str]:
+        """Highest-priority keyword (as declared) contained in text, case-insensitive"""
+        rank = self.best_rank(str(text).lower())
+        return None if rank is None else self.keywords[rank]
+
+
+class ItemCategorizer:
+    """Map descriptions to (category, subcategory) with a compiled matcher and an LRU memo"""
+
+    def __init__(self, rules: Iterable[Tuple[str, str, List[str]]] = CATEGORY_RULES, cache_size: int = 8192):
+        keywords = []
+        self._results: List[Dict] = []
+        for category, subcategory, rule_keywords in rules:
+            for keyword in rule_keywords:
+                keywords.append(keyword)
+                self._results.append({'category': category, 'subcategory': subcategory})
+
+        self._matcher = KeywordMatcher(keywords)
+        # Duplicate keywords keep their first (highest-priority) rule
+        self._results = [self._results[keywords.index(k)] for k in self._matcher.keywords]
+        self._lookup = lru_cache(maxsize=cache_size)(self._categorize_normalized)
+
+    def _categorize_normalized(self, normalized: str) -> Dict:
+        rank = self._matcher.best_rank(normalized)
+        return GENERAL if rank is None else self._results[rank]
+
+    def categorize(self, description) -> Dict:
+        """Categorize one description; returns a new dict with category and subcategory"""
+        return dict(self._lookup(normalize_description(description)))
+
+    def categorize_many(self, descriptions: Iterable) -> List[Dict]:
+        """Categorize a whole column of descriptions"""
+        lookup = self._lookup
+        return [dict(lookup(normalize_description(d))) for d in descriptions]
+
+    def cache_info(self):
+        return self._lookup.cache_info()
+
+
+_default_categorizer = ItemCategorizer()
+
+
+def categorize_item(description) -> Dict:
+    """Categorize a description with the shared default categorizer"""
+    return _default_categorizer.categorize(description)
+
+
+def categorize_items(descriptions: Iterable) -> List[Dict]:
+    """Categorize many descriptions with the shared default categorizer"""
+    return _default_categorizer.categorize_many(descriptions)
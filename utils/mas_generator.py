@@ -1,5 +1,7 @@
 import os
 import re
+import shutil
+import tempfile
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
@@ -8,7 +10,18 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
-from bs4 import BeautifulSoup
+from .item_categorizer import KeywordMatcher
+from .html_parsing import cell_html, cell_text, find_table, table_rows
+from .image_store import document_image
+from .artifact_registry import build_artifact, inputs_hash
+from .page_cache import PageCache, file_signature, get_page_cache
+from .pdf_chunk_renderer import CHUNK_ITEMS, MIN_PARALLEL_ITEMS, can_merge, merge_pdfs, run_chunks
+
+# Known brands, matched in priority order with one compiled pattern
+KNOWN_BRANDS = KeywordMatcher(['Sedus', 'Narbutas', 'Sokoa', 'B&T', 'Herman Miller', 'Steelcase', 'Vitra', 'Knoll', 'Haworth'])
+
+# Part of every cached page's and MAS's key: bump it whenever the page layout or header/footer changes
+MAS_TEMPLATE_VERSION = 1
 
 class MASGenerator:
     """Generate Material Approval Sheets (MAS) with company template"""
@@ -123,9 +136,60 @@ class MASGenerator:
         output_dir = os.path.join('outputs', session_id, 'mas')
         os.makedirs(output_dir, exist_ok=True)
         
-        # Generate PDF
-        output_file = os.path.join(output_dir, f'mas_{file_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf')
+        def build():
+            # Generate PDF
+            output_file = os.path.join(output_dir, f'mas_{file_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf')
+            self.render_pages(items, output_file)
+            return output_file
         
+        # Same items, images and template reuse the MAS already built today (every sheet is dated)
+        inputs = inputs_hash(
+            'mas', 'pdf', MAS_TEMPLATE_VERSION, items, datetime.now().strftime('%d/%m/%Y'),
+            [file_signature(item.get('image_path')) for item in items], file_signature(self._get_logo_path())
+        )
+        return build_artifact(session_id, file_id, 'mas', 'pdf', inputs, build)
+    
+    def page_key(self, item, item_num, total_items, date):
+        """Cache key of one item's page: everything printed on it, its image and the template"""
+        return PageCache.key(MAS_TEMPLATE_VERSION, item, item_num, total_items, date,
+                             file_signature(item.get('image_path')), file_signature(self._get_logo_path()))
+    
+    def render_pages(self, items, output_file):
+        """
+        Join the MAS from cached item pages, rendering only the items whose page is not
+        cached yet (in parallel chunks when there are many). Short lists render in one
+        ReportLab pass, which beats per-item renders and a merge at that size
+        """
+        if len(items) < MIN_PARALLEL_ITEMS or not can_merge():
+            self.build_pdf(items, output_file)
+            return
+        
+        cache = get_page_cache()
+        total = len(items)
+        date = datetime.now().strftime('%d/%m/%Y')
+        keys = [self.page_key(item, idx + 1, total, date) for idx, item in enumerate(items)]
+        pages = [cache.get(key) for key in keys]
+        missing = [idx for idx, page in enumerate(pages) if page is None]
+        
+        if missing:
+            render_dir = tempfile.mkdtemp(prefix='mas_pages_', dir=os.path.dirname(os.path.abspath(output_file)))
+            try:
+                jobs = [(items[idx], idx + 1, total, os.path.join(render_dir, f'{idx:05d}.pdf')) for idx in missing]
+                run_chunks(render_mas_pages, [(jobs[i:i + CHUNK_ITEMS],) for i in range(0, len(jobs), CHUNK_ITEMS)])
+                for idx, job in zip(missing, jobs):
+                    pages[idx] = cache.put(keys[idx], job[3], keep=keys)
+            finally:
+                shutil.rmtree(render_dir, ignore_errors=True)
+        
+        if all(os.path.exists(page) for page in pages):
+            merge_pdfs(pages, output_file)
+        else:
+            # Another generator evicted a page between lookup and join
+            self.build_pdf(items, output_file)
+    
+    def build_pdf(self, items, output_file, start=0, total=None):
+        """Build MAS pages for items, numbered from start + 1 of total"""
+        total = total or len(items)
         doc = SimpleDocTemplate(output_file, pagesize=A4,
                                 topMargin=0.4*inch, bottomMargin=0.4*inch,
                                 leftMargin=0.6*inch, rightMargin=0.6*inch)
@@ -135,12 +199,10 @@ class MASGenerator:
         for idx, item in enumerate(items):
             if idx > 0:
                 story.append(PageBreak())
-            story.extend(self.create_mas_page(item, idx + 1, len(items)))
+            story.extend(self.create_mas_page(item, start + idx + 1, total))
         
         # Build PDF
         doc.build(story, onFirstPage=self._draw_header_footer, onLaterPages=self._draw_header_footer)
-        
-        return output_file
     
     def parse_items_from_costed_data(self, costed_data, session, file_id):
         """Parse items from costed data"""
@@ -210,23 +272,20 @@ class MASGenerator:
         if not html_content:
             return items
         
-        soup = BeautifulSoup(html_content, 'html.parser')
-        table = soup.find('table')
+        table = find_table(html_content)
         
-        if not table:
+        if table is None:
             return items
         
-        rows = table.find_all('tr')
+        rows = table_rows(table)
         if len(rows) < 2:
             return items
         
         # Extract headers from first row
-        header_row = rows[0]
-        headers = [th.get_text(strip=True).lower() for th in header_row.find_all(['th', 'td'])]
+        headers = [cell_text(th).lower() for th in rows[0]]
         
         # Process data rows
-        for row in rows[1:]:
-            cells = row.find_all('td')
+        for cells in table_rows(table, ('td',))[1:]:
             if not cells:
                 continue
             
@@ -234,8 +293,7 @@ class MASGenerator:
             for idx, cell in enumerate(cells):
                 if idx < len(headers):
                     # Keep HTML for image detection
-                    cell_html = str(cell)
-                    row_data[headers[idx]] = cell_html
+                    row_data[headers[idx]] = cell_html(cell)
             
             # Extract fields
             description = ''
@@ -253,19 +311,19 @@ class MASGenerator:
                         image_path = img_path
                 
                 # Clean text
-                cell_text = re.sub(r'<[^>]+>', '', cell_value).strip()
+                text = re.sub(r'<[^>]+>', '', cell_value).strip()
                 
                 # Map to fields
                 if any(h in header for h in ['description', 'item', 'product']):
-                    description = cell_text
+                    description = text
                 elif 'qty' in header or 'quantity' in header:
-                    qty = cell_text
+                    qty = text
                 elif 'unit' in header and 'rate' not in header:
-                    unit = cell_text
+                    unit = text
                 elif 'unit rate' in header or 'rate' in header:
-                    unit_rate = cell_text
+                    unit_rate = text
                 elif 'total' in header or 'amount' in header:
-                    total = cell_text
+                    total = text
             
             if description:
                 brand = self.extract_brand(description)
@@ -422,7 +480,7 @@ class MASGenerator:
         if item.get('image_path') and os.path.exists(item['image_path']):
             try:
                 # Smaller image to ensure page fit
-                img = RLImage(item['image_path'], width=2.2*inch, height=2.2*inch)
+                img = RLImage(document_image(item['image_path']), width=2.2*inch, height=2.2*inch)
                 img.hAlign = 'CENTER'
                 story.append(img)
             except Exception as e:
@@ -529,10 +587,9 @@ class MASGenerator:
     
     def extract_brand(self, description):
         """Extract brand from description"""
-        brands = ['Sedus', 'Narbutas', 'Sokoa', 'B&T', 'Herman Miller', 'Steelcase', 'Vitra', 'Knoll', 'Haworth']
-        for brand in brands:
-            if brand.lower() in description.lower():
-                return brand
+        brand = KNOWN_BRANDS.first(description)
+        if brand:
+            return brand
         
         # Try to find capitalized words as potential brands
         words = description.split()
@@ -565,3 +622,10 @@ class MASGenerator:
         specs.append('Compliance: Meet relevant standards')
         
         return specs[:4]  # Limit to 4 specs maximum
+
+
+def render_mas_pages(jobs):
+    """Render each (item, item_num, total_items, output_file) job to its own PDF (run in a PDF render worker)"""
+    generator = MASGenerator()
+    for item, item_num, total_items, output_file in jobs:
+        generator.build_pdf([item], output_file, item_num - 1, total_items)
@@ -9,6 +9,14 @@ from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 import json
 from datetime import datetime
 import re
+from .image_store import prepare_images
+from .artifact_registry import build_artifact, inputs_hash
+from .page_cache import file_signature
+
+# Printed size of row images in the item tables
+OFFER_IMAGE_SIZE = 1*inch
+# Part of every offer's inputs key: bump it whenever the offer layout changes
+OFFER_TEMPLATE_VERSION = 1
 
 class OfferGenerator:
     """Generate offer documents with costing factors applied"""
@@ -104,6 +112,20 @@ class OfferGenerator:
         output_dir = os.path.join('outputs', session_id, 'offers')
         os.makedirs(output_dir, exist_ok=True)
         
+        # Same rows, factors, images and template reuse the offer already built today (it is dated)
+        inputs = inputs_hash(
+            'offer', 'pdf', OFFER_TEMPLATE_VERSION, costed_data['tables'], costed_data['factors'],
+            datetime.now().strftime('%Y-%m-%d'),
+            [file_signature(path) for path in self.image_paths(costed_data, session_id, file_id)],
+            file_signature(self._get_logo_path())
+        )
+        return build_artifact(session_id, file_id, 'offer', 'pdf', inputs,
+                              lambda: self.build_offer(file_id, session, costed_data, output_dir))
+    
+    def build_offer(self, file_id, session, costed_data, output_dir):
+        """Write the offer PDF for costed data and return its path"""
+        session_id = session['session_id']
+        
         # Generate PDF
         output_file = os.path.join(output_dir, f'offer_{file_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf')
         
@@ -147,6 +169,10 @@ class OfferGenerator:
         story.append(Paragraph(factors_text, self.styles['Normal']))
         story.append(Spacer(1, 0.3*inch))
         
+        # Prepare every row image once at its printed size, before laying out the tables
+        prepared_images = prepare_images(self.image_paths(costed_data, session_id, file_id),
+                                         OFFER_IMAGE_SIZE, OFFER_IMAGE_SIZE)
+        
         # Tables with images
         for idx, table_data in enumerate(costed_data['tables']):
             header = Paragraph(f"<b><font color='#1a365d'>Item List {idx + 1}</font></b>", self.header_style)
@@ -190,7 +216,8 @@ class OfferGenerator:
                         if image_path and os.path.exists(image_path):
                             try:
                                 # Create image with proper sizing
-                                img = RLImage(image_path, width=1*inch, height=1*inch)
+                                img = RLImage(prepared_images.get(image_path, image_path),
+                                              width=OFFER_IMAGE_SIZE, height=OFFER_IMAGE_SIZE)
                                 table_row.append(img)
                             except Exception as e:
                                 # If image fails, show placeholder text
@@ -302,6 +329,14 @@ class OfferGenerator:
         
         return output_file
     
+    def image_paths(self, costed_data, session_id, file_id):
+        """Paths of the row images in costed data, in table order"""
+        return [
+            self.extract_image_path(value, session_id, file_id)
+            for table_data in costed_data['tables'] for row in table_data['rows']
+            for value in row.values() if self.contains_image(value)
+        ]
+    
     def calculate_subtotal(self, tables):
         """Calculate subtotal from all tables"""
         subtotal = 0.0
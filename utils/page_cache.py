@@ -0,0 +1,151 @@
+"""
+On-disk cache of rendered PDF page fragments
+Each fragment is the page (or pages) one item renders to, stored under a hash of
+everything the page shows, so regenerating a document re-renders only the items that
+changed and joins the rest from the cache. Least-recently-used fragments are evicted
+once the cache grows past its size budget
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_CACHE_DIR = os.path.join('cache', 'pages')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_signature(path: Optional[str]) -> Optional[str]:
+    """size:mtime of a file a page embeds, so replacing the file changes the page key"""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+
+class PageCache:
+    """Size-bounded LRU store of PDF fragments under a directory"""
+
+    def __init__(self, directory: str = DEFAULT_PAGE_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self._loaded = False
+
+    def _load(self):
+        """Rebuild the LRU order from fragment mtimes (touched on every hit) on first use"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pdf'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total += size
+        self._loaded = True
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pdf')
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Key for the content a fragment depends on (any JSON-serialisable values)"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Path of a cached fragment, or None; fragments other workers wrote since this
+        process listed the directory are found on disk by their key
+        """
+        path = self.path(key)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key not in self._sizes:
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    return None
+                self._sizes[key] = size
+                self._total += size
+            self._sizes.move_to_end(key)
+        try:
+            os.utime(path)  # persist recency for the next process
+        except OSError:
+            self.delete(key)
+            return None
+        return path
+
+    def put(self, key: str, rendered_path: str, keep: Optional[List[str]] = None) -> str:
+        """
+        Move a freshly rendered fragment into the cache and return its cached path
+        Keys in keep (the fragments the current document is about to join) are not evicted
+        """
+        path = self.path(key)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+        size = os.path.getsize(rendered_path)
+        os.replace(rendered_path, path)
+
+        with self._lock:
+            self._total += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            self._sizes.move_to_end(key)
+            evicted = self._evict(set(keep or ()))
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except OSError:
+                pass
+        return path
+
+    def delete(self, key: str):
+        with self._lock:
+            self._total -= self._sizes.pop(key, 0)
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def _evict(self, keep):
+        evicted = []
+        for key in list(self._sizes):
+            if self._total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            self._total -= self._sizes.pop(key)
+            evicted.append(key)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} fragments from page cache ({self._total} bytes kept)")
+        return evicted
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """Process-wide page fragment cache shared by every document generator"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
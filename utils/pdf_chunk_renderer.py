@@ -0,0 +1,127 @@
+"""
+Parallel rendering of one-page-per-item PDFs
+The MAS and presentation PDFs put every item on its own page and number items in the
+page content, so a long item list is split into chunks that worker processes lay out
+with ReportLab at the same time, each told where its items sit in the whole list, and
+the chunk PDFs are joined with PyMuPDF. Short lists, or a missing PyMuPDF, render in
+one pass as before
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ITEMS = 25  # items (pages) per chunk; enough to outweigh a chunk's setup and merge
+MIN_PARALLEL_ITEMS = 2 * CHUNK_ITEMS
+MAX_WORKERS = min(os.cpu_count() or 1, 8)
+
+# render_chunk(items, start, total, output_file): lays out items, the slice of the full
+# list beginning at index start, as a complete PDF numbered against total items
+ChunkRenderer = Callable[[List[Dict], int, int, str], None]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all PDF renders, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers do not inherit the web server's threads, locks or connections
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _pymupdf():
+    """The PyMuPDF module under its current name, or the fitz name older releases use"""
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf
+    return pymupdf
+
+
+def merge_pdfs(parts: List[str], output_file: str):
+    """Concatenate PDFs in order into output_file, storing resources they share once"""
+    pymupdf = _pymupdf()
+    merged = pymupdf.open()
+    try:
+        for part in parts:
+            with pymupdf.open(part) as document:
+                merged.insert_pdf(document)
+        # garbage=4 folds the streams every chunk repeats (logo, product images, fonts)
+        # back into one copy, so the result is no larger than a single-pass render
+        merged.save(output_file, garbage=4, deflate=True)
+    finally:
+        merged.close()
+
+
+def can_merge() -> bool:
+    """Whether PyMuPDF is installed to join chunk PDFs"""
+    try:
+        _pymupdf()
+        return True
+    except ImportError:
+        return False
+
+
+def run_chunks(func: Callable, chunks: List[Tuple]):
+    """
+    Call func(*args) for every args tuple in chunks, in the render pool when there are
+    several and more than one core, otherwise (or if the pool breaks) one after another.
+    func must be a module-level function so workers can import it
+    """
+    if len(chunks) < 2 or MAX_WORKERS < 2:
+        for args in chunks:
+            func(*args)
+        return
+
+    try:
+        pool = get_render_pool()
+        futures = [pool.submit(func, *args) for args in chunks]
+        for future in futures:
+            future.result()
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning(f"Parallel PDF rendering failed ({e}), rendering {len(chunks)} chunks in this process")
+        _reset_render_pool()
+        for args in chunks:
+            func(*args)
+
+
+def render_pdf(items: List[Dict], output_file: str, render_chunk: ChunkRenderer,
+               chunk_items: int = CHUNK_ITEMS):
+    """Render items to output_file with render_chunk, in parallel chunks when the list is long enough"""
+    total = len(items)
+    if total < max(MIN_PARALLEL_ITEMS, 2 * chunk_items) or MAX_WORKERS < 2 or not can_merge():
+        render_chunk(items, 0, total, output_file)
+        return
+
+    starts = list(range(0, total, chunk_items))
+    chunk_dir = tempfile.mkdtemp(prefix='chunks_', dir=os.path.dirname(os.path.abspath(output_file)))
+    parts = [os.path.join(chunk_dir, f'{index:04d}.pdf') for index in range(len(starts))]
+    try:
+        run_chunks(render_chunk, [
+            (items[start:start + chunk_items], start, total, part) for start, part in zip(starts, parts)
+        ])
+        merge_pdfs(parts, output_file)
+        logger.info(f"Rendered {total} items in {len(parts)} chunks to {output_file}")
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
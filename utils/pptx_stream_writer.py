@@ -0,0 +1,167 @@
+"""
+Streaming PPTX writer for large decks
+python-pptx keeps every slide's XML and picture in memory until save. This writer lets
+slides be built with python-pptx as usual, one at a time, and moves each finished slide
+straight into the output package: its XML is written to the zip at once and its
+pictures become shared media parts, stored once per distinct image however many slides
+use it. Memory then holds one slide at a time and the file grows only with new images
+"""
+
+import io
+import os
+import logging
+import zipfile
+from typing import Dict, List, Tuple
+
+from lxml import etree
+from pptx import Presentation
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.parts.image import ImagePart
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+EXTENDED_PROPERTIES_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/extended-properties'
+APP_PROPERTIES = 'docProps/app.xml'
+SLIDES_DIR = '/ppt/slides'
+
+
+def _xml(root: etree._Element) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+class StreamingPptxWriter:
+    """
+    Writes a PPTX slide by slide
+
+        with StreamingPptxWriter(path, width, height) as writer:
+            build_slide(writer.presentation)  # any python-pptx code adding slides
+            writer.flush()                    # moves them into the package
+    """
+
+    def __init__(self, output_file: str, slide_width=None, slide_height=None):
+        self.output_file = output_file
+        self.presentation = Presentation()
+        if slide_width:
+            self.presentation.slide_width = slide_width
+        if slide_height:
+            self.presentation.slide_height = slide_height
+
+        self._temp_path = f'{output_file}.{os.getpid()}.tmp'
+        self._zip = zipfile.ZipFile(self._temp_path, 'w', zipfile.ZIP_DEFLATED)
+        self._slides: List[str] = []  # slide partnames in order
+        self._media: Dict[str, str] = {}  # image sha1 -> media partname
+        self._media_types: Dict[str, str] = {}  # extension -> content type
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+            os.remove(self._temp_path)
+
+    @property
+    def slide_count(self) -> int:
+        return len(self._slides)
+
+    def flush(self):
+        """Write the slides built so far to the package and drop them from memory"""
+        prs_part = self.presentation.part
+        sldIdLst = prs_part._element.get_or_add_sldIdLst()
+        for sldId in list(sldIdLst.sldId_lst):
+            slide_part = prs_part.related_part(sldId.rId)
+            self._write_slide(slide_part)
+            sldIdLst.remove(sldId)
+            prs_part.drop_rel(sldId.rId)
+
+    def _write_slide(self, slide_part):
+        partname = PackURI(f'{SLIDES_DIR}/slide{len(self._slides) + 1}.xml')
+        rels = etree.Element(f'{{{RELATIONSHIPS_NS}}}Relationships', nsmap={None: RELATIONSHIPS_NS})
+        for rId, rel in slide_part.rels.items():
+            attributes = {'Id': rId, 'Type': rel.reltype}
+            if rel.is_external:
+                attributes.update(Target=rel.target_ref, TargetMode='External')
+            elif isinstance(rel.target_part, ImagePart):
+                attributes['Target'] = self._media_part(rel.target_part).relative_ref(SLIDES_DIR)
+            elif rel.reltype == RT.SLIDE_LAYOUT:
+                # Layouts stay in the template package written on close
+                attributes['Target'] = rel.target_part.partname.relative_ref(SLIDES_DIR)
+            else:
+                raise ValueError(f"Streaming PPTX slides cannot hold {rel.reltype} parts")
+            etree.SubElement(rels, f'{{{RELATIONSHIPS_NS}}}Relationship', attributes)
+
+        self._zip.writestr(partname.membername, slide_part.blob)
+        self._zip.writestr(partname.rels_uri.membername, _xml(rels))
+        self._slides.append(partname)
+
+    def _media_part(self, image_part: ImagePart) -> PackURI:
+        """Partname of the shared media part for an image, written on first use"""
+        partname = self._media.get(image_part.sha1)
+        if partname is None:
+            ext = image_part.partname.ext
+            partname = PackURI(f'/ppt/media/image{len(self._media) + 1}.{ext}')
+            # Pictures are already compressed; deflating them again only costs time
+            self._zip.writestr(partname.membername, image_part.blob, compress_type=zipfile.ZIP_STORED)
+            self._media[image_part.sha1] = partname
+            self._media_types[ext] = image_part.content_type
+        return partname
+
+    def close(self):
+        """Write the template parts and slide list, then move the finished file into place"""
+        self.flush()
+        prs_part = self.presentation.part
+        sldIdLst = prs_part._element.get_or_add_sldIdLst()
+        next_rId = 1 + max((int(rId[3:]) for rId in prs_part.rels if rId[3:].isdigit()), default=0)
+        slide_rels: List[Tuple[str, PackURI]] = []
+        for index, partname in enumerate(self._slides):
+            rId = f'rId{next_rId + index}'
+            sldIdLst._add_sldId(id=256 + index, rId=rId)
+            slide_rels.append((rId, partname))
+
+        template = io.BytesIO()
+        self.presentation.save(template)
+        with zipfile.ZipFile(template) as package:
+            for info in package.infolist():
+                data = package.read(info.filename)
+                if info.filename == '[Content_Types].xml':
+                    data = self._content_types(data)
+                elif info.filename == prs_part.partname.rels_uri.membername:
+                    data = self._presentation_rels(data, slide_rels)
+                elif info.filename == APP_PROPERTIES:
+                    data = self._app_properties(data)
+                self._zip.writestr(info.filename, data)
+        self._zip.close()
+        os.replace(self._temp_path, self.output_file)
+        logger.info(f"Wrote {len(self._slides)} slides with {len(self._media)} images to {self.output_file}")
+
+    def _content_types(self, data: bytes) -> bytes:
+        root = etree.fromstring(data)
+        defaults = {elem.get('Extension').lower() for elem in root.iter(f'{{{CONTENT_TYPES_NS}}}Default')}
+        for ext, content_type in self._media_types.items():
+            if ext.lower() not in defaults:
+                etree.SubElement(root, f'{{{CONTENT_TYPES_NS}}}Default', Extension=ext, ContentType=content_type)
+        for partname in self._slides:
+            etree.SubElement(root, f'{{{CONTENT_TYPES_NS}}}Override', PartName=partname, ContentType=CT.PML_SLIDE)
+        return _xml(root)
+
+    def _app_properties(self, data: bytes) -> bytes:
+        """Slide count in the extended properties, saved as 0 from the emptied template"""
+        root = etree.fromstring(data)
+        slides = root.find(f'{{{EXTENDED_PROPERTIES_NS}}}Slides')
+        if slides is None:
+            slides = etree.SubElement(root, f'{{{EXTENDED_PROPERTIES_NS}}}Slides')
+        slides.text = str(len(self._slides))
+        return _xml(root)
+
+    def _presentation_rels(self, data: bytes, slide_rels: List[Tuple[str, PackURI]]) -> bytes:
+        root = etree.fromstring(data)
+        base = self.presentation.part.partname.baseURI
+        for rId, partname in slide_rels:
+            etree.SubElement(root, f'{{{RELATIONSHIPS_NS}}}Relationship',
+                             Id=rId, Type=RT.SLIDE, Target=partname.relative_ref(base))
+        return _xml(root)
@@ -12,7 +12,21 @@ from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
-from bs4 import BeautifulSoup
+from .item_categorizer import KeywordMatcher
+from .html_parsing import cell_html, cell_text, find_table, table_rows
+from .image_store import document_image, prepare_images
+from .pdf_chunk_renderer import render_pdf
+from .pptx_stream_writer import StreamingPptxWriter
+from .artifact_registry import build_artifact, inputs_hash
+from .page_cache import file_signature
+
+# Known brands, matched in priority order with one compiled pattern
+KNOWN_BRANDS = KeywordMatcher(['Sedus', 'Narbutas', 'Sokoa', 'B&T', 'Herman Miller', 'Steelcase', 'Haworth', 'Knoll'])
+
+STREAMING_PPTX_MIN_SLIDES = 100  # decks this long are written slide by slide
+PPTX_IMAGE_SIZE = Inches(4)  # product picture box on item slides
+# Part of every presentation's inputs key: bump it whenever the slide or page layout changes
+PRESENTATION_TEMPLATE_VERSION = 1
 
 class PresentationGenerator:
     """Generate eye-catching technical presentations - 1 page per item"""
@@ -135,17 +149,24 @@ class PresentationGenerator:
         output_dir = os.path.join('outputs', session_id, 'presentations')
         os.makedirs(output_dir, exist_ok=True)
         
-        # Generate file based on format
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        if format_type == 'pptx':
-            output_file = os.path.join(output_dir, f'presentation_{file_id}_{timestamp}.pptx')
-            self.generate_pptx(items, output_file)
-        else:  # pdf
-            output_file = os.path.join(output_dir, f'presentation_{file_id}_{timestamp}.pdf')
-            self.generate_pdf(items, output_file)
-        
-        return output_file
+        fmt = 'pptx' if format_type == 'pptx' else 'pdf'
+        
+        def build():
+            # Generate file based on format
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = os.path.join(output_dir, f'presentation_{file_id}_{timestamp}.{fmt}')
+            if fmt == 'pptx':
+                self.generate_pptx(items, output_file)
+            else:
+                self.generate_pdf(items, output_file)
+            return output_file
+        
+        # Same items, images and template reuse the presentation already built today (the cover is dated)
+        inputs = inputs_hash(
+            'presentation', fmt, PRESENTATION_TEMPLATE_VERSION, items, datetime.now().strftime('%Y-%m-%d'),
+            [file_signature(item.get('image_path')) for item in items], file_signature(self._get_logo_path())
+        )
+        return build_artifact(session_id, file_id, 'presentation', fmt, inputs, build)
     
     def parse_items_from_costed_data(self, costed_data, session, file_id):
         """Parse items from costed table data"""
@@ -211,25 +232,23 @@ class PresentationGenerator:
         
         # Parse the HTML
         html_content = stitched_table.get('html', '')
-        soup = BeautifulSoup(html_content, 'html.parser')
         
         # Find the table
-        table = soup.find('table')
-        if not table:
+        table = find_table(html_content)
+        if table is None:
             return items
         
         # Get headers
         headers = []
-        header_row = table.find('tr')
-        if header_row:
-            for th in header_row.find_all(['th', 'td']):
-                headers.append(th.get_text(strip=True).lower())
+        header_rows = table_rows(table)
+        if header_rows:
+            for th in header_rows[0]:
+                headers.append(cell_text(th).lower())
         
         # Get data rows (skip header row)
-        rows = table.find_all('tr')[1:]  # Skip first row (headers)
+        rows = table_rows(table, ('td',))[1:]  # Skip first row (headers)
         
-        for row in rows:
-            cells = row.find_all('td')
+        for cells in rows:
             if len(cells) != len(headers):
                 continue
             
@@ -238,11 +257,11 @@ class PresentationGenerator:
             for i, cell in enumerate(cells):
                 if i < len(headers):
                     # Check if cell contains image
-                    img = cell.find('img')
-                    if img:
-                        row_data[headers[i]] = str(cell)  # Keep HTML with image
+                    img = cell.find('.//img')
+                    if img is not None:
+                        row_data[headers[i]] = cell_html(cell)  # Keep HTML with image
                     else:
-                        row_data[headers[i]] = cell.get_text(strip=True)
+                        row_data[headers[i]] = cell_text(cell)
             
             # Extract fields
             description = ''
@@ -324,18 +343,23 @@ class PresentationGenerator:
     
     def generate_pdf(self, items, output_file):
         """Generate PDF presentation"""
+        render_pdf(items, output_file, render_presentation_chunk)
+    
+    def build_pdf(self, items, output_file, start=0):
+        """Build item pages numbered from start + 1, behind the cover page for the first chunk"""
         doc = SimpleDocTemplate(output_file, pagesize=A4, 
                                 topMargin=0.5*inch, bottomMargin=0.5*inch,
                                 leftMargin=0.75*inch, rightMargin=0.75*inch)
         story = []
         
         # Cover page
-        story.extend(self.create_cover_page())
-        story.append(PageBreak())
+        if start == 0:
+            story.extend(self.create_cover_page())
+            story.append(PageBreak())
         
         # Create one page per item
         for idx, item in enumerate(items):
-            story.extend(self.create_item_page_pdf(item, idx + 1))
+            story.extend(self.create_item_page_pdf(item, start + idx + 1))
             if idx < len(items) - 1:
                 story.append(PageBreak())
         
@@ -344,6 +368,10 @@ class PresentationGenerator:
     
     def generate_pptx(self, items, output_file):
         """Generate PowerPoint presentation"""
+        if len(items) >= STREAMING_PPTX_MIN_SLIDES:
+            self.generate_pptx_streaming(items, output_file)
+            return
+        
         prs = Presentation()
         prs.slide_width = Inches(10)
         prs.slide_height = Inches(7.5)
@@ -357,6 +385,18 @@ class PresentationGenerator:
         
         prs.save(output_file)
     
+    def generate_pptx_streaming(self, items, output_file):
+        """Generate a large PowerPoint deck slide by slide, with pictures scaled to their box and stored once"""
+        prepared_images = prepare_images((item.get('image_path') for item in items),
+                                         PPTX_IMAGE_SIZE.pt, PPTX_IMAGE_SIZE.pt)
+        with StreamingPptxWriter(output_file, Inches(10), Inches(7.5)) as writer:
+            self.create_title_slide_pptx(writer.presentation)
+            writer.flush()
+            for idx, item in enumerate(items):
+                self.create_item_slide_pptx(writer.presentation, item, idx + 1,
+                                            prepared_images.get(item.get('image_path')))
+                writer.flush()
+    
     def create_title_slide_pptx(self, prs):
         """Create PowerPoint title slide"""
         slide_layout = prs.slide_layouts[6]  # Blank layout
@@ -397,8 +437,8 @@ class PresentationGenerator:
         date_p.font.size = Pt(16)
         date_p.alignment = PP_ALIGN.CENTER
     
-    def create_item_slide_pptx(self, prs, item, page_num):
-        """Create PowerPoint slide for one item"""
+    def create_item_slide_pptx(self, prs, item, page_num, image=None):
+        """Create PowerPoint slide for one item, optionally with an already prepared image"""
         slide_layout = prs.slide_layouts[6]  # Blank layout
         slide = prs.slides.add_slide(slide_layout)
         
@@ -423,8 +463,8 @@ class PresentationGenerator:
         # Image (left side)
         if item.get('image_path') and os.path.exists(item['image_path']):
             try:
-                slide.shapes.add_picture(item['image_path'], Inches(0.5), Inches(1.2), 
-                                        width=Inches(4), height=Inches(4))
+                slide.shapes.add_picture(image or document_image(item['image_path']), Inches(0.5), Inches(1.2), 
+                                        width=PPTX_IMAGE_SIZE, height=PPTX_IMAGE_SIZE)
             except Exception as e:
                 # If image fails, add placeholder
                 img_placeholder = slide.shapes.add_textbox(Inches(0.5), Inches(2.5), Inches(4), Inches(1))
@@ -491,7 +531,7 @@ Specifications:
         # Left: Image
         if item.get('image_path') and os.path.exists(item['image_path']):
             try:
-                img = RLImage(item['image_path'], width=2.5*inch, height=2.5*inch)
+                img = RLImage(document_image(item['image_path']), width=2.5*inch, height=2.5*inch)
                 left_content.append(img)
             except Exception as e:
                 left_content.append(Paragraph('[Image Not Available]', self.styles['Normal']))
@@ -601,11 +641,9 @@ Specifications:
     def extract_brand(self, description):
         """Extract brand name from description (simple heuristic)"""
         # Common brand patterns - this is simplified
-        brands = ['Sedus', 'Narbutas', 'Sokoa', 'B&T', 'Herman Miller', 'Steelcase', 'Haworth', 'Knoll']
-        
-        for brand in brands:
-            if brand.lower() in description.lower():
-                return brand
+        brand = KNOWN_BRANDS.first(description)
+        if brand:
+            return brand
         
         # Try to extract first capitalized word
         words = description.split()
@@ -781,3 +819,8 @@ Specifications:
         story.append(Paragraph(features_text, self.spec_text_style))
         
         return story
+
+
+def render_presentation_chunk(items, start, total, output_file):
+    """Render one chunk of presentation pages (run in a PDF render worker)"""
+    PresentationGenerator().build_pdf(items, output_file, start)
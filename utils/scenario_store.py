@@ -0,0 +1,210 @@
+"""
+Append-only costing scenario store
+Keeps every factor set applied to a file together with its per-row price vectors
+so that any two revisions of an offer can be compared
+"""
+
+import os
+import json
+import uuid
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_append_lock = threading.Lock()
+# scenarios file path -> (lines, size in bytes) as of the last append from this process
+_line_counts: Dict[str, Tuple[int, int]] = {}
+
+
+class ScenarioStore:
+    """Append-only history of costing scenarios for one uploaded file"""
+
+    TOTAL_HEADERS = ['total', 'amount', 'total amount']
+
+    def __init__(self, session_id: str, file_id: str, base_dir: str = 'outputs'):
+        self.file_id = file_id
+        self.path = os.path.join(base_dir, session_id, file_id, 'scenarios.jsonl')
+
+    def append(self, factors: Dict, columns: List[str], keys: List[str], labels: List[str], prices: np.ndarray) -> Dict:
+        """
+        Append a scenario and return its summary
+        Args:
+            factors: Costing factors that produced the prices
+            columns: Price column names (matrix columns)
+            keys: Stable row keys (matrix rows)
+            labels: Short row descriptions used when reporting changes
+            prices: Float matrix of shape (len(keys), len(columns)), NaN where missing
+        """
+        prices = np.asarray(prices, dtype=float).reshape(len(keys), len(columns))
+
+        with _append_lock:
+            seq = self._count_lines() + 1
+            record = {
+                'id': uuid.uuid4().hex[:12],
+                'seq': seq,
+                'created_at': datetime.now().isoformat(),
+                'factors': factors,
+                'columns': columns,
+                'keys': keys,
+                'labels': labels,
+                # NaN is not valid JSON, store missing cells as null
+                'prices': [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in prices]
+            }
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            _line_counts[self.path] = (seq, os.path.getsize(self.path))
+
+        return self._summarize(record, prices)
+
+    def list_scenarios(self) -> List[Dict]:
+        """Return summaries of all stored scenarios, oldest first"""
+        summaries = []
+        for record in self._iter_records():
+            summaries.append(self._summarize(record, self._matrix(record)))
+        return summaries
+
+    def load(self, scenario_id: str) -> Optional[Dict]:
+        """Load a scenario record with its price matrix"""
+        needle = f'"id":"{scenario_id}"'
+        for line in self._iter_lines():
+            # The id is serialized first, so only matching lines are decoded
+            if needle in line[:64]:
+                record = json.loads(line)
+                record['matrix'] = self._matrix(record)
+                return record
+        return None
+
+    def diff(self, base_id: str, compare_id: str, tolerance: float = 0.005) -> Dict:
+        """
+        Compare two scenarios row by row
+        Returns changed rows, added/removed rows and per-column and total deltas
+        """
+        base = self.load(base_id)
+        compare = self.load(compare_id)
+        if not base or not compare:
+            raise Exception('Scenario not found')
+
+        columns = [c for c in base['columns'] if c in compare['columns']]
+        base_cols = [base['columns'].index(c) for c in columns]
+        compare_cols = [compare['columns'].index(c) for c in columns]
+
+        # Align rows on their keys
+        compare_pos = {key: i for i, key in enumerate(compare['keys'])}
+        base_rows = []
+        compare_rows = []
+        for i, key in enumerate(base['keys']):
+            j = compare_pos.get(key)
+            if j is not None:
+                base_rows.append(i)
+                compare_rows.append(j)
+
+        a = base['matrix'][np.ix_(base_rows, base_cols)]
+        b = compare['matrix'][np.ix_(compare_rows, compare_cols)]
+
+        same = np.isclose(a, b, rtol=0, atol=tolerance, equal_nan=True)
+        changed_mask = ~same.all(axis=1)
+        delta = np.nan_to_num(b) - np.nan_to_num(a)
+
+        changed_rows = []
+        for r in np.flatnonzero(changed_mask):
+            i = base_rows[r]
+            changed_rows.append({
+                'key': base['keys'][i],
+                'label': base['labels'][i],
+                'before': {c: self._cell(a[r, k]) for k, c in enumerate(columns)},
+                'after': {c: self._cell(b[r, k]) for k, c in enumerate(columns)},
+                'delta': {c: round(float(delta[r, k]), 2) for k, c in enumerate(columns) if not same[r, k]}
+            })
+
+        matched = set(base_rows)
+        removed = [base['keys'][i] for i in range(len(base['keys'])) if i not in matched]
+        matched = set(compare_rows)
+        added = [compare['keys'][j] for j in range(len(compare['keys'])) if j not in matched]
+
+        base_totals = self._column_totals(base)
+        compare_totals = self._column_totals(compare)
+        delta_totals = {c: round(compare_totals.get(c, 0.0) - base_totals.get(c, 0.0), 2) for c in columns}
+
+        base_grand = self._grand_total(base['columns'], base_totals)
+        compare_grand = self._grand_total(compare['columns'], compare_totals)
+
+        return {
+            'base': base_id,
+            'compare': compare_id,
+            'base_factors': base['factors'],
+            'compare_factors': compare['factors'],
+            'columns': columns,
+            'rows_compared': len(base_rows),
+            'changed_count': len(changed_rows),
+            'changed_rows': changed_rows,
+            'added_rows': added,
+            'removed_rows': removed,
+            'delta_totals': delta_totals,
+            'base_total': round(base_grand, 2),
+            'compare_total': round(compare_grand, 2),
+            'delta_total': round(compare_grand - base_grand, 2)
+        }
+
+    def _iter_lines(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+    def _iter_records(self):
+        for line in self._iter_lines():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping corrupt scenario line in {self.path}")
+
+    def _count_lines(self) -> int:
+        """Scenarios in the file, recounted only when something else has written to it"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        cached = _line_counts.get(self.path)
+        if cached and cached[1] == size:
+            return cached[0]
+        count = sum(1 for _ in self._iter_lines())
+        _line_counts[self.path] = (count, size)
+        return count
+
+    def _matrix(self, record: Dict) -> np.ndarray:
+        rows = record.get('prices', [])
+        matrix = np.array(
+            [[np.nan if v is None else v for v in row] for row in rows],
+            dtype=float
+        )
+        return matrix.reshape(len(record.get('keys', [])), len(record.get('columns', [])))
+
+    def _column_totals(self, record: Dict) -> Dict[str, float]:
+        sums = np.nansum(record['matrix'], axis=0) if record['matrix'].size else np.zeros(len(record['columns']))
+        return {c: float(sums[k]) for k, c in enumerate(record['columns'])}
+
+    def _grand_total(self, columns: List[str], totals: Dict[str, float]) -> float:
+        total_columns = [c for c in columns if c.lower() in self.TOTAL_HEADERS]
+        return sum(totals.get(c, 0.0) for c in total_columns)
+
+    def _summarize(self, record: Dict, matrix: np.ndarray) -> Dict:
+        # A scenario without rows still totals 0 in every column
+        totals = {c: float(np.nansum(matrix[:, k])) if matrix.size else 0.0 for k, c in enumerate(record['columns'])}
+        return {
+            'id': record['id'],
+            'seq': record['seq'],
+            'created_at': record['created_at'],
+            'factors': record['factors'],
+            'row_count': len(record['keys']),
+            'column_totals': {c: round(v, 2) for c, v in totals.items()},
+            'total': round(self._grand_total(record['columns'], totals), 2)
+        }
+
+    def _cell(self, value):
+        return None if np.isnan(value) else round(float(value), 2)
@@ -0,0 +1,207 @@
+"""
+Background brand scraping jobs
+Jobs run on the shared crawl loop, so many brands are crawled concurrently under the
+crawler's global and per-host limits; progress is kept in memory per process
+"""
+
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional
+
+from .brand_crawler import BrandCrawler, CrawlLoop, get_crawl_loop, get_crawler
+from .brand_scraper import scraped_to_models
+from .crawl_state import get_crawl_state
+from .image_store import get_image_store
+
+logger = logging.getLogger(__name__)
+
+
+def _model_names(models: Dict[str, List[Dict]]) -> set:
+    return {(subcategory, m.get('model')) for subcategory, entries in models.items() for m in entries}
+
+
+def _scraped_products(scraped_data: Dict) -> List[Dict]:
+    products = [p for entries in scraped_data.get('categories', {}).values() for p in entries]
+    return products + scraped_data.get('products', [])
+
+
+def apply_scraped_brand(scraped_data: Dict, brand_name: str, website: str, country: str, tier: str,
+                        only_if_changed: bool = False) -> Dict:
+    """
+    Add or update a scraped brand in the catalog and return a summary
+    With only_if_changed the catalog is left untouched (no new version) when the brand's
+    models are the same as the ones already in the catalog
+    """
+    from .brand_database import get_catalog
+
+    categories_data, main_category = scraped_to_models(scraped_data)
+    new_brand = {
+        'name': brand_name,
+        'website': website,
+        'country': country,
+        'models': categories_data
+    }
+
+    catalog = get_catalog()
+    existing = catalog.snapshot().index.get_brand(brand_name, tier, main_category)
+    old_models = existing.get('models', {}) if existing else {}
+    old_names, new_names = _model_names(old_models), _model_names(categories_data)
+
+    updated = not (only_if_changed and existing is not None and old_models == categories_data
+                   and existing.get('website') == website and existing.get('country') == country)
+    if updated:
+        # Updates the brand if it already exists
+        catalog.upsert_brand(tier, [main_category], new_brand)
+
+    return {
+        'brand': new_brand,
+        'products_count': sum(len(v) for v in categories_data.values()),
+        'categories': list(categories_data.keys()),
+        'updated': updated,
+        'models_added': len(new_names - old_names),
+        'models_removed': len(old_names - new_names)
+    }
+
+
+async def scrape_brand(crawler: BrandCrawler, brand_name: str, website: str, tier: str, country: str,
+                       incremental: bool = False, progress=None) -> Dict:
+    """
+    Crawl a brand, apply the result to the catalog and record the crawl state
+    Incremental scrapes start from the brand's previous crawl state and only write the
+    catalog when the brand's models changed
+    """
+    # Full scrapes start from an empty state, which also seeds it for later incremental runs
+    crawl_state = get_crawl_state()
+    previous = {}
+    if incremental:
+        previous = await crawler.run_blocking(crawl_state.load_pages, brand_name)
+
+    scraped_data = await crawler.crawl_brand(website, brand_name, progress=progress, previous=previous)
+    if 'error' in scraped_data:
+        raise Exception(scraped_data['error'])
+
+    # Store product images (deduplicated, perceptually too, with thumbnails) and link them by image id
+    products = _scraped_products(scraped_data)
+    images = await crawler.run_blocking(
+        partial(get_image_store().ingest_urls, perceptual=True), [p.get('image_url') for p in products]
+    )
+    for product in products:
+        record = images.get(product.get('image_url'))
+        product['image_id'] = record['id'] if record else None
+
+    summary = await crawler.run_blocking(
+        apply_scraped_brand, scraped_data, brand_name, website, country, tier, incremental
+    )
+
+    await crawler.run_blocking(
+        crawl_state.save_crawl, brand_name, website, tier, country,
+        scraped_data['pages'], scraped_data['removed']
+    )
+    summary['changes'] = scraped_data['changes']
+    return summary
+
+
+class ScrapeJob:
+    """State of one background scrape"""
+
+    def __init__(self, brand_name: str, website: str, tier: str, country: str, incremental: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.brand_name = brand_name
+        self.website = website
+        self.tier = tier
+        self.country = country
+        self.incremental = incremental
+        self.status = 'queued'
+        self.progress = {'pages_done': 0, 'pages_total': 0, 'products_found': 0}
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'brand_name': self.brand_name,
+            'website': self.website,
+            'tier': self.tier,
+            'incremental': self.incremental,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ScrapeJobManager:
+    """Submit brand scrapes as background jobs and report their progress"""
+
+    MAX_FINISHED_JOBS = 200
+
+    def __init__(self, crawler: Optional[BrandCrawler] = None, crawl_loop: Optional[CrawlLoop] = None):
+        self.crawler = crawler or get_crawler()
+        self.crawl_loop = crawl_loop or get_crawl_loop()
+        self._jobs: 'OrderedDict[str, ScrapeJob]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, brand_name: str, website: str, tier: str = 'mid_range', country: str = 'Unknown',
+               incremental: bool = False) -> Dict:
+        """Queue a scrape of one brand; the result is applied to the catalog when it finishes"""
+        job = ScrapeJob(brand_name, website, tier, country, incremental)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self.crawl_loop.submit(self._run(job))
+        logger.info(f"Queued scrape job {job.id} for {brand_name} ({website})")
+        return job.to_dict()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    async def _run(self, job: ScrapeJob):
+        job.status = 'running'
+        job.started_at = datetime.now().isoformat()
+        try:
+            summary = await scrape_brand(
+                self.crawler, job.brand_name, job.website, job.tier, job.country,
+                incremental=job.incremental, progress=job.progress.update
+            )
+            job.result = {key: value for key, value in summary.items() if key != 'brand'}
+            job.status = 'completed'
+        except Exception as e:
+            logger.error(f"Scrape job {job.id} for {job.brand_name} failed: {e}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = datetime.now().isoformat()
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ('completed', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+_manager: Optional[ScrapeJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> ScrapeJobManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ScrapeJobManager()
+        return _manager
@@ -0,0 +1,200 @@
+"""
+TF-IDF similarity between BOQ descriptions and catalog models
+Each product is represented by its brand, model name, subcategory and feature list as
+word, word-bigram and character-trigram terms. Vectors are kept as sparse rows, so the
+index grows with the terms products actually hold rather than products x vocabulary;
+descriptions are scored against a candidate set by densifying both sides over just the
+terms a batch of descriptions uses, a block of candidates at a time
+"""
+
+import re
+import math
+import logging
+import threading
+import weakref
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .brand_catalog import CatalogIndex
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_WEIGHT = 0.7
+PRICE_WEIGHT = 0.3
+QUERY_BLOCK = 256  # descriptions densified together
+BLOCK_CELLS = 4 * 1024 * 1024  # candidates x terms cells densified at once (16 MB of float32)
+
+_WORD_RE = re.compile(r'[a-z0-9]+(?:[x.][0-9]+)*')
+
+
+def extract_terms(text: str) -> List[str]:
+    """Words, adjacent word pairs and padded character trigrams of a text"""
+    words = _WORD_RE.findall(str(text or '').lower())
+    terms = list(words)
+    terms.extend(f'{a} {b}' for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f'#{word}#'
+        terms.extend(f'~{padded[i:i + 3]}' for i in range(len(padded) - 2))
+    return terms
+
+
+def product_text(product: Dict) -> str:
+    """Text a catalog product is matched on"""
+    return ' '.join([
+        product['brand'],
+        product['model'],
+        product['subcategory'].replace('_', ' '),
+        ' '.join(product.get('features', []))
+    ])
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenated np.arange(start, start + length) for every start and length"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+class SparseRows:
+    """Rows of a sparse float32 matrix in CSR form"""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def take(self, rows) -> 'SparseRows':
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        cells = _ranges(starts, lengths)
+        indptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        return SparseRows(indptr, self.indices[cells], self.data[cells])
+
+    def __getitem__(self, rows) -> 'SparseRows':
+        return self.take(rows)
+
+    def dense(self, positions: np.ndarray, width: int) -> np.ndarray:
+        """Dense rows over the columns positions maps to 0..width-1 (others, -1, are dropped)"""
+        out = np.zeros((len(self), width), dtype=np.float32)
+        row_of = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        columns = positions[self.indices]
+        kept = columns >= 0
+        out[row_of[kept], columns[kept]] = self.data[kept]
+        return out
+
+
+class SimilarityIndex:
+    """Sparse, L2-normalized TF-IDF rows over the products of a CatalogIndex"""
+
+    def __init__(self, index: CatalogIndex):
+        self.index = index
+        self.vocabulary: Dict[str, int] = {}
+
+        documents = [Counter(extract_terms(product_text(p))) for p in index.products]
+        document_frequency = Counter()
+        for terms in documents:
+            document_frequency.update(terms.keys())
+        for term in document_frequency:
+            self.vocabulary[term] = len(self.vocabulary)
+
+        n = len(documents)
+        self.idf = np.ones(len(self.vocabulary), dtype=np.float32)
+        for term, df in document_frequency.items():
+            self.idf[self.vocabulary[term]] = math.log((1 + n) / (1 + df)) + 1
+
+        self.matrix = self._vectorize(documents)
+        logger.info(f"Built similarity index: {n} products x {len(self.vocabulary)} terms, "
+                    f"{len(self.matrix.data)} non-zero")
+
+    def _vectorize(self, documents: Sequence[Counter]) -> SparseRows:
+        vocabulary = self.vocabulary
+        lengths = []
+        columns = []
+        weights = []
+        for terms in documents:
+            row = [(vocabulary[term], 1 + math.log(count)) for term, count in terms.items() if term in vocabulary]
+            row.sort()
+            lengths.append(len(row))
+            columns.extend(column for column, _ in row)
+            weights.extend(weight for _, weight in row)
+
+        indptr = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int64)
+        indices = np.array(columns, dtype=np.int64)
+        data = np.array(weights, dtype=np.float32) * self.idf[indices]
+        row_of = np.repeat(np.arange(len(documents)), lengths)
+        norms = np.sqrt(np.bincount(row_of, weights=data.astype(np.float64) ** 2, minlength=len(documents)))
+        norms[norms == 0] = 1
+        data /= norms[row_of].astype(np.float32)
+        return SparseRows(indptr, indices, data)
+
+    def transform(self, texts: Iterable[str]) -> SparseRows:
+        """Vectorize query texts in the catalog's term space; unknown terms are ignored"""
+        return self._vectorize([Counter(extract_terms(t)) for t in texts])
+
+    def similarity(self, queries: SparseRows, candidate_ids: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every query row with every candidate product"""
+        similarity = np.zeros((len(queries), len(candidate_ids)), dtype=np.float32)
+        positions = np.full(len(self.vocabulary), -1, dtype=np.int64)
+        for first in range(0, len(queries), QUERY_BLOCK):
+            block = queries.take(np.arange(first, min(first + QUERY_BLOCK, len(queries))))
+            terms = np.unique(block.indices)
+            if len(terms) == 0:
+                continue
+            positions[terms] = np.arange(len(terms))
+            dense_queries = block.dense(positions, len(terms))
+            step = max(1, BLOCK_CELLS // len(terms))
+            for start in range(0, len(candidate_ids), step):
+                products = self.matrix.take(candidate_ids[start:start + step]).dense(positions, len(terms))
+                similarity[first:first + len(block), start:start + step] = dense_queries @ products.T
+            positions[terms] = -1
+        return similarity
+
+    def rank(self, queries: SparseRows, candidate_ids: np.ndarray, target_prices: np.ndarray,
+             top_k: int = 5) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Rank candidates for every query row by SIMILARITY_WEIGHT * cosine similarity
+        plus PRICE_WEIGHT * price fit against the row's target price
+        Returns (product_ids, similarities, scores) per query row, best first
+        """
+        if len(candidate_ids) == 0:
+            empty = np.empty(0)
+            return [(candidate_ids, empty, empty) for _ in range(len(queries))]
+
+        similarity = self.similarity(queries, candidate_ids)
+
+        prices = self.index.avg_price[candidate_ids][None, :]
+        targets = np.asarray(target_prices, dtype=float)[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price_fit = np.clip(1 - np.abs(prices - targets) / targets, 0, 1)
+        # Lines without a rate give no price signal
+        price_fit = np.where(targets > 0, price_fit, 0.5)
+
+        scores = SIMILARITY_WEIGHT * similarity + PRICE_WEIGHT * price_fit
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :top_k]
+
+        results = []
+        for row, columns in enumerate(order):
+            results.append((candidate_ids[columns], similarity[row, columns], scores[row, columns]))
+        return results
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_similarity_index(index: CatalogIndex) -> SimilarityIndex:
+    """Similarity index for a catalog index, built once per catalog snapshot"""
+    with _indexes_lock:
+        similarity_index = _indexes.get(index)
+        if similarity_index is None:
+            similarity_index = SimilarityIndex(index)
+            _indexes[index] = similarity_index
+        return similarity_index
@@ -0,0 +1,175 @@
+"""
+Sitemap discovery for brand websites
+Reads sitemap.xml files and sitemap indexes (plain or gzipped) in streaming mode and
+sorts the listed URLs into product pages, category pages and everything else, so a crawl
+can go straight to the products instead of discovering them through navigation pages
+"""
+
+import io
+import re
+import gzip
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from xml.etree import ElementTree
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SITEMAP_PATHS = ('/sitemap.xml', '/sitemap_index.xml')
+MAX_SITEMAPS = 20  # sitemap files read per site, indexes included
+MAX_SITEMAP_URLS = 50000  # the sitemap protocol's per-file limit
+
+# Paths that never lead to products
+EXCLUDED_URL = re.compile(
+    r'(/(blog|news|press|article|post|author|tag|about|contact|career|job|faq|privacy|terms|cookie|'
+    r'login|account|cart|checkout|search|event|project|case-stud|download)s?(/|$)'
+    r'|\.(pdf|jpe?g|png|gif|webp|svg|zip|dwg|mp4)$)',
+    re.I
+)
+# A product slug under a product-like segment, e.g. /products/aeron-chair
+PRODUCT_URL = re.compile(r'/(products?|items?|p|chairs?|desks?|tables?|seating|sofas?|storage|furniture)/[^/?#]+/?$', re.I)
+CATEGORY_URL = re.compile(r'/(categor(y|ies)|collections?|catalog(ue)?|range|ranges|shop|c)(/|$)', re.I)
+
+# Child sitemap names, as written by common shop platforms and SEO plugins
+PRODUCT_SITEMAP = re.compile(r'product', re.I)
+CATEGORY_SITEMAP = re.compile(r'(categor|collection|product_cat)', re.I)
+SKIPPED_SITEMAP = re.compile(r'(post|blog|news|page|author|tag|image|video|store-locat)', re.I)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _open_body(body: bytes):
+    """File object over a sitemap body, decompressing gzip by its magic bytes"""
+    stream = io.BytesIO(body)
+    if body[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def iter_sitemap(body: bytes) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Stream (kind, loc, lastmod) entries out of a sitemap or sitemap index
+    kind is 'url' for pages and 'sitemap' for child sitemaps; parsed elements are
+    cleared as they are read, so large sitemaps never build a full tree
+    """
+    loc = lastmod = None
+    for _, elem in ElementTree.iterparse(_open_body(body), events=('end',)):
+        name = _local_name(elem.tag)
+        if name == 'loc':
+            loc = (elem.text or '').strip()
+        elif name == 'lastmod':
+            lastmod = (elem.text or '').strip() or None
+        elif name in ('url', 'sitemap'):
+            if loc:
+                yield name, loc, lastmod
+            loc = lastmod = None
+            elem.clear()
+
+
+def sitemap_hint(sitemap_url: str) -> Optional[str]:
+    """What a child sitemap's name says about its URLs: 'product', 'category', 'skip' or None"""
+    name = urlparse(sitemap_url).path.rsplit('/', 1)[-1]
+    if CATEGORY_SITEMAP.search(name):
+        return 'category'
+    if PRODUCT_SITEMAP.search(name):
+        return 'product'
+    if SKIPPED_SITEMAP.search(name):
+        return 'skip'
+    return None
+
+
+def classify_url(url: str, hint: Optional[str] = None) -> str:
+    """Classify a page URL as 'product', 'category' or 'other'"""
+    path = urlparse(url).path
+    if path in ('', '/') or EXCLUDED_URL.search(path):
+        return 'other'
+    if PRODUCT_URL.search(path):
+        return 'product'
+    if hint in ('product', 'category'):
+        return hint
+    if CATEGORY_URL.search(path):
+        return 'category'
+    return 'other'
+
+
+class SitemapCollector:
+    """
+    Accumulates the pages of one site's sitemaps
+    Feed it sitemap bodies with add(); it returns the child sitemaps still worth fetching
+    and keeps product and category URLs with their lastmod values, in sitemap order
+    """
+
+    def __init__(self, website: str, max_sitemaps: int = MAX_SITEMAPS, max_urls: int = MAX_SITEMAP_URLS):
+        self.host = urlparse(website).netloc.lower()
+        self.max_sitemaps = max_sitemaps
+        self.max_urls = max_urls
+        self.products: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+        self.categories: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+        self.lastmods: Dict[str, str] = {}
+        self.seen_sitemaps = set()
+        self.hints: Dict[str, Optional[str]] = {}
+        self.url_count = 0
+
+    def start_urls(self, website: str, robots_sitemaps: Optional[List[str]] = None) -> List[str]:
+        """Sitemaps to read first: those declared in robots.txt, else the conventional paths"""
+        urls = robots_sitemaps or [urljoin(website, path) for path in DEFAULT_SITEMAP_PATHS]
+        return self._claim(urls)
+
+    def _claim(self, urls: List[str]) -> List[str]:
+        claimed = []
+        for url in urls:
+            if url in self.seen_sitemaps or len(self.seen_sitemaps) >= self.max_sitemaps:
+                continue
+            self.seen_sitemaps.add(url)
+            claimed.append(url)
+        return claimed
+
+    def _same_site(self, url: str) -> bool:
+        host = urlparse(url).netloc.lower()
+        return host == self.host or host.replace('www.', '', 1) == self.host.replace('www.', '', 1)
+
+    def add(self, body: bytes, sitemap_url: str) -> List[str]:
+        """Read one sitemap body and return the child sitemaps to fetch next"""
+        hint = self.hints.get(sitemap_url)
+        children = []
+        try:
+            for kind, loc, lastmod in iter_sitemap(body):
+                if not self._same_site(loc):
+                    continue
+                if kind == 'sitemap':
+                    child_hint = sitemap_hint(loc)
+                    if child_hint != 'skip':
+                        self.hints[loc] = child_hint
+                        children.append(loc)
+                    continue
+
+                self.url_count += 1
+                if self.url_count > self.max_urls:
+                    break
+                if lastmod:
+                    self.lastmods[loc] = lastmod
+                page_kind = classify_url(loc, hint)
+                if page_kind == 'product':
+                    self.products[loc] = lastmod
+                elif page_kind == 'category':
+                    self.categories[loc] = lastmod
+        except (ElementTree.ParseError, OSError, EOFError) as e:
+            logger.warning(f"Malformed sitemap {sitemap_url}: {e}")
+
+        # Product sitemaps first, so capped crawls still reach them
+        children.sort(key=lambda url: self.hints.get(url) != 'product')
+        return self._claim(children)
+
+    @property
+    def category_names(self) -> Dict[str, str]:
+        """{category name: URL} for the collected category pages, named after their slug"""
+        categories = {}
+        for url in self.categories:
+            slug = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+            name = re.sub(r'[-_]+', ' ', slug).strip().title()
+            if name:
+                categories.setdefault(name, url)
+        return categories
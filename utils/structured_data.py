@@ -0,0 +1,196 @@
+"""
+schema.org Product extraction from JSON-LD and microdata
+Most shop platforms describe their product pages with structured data; reading it is a
+regex plus a JSON parse (or one lxml pass for microdata) instead of the DOM-wide
+heuristic searches, and gives the shop's own name, price and images
+"""
+
+import re
+import json
+import logging
+from html import unescape
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+JSON_LD_SCRIPT = re.compile(
+    r'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.I | re.S
+)
+MICRODATA_PRODUCT = re.compile(rb'itemtype\s*=\s*["\']?https?://schema\.org/Product', re.I)
+PRODUCT_TYPES = {'Product', 'ProductGroup', 'IndividualProduct', 'ProductModel'}
+MAX_FEATURES = 10
+MAX_DESCRIPTION = 500
+
+
+def _many(value) -> List:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _types(item: Dict) -> set:
+    return {str(v).rsplit('/', 1)[-1] for v in _many(item.get('@type'))}
+
+
+def _first(value):
+    """First element of a list value (schema.org allows one or many)"""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _text(value) -> str:
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('@value')
+    if value is None:
+        return ''
+    # Descriptions sometimes carry markup
+    return re.sub(r'\s+', ' ', unescape(re.sub(r'<[^>]+>', ' ', str(value)))).strip()
+
+
+def _price(value) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'\d+(\.\d+)?', str(value).replace(',', ''))
+    return float(match.group()) if match else None
+
+
+def _iter_products(data) -> Iterator[Dict]:
+    """Product nodes anywhere in a JSON-LD document, @graph and nesting included"""
+    if isinstance(data, list):
+        for entry in data:
+            yield from _iter_products(entry)
+    elif isinstance(data, dict):
+        if _types(data) & PRODUCT_TYPES:
+            yield data
+        for key in ('@graph', 'mainEntity', 'itemListElement', 'item', 'hasVariant'):
+            if key in data:
+                yield from _iter_products(data[key])
+
+
+def _json_ld_product(item: Dict, base_url: str) -> Dict:
+    offers = _first(item.get('offers'))
+    price = None
+    if isinstance(offers, dict):
+        specification = _first(offers.get('priceSpecification'))
+        price = _price(offers.get('price') or offers.get('lowPrice')
+                       or (specification.get('price') if isinstance(specification, dict) else None))
+    if price is None:
+        variants = [v for v in _many(item.get('hasVariant')) if isinstance(v, dict)]
+        price = next((p for p in (_json_ld_product(v, base_url)['price'] for v in variants) if p), None)
+
+    image = _first(item.get('image'))
+    if isinstance(image, dict):
+        image = image.get('url') or image.get('contentUrl')
+
+    features = []
+    for prop in _many(item.get('additionalProperty')):
+        if isinstance(prop, dict) and prop.get('name') and prop.get('value') not in (None, ''):
+            features.append(f"{_text(prop['name'])}: {_text(prop['value'])}")
+    for key in ('material', 'color'):
+        if item.get(key):
+            features.append(f"{key.title()}: {_text(item[key])}")
+
+    return {
+        'model': _text(item.get('name')),
+        'description': _text(item.get('description'))[:MAX_DESCRIPTION],
+        'image_url': urljoin(base_url, image) if isinstance(image, str) and image else None,
+        'price': price,
+        'features': features[:MAX_FEATURES]
+    }
+
+
+def product_from_json_ld(html: str, base_url: str) -> Optional[Dict]:
+    """The first named schema.org Product in the page's JSON-LD blocks, or None"""
+    for block in JSON_LD_SCRIPT.findall(html):
+        try:
+            data = json.loads(block.strip(), strict=False)
+        except ValueError:
+            logger.debug(f"Unreadable JSON-LD block on {base_url}")
+            continue
+        for item in _iter_products(data):
+            product = _json_ld_product(item, base_url)
+            if product['model']:
+                return product
+    return None
+
+
+def _microdata_value(elem: etree._Element, base_url: str) -> str:
+    tag = elem.tag
+    if tag == 'meta':
+        return elem.get('content', '').strip()
+    if tag in ('img', 'source', 'audio', 'video', 'embed', 'iframe'):
+        return urljoin(base_url, elem.get('src', ''))
+    if tag in ('a', 'link', 'area'):
+        return urljoin(base_url, elem.get('href', ''))
+    if tag in ('data', 'meter'):
+        return elem.get('value', '').strip()
+    if tag == 'time':
+        return elem.get('datetime', '').strip()
+    return elem.get('content') or re.sub(r'\s+', ' ', elem.text_content()).strip()
+
+
+def _microdata_properties(scope: etree._Element, base_url: str) -> Dict:
+    """itemprop values of one item, with nested items as dicts of their own properties"""
+    properties: Dict[str, List] = {}
+
+    def visit(elem):
+        for child in elem:
+            if not isinstance(child.tag, str):
+                continue
+            names = (child.get('itemprop') or '').split()
+            if child.get('itemscope') is not None:
+                value = _microdata_properties(child, base_url)
+                value['@type'] = child.get('itemtype', '')
+                for name in names:
+                    properties.setdefault(name, []).append(value)
+                continue
+            for name in names:
+                properties.setdefault(name, []).append(_microdata_value(child, base_url))
+            visit(child)
+
+    visit(scope)
+    # Single values as scalars, the shape JSON-LD uses
+    return {name: values if len(values) > 1 else values[0] for name, values in properties.items()}
+
+
+def product_from_microdata(html: bytes, base_url: str) -> Optional[Dict]:
+    """The first named schema.org Product marked up with microdata, or None"""
+    try:
+        root = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+    for scope in root.iter():
+        if not isinstance(scope.tag, str) or scope.get('itemscope') is None:
+            continue
+        if not re.search(r'schema\.org/(Product|IndividualProduct|ProductModel)\b', scope.get('itemtype', '')):
+            continue
+        product = _json_ld_product(_microdata_properties(scope, base_url), base_url)
+        if product['model']:
+            return product
+    return None
+
+
+def extract_structured_product(html, base_url: str) -> Optional[Dict]:
+    """
+    Product fields (model, description, image_url, price, features) from a page's
+    JSON-LD, else its microdata; None when the page describes no named product
+    """
+    raw = html if isinstance(html, bytes) else html.encode('utf-8')
+    text = html if isinstance(html, str) else html.decode('utf-8', 'replace')
+
+    product = product_from_json_ld(text, base_url)
+    if product:
+        return product
+    if MICRODATA_PRODUCT.search(raw):
+        return product_from_microdata(raw, base_url)
+    return None
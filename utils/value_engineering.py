@@ -1,9 +1,15 @@
 import requests
-from bs4 import BeautifulSoup
 import re
 import json
+import numpy as np
 from datetime import datetime
 from .brand_database import BrandDatabase
+from .brand_catalog import normalize_tier
+from .item_categorizer import categorize_item, categorize_items, normalize_description
+from .similarity_matcher import get_similarity_index
+from .alternatives_cache import get_alternatives_cache
+from .budget_optimizer import optimize_alternatives
+from .html_parsing import cell_text, find_table, table_rows
 
 class ValueEngineer:
     """Generate value-engineered alternatives using AI product search"""
@@ -48,10 +54,9 @@ class ValueEngineer:
         if not items:
             raise Exception('No items found in the table. Please check the extraction.')
         
-        # Generate alternatives for each item
+        # Generate alternatives for all items in one pass over the catalog
         alternatives = []
-        for item in items:
-            item_alternatives = self.find_alternatives(item, budget_option)
+        for item, item_alternatives in zip(items, self.find_alternatives_bulk(items, budget_option)):
             alternatives.append({
                 'original_item': item,
                 'alternatives': item_alternatives,
@@ -68,9 +73,42 @@ class ValueEngineer:
         
         return alternatives
     
+    def optimize_budget(self, file_id, session, target_total=None, saving_percent=None, objective='similarity'):
+        """
+        Choose one option per line (original or alternative) to meet a project budget
+        The budget is either a target total or a percentage saving on the original total
+        """
+        uploaded_files = session.get('uploaded_files', [])
+        file_info = next((f for f in uploaded_files if f['id'] == file_id), None)
+        
+        if not file_info:
+            raise Exception('File not found. Please upload and extract tables first.')
+        
+        value_engineering = file_info.get('value_engineering')
+        if not value_engineering or not value_engineering.get('alternatives'):
+            raise Exception('No alternatives found. Please generate value engineering alternatives first.')
+        
+        alternatives = value_engineering['alternatives']
+        if target_total is None:
+            if saving_percent is None:
+                raise Exception('Either target_total or saving_percent is required')
+            original_total = sum(
+                entry['original_item'].get('total') or
+                entry['original_item'].get('unit_rate', 0) * entry['original_item'].get('qty', 0)
+                for entry in alternatives
+            )
+            target_total = original_total * (1 - float(saving_percent) / 100)
+        
+        result = optimize_alternatives(alternatives, float(target_total), objective)
+        result['optimized_at'] = datetime.now().isoformat()
+        
+        value_engineering['optimization'] = result
+        session.modified = True
+        
+        return result
+    
     def parse_stitched_table(self, stitched_table_data):
         """Parse items from stitched table HTML"""
-        from bs4 import BeautifulSoup
         import logging
         
         logger = logging.getLogger(__name__)
@@ -81,24 +119,22 @@ class ValueEngineer:
             logger.warning("No HTML content in stitched table")
             return items
         
-        soup = BeautifulSoup(html_content, 'html.parser')
-        table = soup.find('table')
+        table = find_table(html_content)
         
-        if not table:
+        if table is None:
             logger.warning("No table found in HTML content")
             return items
         
-        rows = table.find_all('tr')
+        rows = table_rows(table)
         headers = []
         
         logger.info(f"Processing {len(rows)} rows from stitched table")
         
-        for row in rows:
-            cells = row.find_all(['th', 'td'])
+        for cells in rows:
             if not cells:
                 continue
             
-            cell_texts = [cell.get_text(strip=True) for cell in cells]
+            cell_texts = [cell_text(cell) for cell in cells]
             
             # First row with meaningful content is headers
             if not headers and any(cell_texts):
@@ -225,86 +261,132 @@ class ValueEngineer:
     
     def categorize_item(self, description):
         """Categorize item based on description"""
-        description_lower = description.lower()
-        
-        # Detailed categorization matching brand database
-        seating_keywords = {
-            'executive_chairs': ['executive chair', 'director chair', 'manager chair', 'executive seating'],
-            'task_chairs': ['task chair', 'office chair', 'work chair', 'operator chair', 'ergonomic chair'],
-            'visitor_chairs': ['visitor chair', 'guest chair', 'side chair', 'reception chair'],
-            'conference_chairs': ['conference chair', 'meeting chair', 'boardroom chair'],
-            'sofas': ['sofa', 'couch', 'settee', '2-seater', '3-seater'],
-            'lounge_seating': ['lounge', 'armchair', 'easy chair', 'lounge chair', 'breakout seating']
-        }
-        
-        desking_keywords = {
-            'executive_desks': ['executive desk', 'director desk', 'manager desk', 'executive table'],
-            'workstations': ['workstation', 'work desk', 'office desk', 'workspace', 'desk system'],
-            'meeting_tables': ['meeting table', 'conference table', 'boardroom table', 'discussion table'],
-            'pedestals': ['pedestal', 'drawer unit', 'mobile pedestal', 'under desk drawer'],
-            'cabinets': ['cabinet', 'cupboard', 'storage cabinet', 'filing cabinet'],
-            'lockers': ['locker', 'personal storage', 'staff locker'],
-            'partitions': ['partition', 'screen', 'divider', 'panel', 'privacy screen']
-        }
-        
-        # Check seating categories
-        for subcategory, keywords in seating_keywords.items():
-            if any(keyword in description_lower for keyword in keywords):
-                return {'category': 'seating', 'subcategory': subcategory}
-        
-        # Check desking categories
-        for subcategory, keywords in desking_keywords.items():
-            if any(keyword in description_lower for keyword in keywords):
-                return {'category': 'desking', 'subcategory': subcategory}
-        
-        # Default fallback
-        if any(word in description_lower for word in ['chair', 'seat', 'stool', 'bench']):
-            return {'category': 'seating', 'subcategory': 'task_chairs'}
-        elif any(word in description_lower for word in ['table', 'desk']):
-            return {'category': 'desking', 'subcategory': 'workstations'}
-        
-        return {'category': 'general', 'subcategory': 'general'}
+        return categorize_item(description)
+    
+    def categorize_items(self, descriptions):
+        """Categorize a whole column of descriptions at once"""
+        return categorize_items(descriptions)
     
     def find_alternatives(self, item, budget_option):
         """
         Find alternative products based on budget option using brand database
         """
-        alternatives = []
-        
-        category = item['category']
-        subcategory = item['subcategory']
-        
-        if category in ['seating', 'desking']:
-            # Use brand database to find real alternatives
-            products = self.brand_db.search_product(budget_option, category, subcategory)
+        return self.find_alternatives_bulk([item], budget_option)[0]
+    
+    def find_alternatives_bulk(self, items, budget_option, top_k=5):
+        """
+        Find alternatives for many items at once
+        Seating and desking descriptions are scored against their (category, subcategory)
+        bucket of the catalog by TF-IDF similarity; other lines get simulated alternatives.
+        Candidates are ranked by similarity and by how close their price is to the target.
+        Identical lines are ranked once, and rankings are memoized per catalog version
+        """
+        index = self.brand_db.index
+        cache = get_alternatives_cache()
+        multiplier = self.budget_multipliers.get(budget_option, 1.0)
+        tier = normalize_tier(budget_option)
+        
+        # Lines with the same normalized description, bucket and target rate share a ranking
+        line_keys = []
+        unique_rows = {}
+        for row, item in enumerate(items):
+            key = (
+                normalize_description(item['description']),
+                item['category'],
+                item['subcategory'],
+                tier,
+                round(item['unit_rate'] * multiplier, 2),
+                top_k,
+                self.brand_db.version
+            )
+            line_keys.append(key)
+            unique_rows.setdefault(key, row)
+        
+        rankings = {}
+        misses = []
+        for key, row in unique_rows.items():
+            ranking = cache.get(key)
+            if ranking is None:
+                misses.append(row)
+            else:
+                rankings[key] = ranking
+        
+        if misses:
+            matcher = get_similarity_index(index)
+            queries = matcher.transform([items[row]['description'] for row in misses])
+            target_prices = np.array([line_keys[row][4] for row in misses], dtype=float)
             
-            for product in products[:5]:  # Limit to top 5 alternatives
-                # Parse price range
-                price_range = product['price_range'].split('-')
-                avg_price = (float(price_range[0]) + float(price_range[1])) / 2
+            # Group lines by the catalog bucket they are matched against
+            groups = {}
+            for position, row in enumerate(misses):
+                item = items[row]
+                if item['category'] in ['seating', 'desking']:
+                    bucket = (item['category'], item['subcategory'])
+                else:
+                    bucket = None
+                groups.setdefault(bucket, []).append(position)
+            
+            for bucket, positions in groups.items():
+                if bucket is None:
+                    # The catalog only covers seating and desking; other lines get simulated alternatives
+                    candidate_ids = np.empty(0, dtype=np.int64)
+                else:
+                    candidate_ids = index.priced(index.lookup(budget_option, *bucket))
                 
-                alt = {
-                    'brand': product['brand'],
-                    'model': product['model'],
-                    'country': product['country'],
-                    'description': f"{product['brand']} {product['model']} - {subcategory.replace('_', ' ').title()}",
-                    'unit_rate': round(avg_price, 2),
-                    'total': round(avg_price * item['qty'], 2),
-                    'specs': product['features'],
-                    'category': category,
-                    'subcategory': subcategory,
-                    'source': f"Brand Database - {budget_option}",
-                    'website': product['website'],
-                    'price_range': product['price_range'],
-                    'lead_time': self.estimate_lead_time(budget_option, product['country'])
-                }
-                alternatives.append(alt)
-        
-        # If no alternatives found, generate simulated ones
-        if not alternatives:
-            alternatives = self.generate_simulated_alternatives(item, budget_option)
-        
-        return alternatives
+                ranked = matcher.rank(queries[positions], candidate_ids, target_prices[positions], top_k)
+                for position, ranking in zip(positions, ranked):
+                    key = line_keys[misses[position]]
+                    cache.put(key, ranking)
+                    rankings[key] = ranking
+        
+        # Quantity-independent entries are built once per distinct line
+        templates = {}
+        for key, (product_ids, similarities, scores) in rankings.items():
+            templates[key] = [
+                self.build_catalog_alternative(budget_option, product_id, similarity, score)
+                for product_id, similarity, score in zip(product_ids.tolist(), similarities.tolist(), scores.tolist())
+            ]
+        
+        results = []
+        for item, key in zip(items, line_keys):
+            alternatives = [
+                dict(template, total=round(avg_price * item['qty'], 2))
+                for template, avg_price in templates[key]
+            ]
+            # If no alternatives found, generate simulated ones
+            if not alternatives:
+                alternatives = self.generate_simulated_alternatives(item, budget_option)
+            results.append(alternatives)
+        
+        return results
+    
+    def build_catalog_alternative(self, budget_option, product_id, similarity, score):
+        """
+        Build an alternative entry from a catalog product, without the line total
+        Returns (entry, average unit price)
+        """
+        index = self.brand_db.index
+        product = index.products[product_id]
+        avg_price = float(index.avg_price[product_id])
+        subcategory = product['subcategory']
+        
+        return {
+            'brand': product['brand'],
+            'model': product['model'],
+            'country': product['country'],
+            'description': f"{product['brand']} {product['model']} - {subcategory.replace('_', ' ').title()}",
+            'unit_rate': round(avg_price, 2),
+            'total': None,
+            'specs': product['features'],
+            'category': product['category'],
+            'subcategory': subcategory,
+            'source': f"Brand Database - {budget_option}",
+            'website': product['website'],
+            'price_range': product['price_range'],
+            'lead_time': self.estimate_lead_time(budget_option, product['country']),
+            'similarity': round(similarity, 3),
+            'match_score': round(score, 3)
+        }, avg_price
     
     def estimate_lead_time(self, budget_option, country):
         """Estimate lead time based on budget tier and country"""
@@ -0,0 +1,70 @@
+"""
+ZIP archives written as a stream of bytes
+zipfile writes to an unseekable buffer (sizes go in data descriptors after each entry),
+and the buffer is drained after every block, so a response can send the archive while
+later entries are still being read or generated. Formats that are already compressed
+are stored rather than deflated a second time
+"""
+
+import io
+import os
+import zipfile
+import logging
+from typing import Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Zip containers and compressed media gain nothing from another deflate pass
+STORED_EXTENSIONS = {'.pdf', '.xlsx', '.pptx', '.docx', '.zip', '.gz', '.jpg', '.jpeg', '.png', '.gif', '.webp'}
+READ_SIZE = 256 * 1024
+
+
+def compression_for(name: str) -> int:
+    ext = os.path.splitext(name)[1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+class _DrainBuffer(io.RawIOBase):
+    """Write-only, unseekable sink collecting what zipfile writes until it is drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of (archive name, file path) entries piece by piece. entries is
+    consumed lazily, so files it produces on demand are made only as the archive reaches them
+    """
+    buffer = _DrainBuffer()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for arcname, path in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = compression_for(arcname)
+            with open(path, 'rb') as source, archive.open(info, 'w') as target:
+                while True:
+                    block = source.read(READ_SIZE)
+                    if not block:
+                        break
+                    target.write(block)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # Central directory
+    yield buffer.drain()